@@ -0,0 +1,21 @@
+from tortoise import fields, models
+
+
+class DailyRollup(models.Model):
+    """Sales of one room type on one night, see `app.analytics.rollups`"""
+
+    id = fields.IntField(pk=True)
+    day = fields.DateField()
+    room_type = fields.CharField(max_length=10, description="empty for rooms without a type")
+    nights_sold = fields.IntField(default=0)
+    rooms_available = fields.IntField(default=0)
+    revenue_booked = fields.DecimalField(max_digits=14, decimal_places=3, default=0)
+    revenue_paid = fields.DecimalField(max_digits=14, decimal_places=3, default=0)
+    updated_at = fields.DatetimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ("day", "room_type")
+        ordering = ("day", "room_type")
+
+    def __str__(self) -> str:
+        return f"<DailyRollup: {self.day} {self.room_type or '-'}>"
@@ -0,0 +1,117 @@
+"""
+Occupancy and revenue metrics, read from the daily rollups.
+
+`DailyRollup` rows are laid out as a room-type-by-night matrix with NumPy and summed per night
+and per period, without reading a single reservation. Days without a rollup row (no sales yet)
+count the current inventory as available.
+
+For each period:
+
+- occupancy: nights sold / available room-nights
+- ADR (average daily rate): revenue booked / nights sold
+- RevPAR (revenue per available room): revenue booked / available room-nights
+
+Revenue booked is at the rooms' list prices, not at rate plan prices, see
+`app.analytics.rollups`.
+"""
+
+from datetime import date
+from enum import Enum
+from typing import Optional
+
+import numpy as np
+
+from ..rooms.models import Room
+from .columns import fetch_columns, lookup
+from .models import DailyRollup
+from .rollups import room_inventory, type_key
+
+
+class Granularity(str, Enum):
+    DAY = "day"
+    WEEK = "week"
+    MONTH = "month"
+
+
+def period_starts(nights: np.ndarray, granularity: Granularity) -> np.ndarray:
+    """First day of the period of every night in `nights` (datetime64[D])"""
+    if granularity == Granularity.MONTH:
+        return nights.astype("datetime64[M]").astype("datetime64[D]")
+    if granularity == Granularity.WEEK:
+        # 1970-01-01 was a Thursday, weeks start on Monday
+        weekday = (nights.astype(np.int64) + 3) % 7
+        return nights - weekday.astype("timedelta64[D]")
+    return nights
+
+
+def metrics(available, sold, booked, paid) -> dict:
+    return {
+        "available_room_nights": int(available),
+        "occupied_room_nights": int(sold),
+        "occupancy": round(float(sold / available), 4) if available else 0.0,
+        "revenue": round(float(booked), 2),
+        "revenue_paid": round(float(paid), 2),
+        "adr": round(float(booked / sold), 2) if sold else 0.0,
+        "revpar": round(float(booked / available), 2) if available else 0.0,
+    }
+
+
+async def occupancy_analytics(
+    date_from: date,
+    date_to: date,
+    granularity: Granularity,
+    room_type: Optional[Room.RoomType] = None,
+) -> dict:
+    nights = np.arange(
+        np.datetime64(date_from, "D"), np.datetime64(date_to, "D") + 1, dtype="datetime64[D]"
+    )
+    inventory = await room_inventory()
+    rollups = DailyRollup.filter(day__gte=date_from, day__lte=date_to)
+    if room_type is not None:
+        key = type_key(room_type)
+        rollups = rollups.filter(room_type=key)
+        inventory = {key: inventory.get(key, 0)}
+    days, room_types, sold, available, booked, paid = await fetch_columns(
+        rollups,
+        "day",
+        "room_type",
+        "nights_sold",
+        "rooms_available",
+        "revenue_booked",
+        "revenue_paid",
+    )
+
+    # One row per room type, days without a rollup row keep the current inventory
+    names = np.array(sorted(inventory.keys() | set(room_types)), dtype=str)
+    shape = (len(names), len(nights))
+    inventory_column = np.array([inventory.get(str(name), 0) for name in names], dtype=np.int64)
+    available_matrix = np.repeat(inventory_column[:, None], shape[1], axis=1)
+    sold_matrix = np.zeros(shape, dtype=np.int64)
+    booked_matrix = np.zeros(shape)
+    paid_matrix = np.zeros(shape)
+    cells = (
+        lookup(names, np.arange(len(names)), np.array(room_types, dtype=str), 0),
+        (np.array(days, dtype="datetime64[D]") - nights[0]).astype(np.int64),
+    )
+    available_matrix[cells] = np.array(available, dtype=np.int64)
+    sold_matrix[cells] = np.array(sold, dtype=np.int64)
+    booked_matrix[cells] = np.array(booked, dtype=np.float64)
+    paid_matrix[cells] = np.array(paid, dtype=np.float64)
+
+    starts, period_index = np.unique(period_starts(nights, granularity), return_inverse=True)
+    per_period = [
+        np.bincount(period_index, matrix.sum(axis=0), minlength=len(starts))
+        for matrix in (available_matrix, sold_matrix, booked_matrix, paid_matrix)
+    ]
+    return {
+        "date_from": date_from,
+        "date_to": date_to,
+        "granularity": granularity,
+        "room_type": room_type,
+        "rooms": sum(inventory.values()),
+        "totals": metrics(*(values.sum() for values in per_period)),
+        "periods": [
+            {"period_start": str(start), **metrics(*values)}
+            for start, *values in zip(starts, *per_period)
+        ],
+    }
@@ -0,0 +1,264 @@
+"""
+Per-day, per-room-type rollups of nights sold, rooms available and revenue.
+
+Dashboards read `DailyRollup` instead of scanning reservations. A write that changes what a
+reservation contributes (its stays, its status, its invoice, or the type or price of one of its
+rooms) runs inside `track_stays`, which totals the contribution of the affected stays before and
+after the write and applies the difference in the same transaction, with the rollup rows
+locked. `rebuild_rollups` recomputes every row from scratch to repair drift:
+
+    python -m app.analytics.rollups
+
+Every night of a stay adds, to the row of that day and of the room's type:
+
+- nights_sold: 1, nothing at all for stays of cancelled reservations
+- revenue_booked: the room's nightly price
+- revenue_paid: once the reservation's invoice is paid, the invoiced amount split evenly over
+  the reservation's room-nights, in whole thousandths rounded down
+
+revenue_booked is list-price revenue: invoices are priced with the rate plans of
+`app.pricing.engine`, so for nights a plan discounts or raises it differs from what guests are
+charged, and revenue_paid is the figure that follows the rate plans. Pricing the rollups with
+the plans is deliberately avoided: plans can be edited at any time and occupancy-based plans
+read these very rollups, so tracked totals would no longer add up to what a rebuild computes.
+
+`rooms_available` is the number of rooms of the type. It is set when a row is created and kept
+up to date from today on as rooms are added, removed or retyped, so past days keep the
+inventory they had. A rebuild applies the current inventory to every day.
+"""
+
+import asyncio
+from collections import Counter
+from contextlib import asynccontextmanager
+from datetime import date, timedelta
+from decimal import Decimal
+from enum import Enum
+from typing import Optional, Union
+from uuid import UUID
+
+import numpy as np
+from tortoise import Tortoise, connections, timezone
+from tortoise.functions import Count
+from tortoise.queryset import QuerySet
+from tortoise.transactions import in_transaction
+
+from ..checkout.models import Invoice, PaidStatus
+from ..config import settings
+from ..reservations.models import Reservation
+from ..rooms.models import Room, RoomAvailability
+from .columns import fetch_columns, interval_matrix, lookup, thousandths
+from .models import DailyRollup
+
+# (day, room type) to [nights sold, revenue booked, revenue paid], revenue in thousandths
+Totals = dict[tuple[date, str], list[int]]
+
+
+def type_key(room_type: Union[Room.RoomType, str, None]) -> str:
+    """`DailyRollup.room_type` of a room type, empty for rooms without one"""
+    if room_type is None:
+        return ""
+    return room_type.value if isinstance(room_type, Enum) else room_type
+
+
+def to_thousandths(amount: Decimal) -> int:
+    return int(amount * 1000)
+
+
+def from_thousandths(amount: int) -> Decimal:
+    return Decimal(amount) / 1000
+
+
+def reservation_stays(*reservation_ids: UUID) -> QuerySet:
+    return RoomAvailability.filter(reservation_id__in=reservation_ids)
+
+
+async def room_inventory() -> dict[str, int]:
+    """Number of rooms per `DailyRollup.room_type`"""
+    counts = (
+        await Room.annotate(rooms=Count("id"))
+        .group_by("room_type")
+        .values_list("room_type", "rooms")
+    )
+    return {type_key(room_type): rooms for room_type, rooms in counts}
+
+
+async def stay_totals(stays: QuerySet) -> Totals:
+    """What the `RoomAvailability` rows selected by `stays` add to the rollups"""
+    rows = await stays.exclude(
+        reservation__status=Reservation.ReservationStatus.CANCELLED
+    ).values_list("reservation_id", "start_date", "end_date", "room__room_type", "room__price")
+    reservation_ids = {row[0] for row in rows}
+    paid = {}
+    if reservation_ids:
+        paid = dict(
+            await Invoice.filter(
+                reservation_id__in=list(reservation_ids),
+                status=PaidStatus.paid,
+                amount__isnull=False,
+            ).values_list("reservation_id", "amount")
+        )
+    # A paid invoice is split over all room-nights of its reservation, selected or not
+    room_nights: Counter = Counter()
+    if paid:
+        for reservation_id, start, end in await RoomAvailability.filter(
+            reservation_id__in=list(paid)
+        ).values_list("reservation_id", "start_date", "end_date"):
+            room_nights[reservation_id] += (end - start).days
+
+    totals: Totals = {}
+    for reservation_id, start, end, room_type, price in rows:
+        share = 0
+        if reservation_id in paid:
+            share = to_thousandths(paid[reservation_id]) // room_nights[reservation_id]
+        for night in range((end - start).days):
+            day = start + timedelta(days=night)
+            cell = totals.setdefault((day, type_key(room_type)), [0] * 3)
+            cell[0] += 1
+            cell[1] += to_thousandths(price)
+            cell[2] += share
+    return totals
+
+
+async def apply_totals(delta: Totals):
+    """Add `delta` to the rollups, creating missing rows. Must run inside a transaction."""
+    delta = {cell: values for cell, values in delta.items() if any(values)}
+    if not delta:
+        return
+    days = {day for day, _ in delta}
+    room_types = {room_type for _, room_type in delta}
+    rollups = DailyRollup.filter(day__in=days, room_type__in=room_types)
+    existing = set(await rollups.values_list("day", "room_type"))
+    if len(existing) < len(delta):
+        inventory = await room_inventory()
+        # Ignoring conflicts lets concurrent writers create the same row without failing
+        await DailyRollup.bulk_create(
+            [
+                DailyRollup(
+                    day=day, room_type=room_type, rooms_available=inventory.get(room_type, 0)
+                )
+                for day, room_type in delta
+                if (day, room_type) not in existing
+            ],
+            ignore_conflicts=True,
+        )
+
+    if connections.get("default").capabilities.dialect == "postgres":
+        rollups = rollups.select_for_update()
+    now = timezone.now()
+    changed = []
+    for rollup in await rollups:
+        values = delta.get((rollup.day, rollup.room_type))
+        if values is None:
+            continue
+        rollup.nights_sold += values[0]
+        rollup.revenue_booked += from_thousandths(values[1])
+        rollup.revenue_paid += from_thousandths(values[2])
+        rollup.updated_at = now
+        changed.append(rollup)
+    await DailyRollup.bulk_update(
+        changed, fields=["nights_sold", "revenue_booked", "revenue_paid", "updated_at"]
+    )
+
+
+@asynccontextmanager
+async def track_stays(stays: QuerySet):
+    """
+    Apply to the rollups what the write in the block changes about `stays`. Must run inside
+    the write's transaction, with `stays` selecting every stay the write can affect.
+    """
+    before = await stay_totals(stays)
+    yield
+    after = await stay_totals(stays)
+    delta = {
+        cell: [new - old for new, old in zip(after.get(cell, [0] * 3), before.get(cell, [0] * 3))]
+        for cell in after.keys() | before.keys()
+    }
+    await apply_totals(delta)
+
+
+async def refresh_rooms_available(since: Optional[date] = None):
+    """Set `rooms_available` to the current inventory on `since` (today by default) and later"""
+    since = since or timezone.now().date()
+    inventory = await room_inventory()
+    for room_type in ["", *(room_type.value for room_type in Room.RoomType)]:
+        await DailyRollup.filter(day__gte=since, room_type=room_type).update(
+            rooms_available=inventory.get(room_type, 0)
+        )
+
+
+async def rebuild_rollups() -> int:
+    """Recompute every rollup row from the reservations, returning the number of rows"""
+    async with in_transaction("default"):
+        room_ids, room_types, prices = await fetch_columns(
+            Room.all(), "id", "room_type", "price"
+        )
+        stay_rooms, reservation_ids, starts, ends = await fetch_columns(
+            RoomAvailability.all(), "room_id", "reservation_id", "start_date", "end_date"
+        )
+        [cancelled] = await fetch_columns(
+            Reservation.filter(status=Reservation.ReservationStatus.CANCELLED), "id"
+        )
+        invoiced, amounts = await fetch_columns(
+            Invoice.filter(status=PaidStatus.paid), "reservation_id", "amount"
+        )
+
+        # Ids as fixed width strings, which sort far faster than Python objects
+        room_ids = np.array(room_ids, dtype=str)
+        names, room_type_index = np.unique(
+            np.array([type_key(room_type) for room_type in room_types], dtype=str),
+            return_inverse=True,
+        )
+        inventory = np.bincount(room_type_index, minlength=len(names))
+
+        reservation_ids = np.array(reservation_ids, dtype=str)
+        active = ~np.isin(reservation_ids, np.array(cancelled, dtype=str))
+        reservation_ids = reservation_ids[active]
+        stay_rooms = np.array(stay_rooms, dtype=str)[active]
+        starts = np.array(starts, dtype="datetime64[D]")[active]
+        ends = np.array(ends, dtype="datetime64[D]")[active]
+
+        nights = (ends - starts).astype(np.int64)
+        _, reservation_index = np.unique(reservation_ids, return_inverse=True)
+        room_nights = np.bincount(reservation_index, nights).astype(np.int64)[reservation_index]
+        paid = lookup(np.array(invoiced, dtype=str), thousandths(amounts), reservation_ids, 0)
+        share = paid // np.maximum(room_nights, 1)
+
+        rows = lookup(room_ids, room_type_index, stay_rooms, 0)
+        price = lookup(room_ids, thousandths(prices), stay_rooms, 0)
+        first_day = starts.min() if len(starts) else np.datetime64(timezone.now().date(), "D")
+        last_day = ends.max() if len(ends) else first_day
+        first = (starts - first_day).astype(np.int64)
+        last = (ends - first_day).astype(np.int64)
+        shape = (len(names), int((last_day - first_day).astype(np.int64)))
+        sold = interval_matrix(rows, first, last, np.ones(len(rows), dtype=np.int64), shape)
+        booked = interval_matrix(rows, first, last, price, shape)
+        paid = interval_matrix(rows, first, last, share, shape)
+
+        rollups = [
+            DailyRollup(
+                day=(first_day + night).item(),
+                room_type=str(name),
+                nights_sold=int(sold[row, night]),
+                rooms_available=int(inventory[row]),
+                revenue_booked=from_thousandths(int(booked[row, night])),
+                revenue_paid=from_thousandths(int(paid[row, night])),
+            )
+            for row, name in enumerate(names)
+            for night in range(shape[1])
+        ]
+        await DailyRollup.all().delete()
+        await DailyRollup.bulk_create(rollups, batch_size=1000)
+    return len(rollups)
+
+
+async def main():
+    await Tortoise.init(config=settings.tortoise_config)
+    try:
+        rows = await rebuild_rollups()
+        print(f"Rebuilt daily rollups, {rows} row(s)")
+    finally:
+        await Tortoise.close_connections()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,36 @@
+from datetime import date
+from typing import Optional
+
+from fastapi import HTTPException, Query
+from fastapi.routing import APIRouter
+
+from ..config import settings
+from ..rooms.models import Room
+from ..serialization import FastJSONResponse
+from .occupancy import Granularity, occupancy_analytics
+from .rollups import rebuild_rollups
+from .schema import OccupancyReport
+
+
+analytics_router = APIRouter(tags=["Analytics"])
+
+
+@analytics_router.get("/occupancy", response_model=OccupancyReport)
+async def get_occupancy(
+    date_from: date = Query(..., alias="from"),
+    date_to: date = Query(..., alias="to"),
+    granularity: Granularity = Granularity.DAY,
+    room_type: Optional[Room.RoomType] = None,
+):
+    """Occupancy, ADR and RevPAR for the nights `from` to `to`, both included, from the
+    daily rollups"""
+    if date_from > date_to:
+        raise HTTPException(400, "`from` must not be after `to`")
+    if (date_to - date_from).days >= settings.analytics_max_days:
+        raise HTTPException(400, f"At most {settings.analytics_max_days} days can be reported")
+    return FastJSONResponse(await occupancy_analytics(date_from, date_to, granularity, room_type))
+
+
+@analytics_router.post("/rollups/rebuild", response_model=dict[str, int])
+async def rebuild_daily_rollups():
+    return {"rows": await rebuild_rollups()}
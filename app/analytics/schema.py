@@ -0,0 +1,31 @@
+from datetime import date
+from typing import Optional
+
+from pydantic import BaseModel
+
+from ..rooms.models import Room
+from .occupancy import Granularity
+
+
+class OccupancyMetrics(BaseModel):
+    available_room_nights: int
+    occupied_room_nights: int
+    occupancy: float
+    revenue: float
+    revenue_paid: float
+    adr: float
+    revpar: float
+
+
+class OccupancyPeriod(OccupancyMetrics):
+    period_start: date
+
+
+class OccupancyReport(BaseModel):
+    date_from: date
+    date_to: date
+    granularity: Granularity
+    room_type: Optional[Room.RoomType]
+    rooms: int
+    totals: OccupancyMetrics
+    periods: list[OccupancyPeriod]
@@ -0,0 +1,51 @@
+"""
+Per-process cache of authenticated principals.
+
+`get_current_user` runs on every authenticated request, so the `Admin`/`Guest` it loads
+is kept here keyed by the token's `sub`. Entries expire after `settings.principal_cache_ttl`
+seconds and the least recently used entries are evicted past `settings.principal_cache_size`.
+Handlers that update, deactivate or delete a user must call `principal_cache.invalidate`.
+"""
+
+import time
+from collections import OrderedDict
+from typing import Optional, Union
+from uuid import UUID
+
+from ..config import settings
+from ..users.models import Admin, Guest
+
+
+class PrincipalCache:
+    def __init__(self, ttl: float, max_size: int):
+        self.ttl = ttl
+        self.max_size = max_size
+        self._entries: OrderedDict[str, tuple[float, Union[Admin, Guest]]] = OrderedDict()
+
+    def get(self, user_uid: Union[str, UUID]) -> Optional[Union[Admin, Guest]]:
+        key = str(user_uid)
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, user = entry
+        if expires_at < time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return user
+
+    def set(self, user_uid: Union[str, UUID], user: Union[Admin, Guest]):
+        key = str(user_uid)
+        self._entries[key] = (time.monotonic() + self.ttl, user)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, user_uid: Union[str, UUID]):
+        self._entries.pop(str(user_uid), None)
+
+    def clear(self):
+        self._entries.clear()
+
+
+principal_cache = PrincipalCache(settings.principal_cache_ttl, settings.principal_cache_size)
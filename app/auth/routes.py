@@ -1,8 +1,7 @@
-import yagmail
 from fastapi import APIRouter, Depends, HTTPException
 from fastapi.security import OAuth2PasswordRequestForm
 
-from ..config import settings
+from ..notifications.dispatcher import queue_email
 from ..users.schema import TokenResponse, UserIn
 from ..users.models import Admin, BaseUser
 from .utils import (
@@ -11,6 +10,7 @@ from .utils import (
     authenticate_user,
     create_auth_token,
     get_current_active_user,
+    get_user_type,
 )
 
 auth_router = APIRouter(tags=["Auth"])
@@ -33,21 +33,17 @@ async def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(
             scopes = list(ADMIN_SCOPES.keys())
         else:
             scopes = list(SUPERUSER_SCOPES.keys())
-    access_token = create_auth_token(
-        data={"sub": str(user.uid), "scopes": scopes}, token_type="access"
-    )
-    refresh_token = create_auth_token(
-        data={"sub": str(user.uid), "scopes": scopes}, token_type="refresh"
-    )
+    claims = {"sub": str(user.uid), "scopes": scopes, "user_type": get_user_type(user)}
+    access_token = create_auth_token(data=claims, token_type="access")
+    refresh_token = create_auth_token(data=claims, token_type="refresh")
     return {"access_token": access_token, "refresh_token": refresh_token}
 
 
 async def onboading_new_signee(guest: UserIn):
-    with yagmail.SMTP(settings.email_user, settings.email_password) as yag:
-        yag.send(
-            to=guest.email,
-            subject=f"New Signee! {guest.first_name} 🌟",
-            contents=f"""
+    await queue_email(
+        to=guest.email,
+        subject=f"New Signee! {guest.first_name} 🌟",
+        contents=f"""
             Welcome to the family! We are so excited to have you on board.
             Dear {guest.first_name},
 
@@ -62,8 +58,8 @@ async def onboading_new_signee(guest: UserIn):
 
             Best regards,
             [Your Company Name] Team
-            """,
-        )
+        """,
+    )
 
 
 @auth_router.post("/refresh", response_model=dict)
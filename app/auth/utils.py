@@ -1,10 +1,13 @@
 """
 This module contains utility functions for authentication and authorization in the Hotel Management API.
 It includes functions for verifying and hashing passwords, creating access and refresh tokens, and authenticating users.
+Password hashing runs in a bounded worker pool so bcrypt never blocks the event loop.
 It also includes functions for getting the current user and authorizing object and user access.
 """
 
+import asyncio
 import logging
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 from typing import Optional, Union
 from uuid import UUID
@@ -16,6 +19,7 @@ from jose import jwt, JWTError
 from passlib.context import CryptContext
 
 from ..config import settings
+from .cache import principal_cache
 from ..rooms.models import Review
 from ..reservations.models import Reservation
 from ..users.schema import TokenData
@@ -23,7 +27,14 @@ from ..users.models import Admin, Guest, BaseUser
 
 
 logger = logging.getLogger(__name__)
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+pwd_context = CryptContext(
+    schemes=["bcrypt"],
+    deprecated="auto",
+    bcrypt__default_rounds=settings.bcrypt_rounds,
+    # Hashes made with any other cost are flagged for rehashing on login
+    bcrypt__min_rounds=settings.bcrypt_rounds,
+    bcrypt__max_rounds=settings.bcrypt_rounds,
+)
 
 ADMIN_SCOPES = {
     "admin-read": "admin read only role",
@@ -35,12 +46,54 @@ scopes = {**ADMIN_SCOPES, **SUPERUSER_SCOPES}
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/v1/login", scopes=scopes)
 
 
-def verify_password(plain_password: str, hashed_password):
-    return pwd_context.verify(plain_password, hashed_password)
+class PasswordHasher:
+    """
+    Runs bcrypt work on a dedicated thread pool (bcrypt releases the GIL).
 
+    At most `queue_limit` jobs may be running or waiting at once; beyond that new
+    requests are shed with a 503 instead of piling up behind the pool.
+    """
 
-def hash_password(plain_password):
-    return pwd_context.hash(plain_password)
+    def __init__(self, workers: int, queue_limit: int):
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="password")
+        self.queue_limit = queue_limit
+        self.pending = 0
+
+    async def run(self, func, *args):
+        if self.pending >= self.queue_limit:
+            logger.warning(f"Password hashing queue full ({self.pending} jobs), shedding load")
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Server is busy, please try again shortly",
+                headers={"Retry-After": "1"},
+            )
+        self.pending += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self.executor, func, *args)
+        finally:
+            self.pending -= 1
+
+
+password_hasher = PasswordHasher(settings.password_hash_workers, settings.password_hash_queue_limit)
+
+
+async def verify_password(plain_password: str, hashed_password):
+    return await password_hasher.run(pwd_context.verify, plain_password, hashed_password)
+
+
+async def hash_password(plain_password):
+    return await password_hasher.run(pwd_context.hash, plain_password)
+
+
+async def verify_and_rehash_password(user: BaseUser, plain_password: str):
+    """Verify `plain_password` and upgrade the stored hash if its bcrypt cost is outdated"""
+    valid, new_hash = await password_hasher.run(
+        pwd_context.verify_and_update, plain_password, user.password_hash
+    )
+    if valid and new_hash:
+        user.password_hash = new_hash
+        await user.save(update_fields=["password_hash"])
+    return valid
 
 
 def encode_token(data: dict, token_type: str, expires: timedelta):
@@ -63,8 +116,21 @@ def create_auth_token(data: dict, token_type: str):
 # TODO: Revoke Access token
 
 
-async def verify_user(user_uid: Optional[UUID] = None, email: Optional[str] = None):
+def get_user_type(user: BaseUser) -> str:
+    return "admin" if isinstance(user, Admin) else "guest"
+
+
+async def verify_user(
+    user_uid: Optional[UUID] = None,
+    email: Optional[str] = None,
+    user_type: Optional[str] = None,
+):
     if user_uid:
+        # Tokens carry the user type, so only one table needs to be queried
+        if user_type == "admin":
+            return await Admin.get_or_none(uid=user_uid)
+        if user_type == "guest":
+            return await Guest.get_or_none(uid=user_uid)
         admin = await Admin.get_or_none(uid=user_uid)
         guest = await Guest.get_or_none(uid=user_uid)
         return admin or guest
@@ -76,9 +142,13 @@ async def verify_user(user_uid: Optional[UUID] = None, email: Optional[str] = No
 
 async def authenticate_user(email: str, password: str):
     user = await verify_user(email=email)
-    if user and verify_password(password, user.password_hash):
-        return user
-    return False
+    if not user:
+        return False
+    if settings.password_rehash_on_login:
+        valid = await verify_and_rehash_password(user, password)
+    else:
+        valid = await verify_password(password, user.password_hash)
+    return user if valid else False
 
 
 async def get_current_user(
@@ -105,15 +175,18 @@ async def get_current_user(
         if user_id is None:
             raise credentials_exception
         token_scopes = payload.get("scopes", [])
-        data = TokenData(user_id=user_id, scopes=token_scopes)
+        data = TokenData(user_id=user_id, scopes=token_scopes, user_type=payload.get("user_type"))
     except JWTError as e:
         credentials_exception.detail = str(e)
         logger.error(e)
         raise credentials_exception
-    user = await verify_user(user_uid=data.user_id)
-    if not user:
-        raise credentials_exception
-    logger.info(f"User {user} authenticated successfully.")
+    user = principal_cache.get(data.user_id)
+    if user is None:
+        user = await verify_user(user_uid=data.user_id, user_type=data.user_type)
+        if not user:
+            raise credentials_exception
+        principal_cache.set(data.user_id, user)
+    logger.debug(f"User {user} authenticated successfully.")
     if not security_scope.scopes:
         return user
     for scope in security_scope.scopes:
@@ -129,6 +202,9 @@ async def get_current_active_user(current_user: Guest = Depends(get_current_user
 
 
 async def get_current_active_admin(current_user: Admin = Depends(get_current_user)):
+    # Scopes are whatever the client asked for at login, only the account type is trusted
+    if not isinstance(current_user, Admin):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not enough permissions")
     if not current_user.is_active:
         raise HTTPException(status_code=400, detail="Inactive user")
     return current_user
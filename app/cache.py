@@ -0,0 +1,186 @@
+"""
+Response cache for read-heavy public endpoints.
+
+Responses are stored as pre-serialized JSON bytes together with a set of tags. Write endpoints
+invalidate by tag (e.g. `room:<id>`), so only the entries that embed the changed data are
+dropped. The backend is pluggable: an in-process LRU by default, or Redis when several workers
+must share one cache (any client exposing the `redis.asyncio` API, such as `fakeredis`, can
+stand in for it locally).
+"""
+
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Awaitable, Callable, Iterable, Optional
+
+from fastapi import Response
+
+from .config import settings
+from .database.routing import pin_primary
+
+
+ROOM_LIST_TAG = "rooms"
+
+
+class CacheBackend(ABC):
+    @abstractmethod
+    async def get(self, key: str) -> Optional[bytes]:
+        ...
+
+    @abstractmethod
+    async def set(self, key: str, value: bytes, tags: Iterable[str], ttl: float):
+        ...
+
+    @abstractmethod
+    async def invalidate_tags(self, tags: Iterable[str]):
+        ...
+
+    @abstractmethod
+    async def clear(self):
+        ...
+
+
+class MemoryCache(CacheBackend):
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries: OrderedDict[str, tuple[float, bytes, frozenset[str]]] = OrderedDict()
+        self._tags: dict[str, set[str]] = {}
+
+    async def get(self, key: str) -> Optional[bytes]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, value, _ = entry
+        if expires_at < time.monotonic():
+            self._delete(key)
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    async def set(self, key: str, value: bytes, tags: Iterable[str], ttl: float):
+        self._delete(key)
+        tags = frozenset(tags)
+        self._entries[key] = (time.monotonic() + ttl, value, tags)
+        for tag in tags:
+            self._tags.setdefault(tag, set()).add(key)
+        while len(self._entries) > self.max_entries:
+            self._delete(next(iter(self._entries)))
+
+    async def invalidate_tags(self, tags: Iterable[str]):
+        for tag in tags:
+            for key in self._tags.pop(tag, ()):
+                self._delete(key)
+
+    async def clear(self):
+        self._entries.clear()
+        self._tags.clear()
+
+    def _delete(self, key: str):
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        for tag in entry[2]:
+            keys = self._tags.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tags[tag]
+
+
+class RedisCache(CacheBackend):
+    def __init__(self, client, prefix: str = "hotel-cache"):
+        self.client = client
+        self.prefix = prefix
+
+    def _key(self, key: str) -> str:
+        return f"{self.prefix}:entry:{key}"
+
+    def _tag(self, tag: str) -> str:
+        return f"{self.prefix}:tag:{tag}"
+
+    async def get(self, key: str) -> Optional[bytes]:
+        return await self.client.get(self._key(key))
+
+    async def set(self, key: str, value: bytes, tags: Iterable[str], ttl: float):
+        async with self.client.pipeline(transaction=True) as pipe:
+            pipe.set(self._key(key), value, px=int(ttl * 1000))
+            for tag in tags:
+                pipe.sadd(self._tag(tag), self._key(key))
+            await pipe.execute()
+
+    async def invalidate_tags(self, tags: Iterable[str]):
+        tag_keys = [self._tag(tag) for tag in tags]
+        if not tag_keys:
+            return
+        keys = set()
+        for tag_key in tag_keys:
+            keys.update(await self.client.smembers(tag_key))
+        await self.client.delete(*keys, *tag_keys)
+
+    async def clear(self):
+        keys = [key async for key in self.client.scan_iter(match=f"{self.prefix}:*")]
+        if keys:
+            await self.client.delete(*keys)
+
+
+class ResponseCache:
+    def __init__(self, backend: CacheBackend, ttl: float):
+        self.backend = backend
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+
+    async def respond(
+        self, key: str, render: Callable[[], Awaitable[tuple[bytes, Iterable[str]]]]
+    ) -> Response:
+        """
+        Serve `key` from the cache, or call `render` for the JSON body and the tags to
+        store it under.
+        """
+        body = await self.backend.get(key)
+        if body is not None:
+            self.hits += 1
+            return Response(body, media_type="application/json")
+        self.misses += 1
+        # A replica lagging behind the write that invalidated this key would cache stale data
+        with pin_primary():
+            body, tags = await render()
+        await self.backend.set(key, body, tags, self.ttl)
+        return Response(body, media_type="application/json")
+
+    async def invalidate(self, *tags: str):
+        await self.backend.invalidate_tags(tags)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "backend": type(self.backend).__name__,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+        }
+
+
+def room_tags(room_id, room_number: int) -> list[str]:
+    """Tags for cached room payloads, which embed the room's reservations and reviews"""
+    return [ROOM_LIST_TAG, f"room:{room_id}", f"room-number:{room_number}"]
+
+
+async def invalidate_rooms(room_ids=(), room_numbers=()):
+    """Drop every cached room list plus the detail entries of the given rooms"""
+    await response_cache.invalidate(
+        ROOM_LIST_TAG,
+        *(f"room:{room_id}" for room_id in room_ids),
+        *(f"room-number:{number}" for number in room_numbers),
+    )
+
+
+def build_cache_backend() -> CacheBackend:
+    if settings.cache_backend == "redis":
+        from redis import asyncio as aioredis
+
+        return RedisCache(aioredis.from_url(settings.redis_url))
+    return MemoryCache(settings.cache_max_entries)
+
+
+response_cache = ResponseCache(build_cache_backend(), settings.cache_ttl)
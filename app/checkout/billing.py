@@ -0,0 +1,74 @@
+"""
+Night audit: invoices for every stay that has ended.
+
+`invoice_completed_stays` finds the reservations that are checked out, or whose check-out date
+has passed, and have no `Invoice` yet. Each batch of `settings.invoice_batch_size` of them is
+priced at once with `app.pricing.engine` and inserted with a single `bulk_create`:
+
+    python -m app.checkout.billing
+
+Reruns are cheap and safe. Invoiced reservations are no longer selected, and since a
+reservation has at most one invoice (`Invoice.reservation` is one-to-one) the rows a concurrent
+run inserted first are skipped rather than duplicated, and not counted as invoiced by this run.
+"""
+
+import asyncio
+from datetime import datetime
+from typing import Optional
+
+from tortoise import Tortoise, timezone
+from tortoise.expressions import Q
+
+from ..config import settings
+from ..pricing.engine import reservation_totals
+from ..reservations.models import Reservation
+from .models import Invoice
+
+
+def completed_stays(now: datetime):
+    """Reservations that have ended by `now` and have not been invoiced"""
+    return Reservation.filter(
+        Q(status=Reservation.ReservationStatus.CHECKED_OUT)
+        | Q(guest_checked_out=True)
+        | Q(check_out_date__lte=now),
+        invoice__id__isnull=True,
+    ).exclude(status=Reservation.ReservationStatus.CANCELLED)
+
+
+async def invoice_completed_stays(now: Optional[datetime] = None) -> int:
+    """Invoice every completed stay, returning how many reservations were invoiced"""
+    now = now or timezone.now()
+    invoiced = 0
+    while True:
+        batch = await completed_stays(now).limit(settings.invoice_batch_size).values_list(
+            "id", "guest__email"
+        )
+        if not batch:
+            return invoiced
+        totals = await reservation_totals([reservation_id for reservation_id, _ in batch])
+        invoices = [
+            Invoice(
+                reservation_id=reservation_id,
+                guest_email=guest_email,
+                amount=totals[reservation_id],
+            )
+            for reservation_id, guest_email in batch
+        ]
+        await Invoice.bulk_create(invoices, ignore_conflicts=True)
+        # Ids are generated here, so the skipped rows are the ones not found under them
+        invoiced += await Invoice.filter(id__in=[invoice.id for invoice in invoices]).count()
+        if len(batch) < settings.invoice_batch_size:
+            return invoiced
+
+
+async def main():
+    await Tortoise.init(config=settings.tortoise_config)
+    try:
+        invoiced = await invoice_completed_stays()
+        print(f"Invoiced {invoiced} reservation(s)")
+    finally:
+        await Tortoise.close_connections()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
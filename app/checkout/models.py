@@ -2,20 +2,35 @@ from enum import Enum
 from uuid import uuid4
 from tortoise import fields, models
 
+from ..reservations.models import Reservation
+from ..versioning import VersionMixin, make_etag
+
 
 class PaidStatus(str, Enum):
     paid = "paid"
     unpaid = "unpaid"
 
 
-class Invoice(models.Model):
+class Invoice(VersionMixin, models.Model):
     id = fields.UUIDField(pk=True, default=uuid4)
     reservation = fields.OneToOneField("models.Reservation", related_name="invoice")
     created_at = fields.DatetimeField(auto_now_add=True)
     status = fields.CharEnumField(PaidStatus, default="unpaid")
     transaction_id = fields.CharField(max_length=100, null=True)
     guest_email = fields.CharField(max_length=100)
-    amount = fields.DecimalField(max_digits=6, decimal_places=3, null=True)
+    amount = fields.DecimalField(max_digits=12, decimal_places=3, null=True)
+
+    class Meta:
+        ordering = ("-created_at",)
+        indexes = (("created_at", "id"),)
+
+    @classmethod
+    async def etag(cls, **filters) -> str:
+        invoice_id, version, reservation_id = await cls.get(**filters).values_list(
+            "id", "version", "reservation_id"
+        )
+        reservation_etag = await Reservation.etag(id=reservation_id)
+        return make_etag(cls.__name__, invoice_id, version, reservation_etag)
 
     def __str__(self) -> str:
         return f"Invoice for reservation: {self.reservation.id} - {self.guest_email}"
@@ -0,0 +1,164 @@
+"""
+Payment gateway adapters used by the checkout routes.
+
+Providers are fully asynchronous so a slow gateway only delays the checkout request that is
+waiting on it, never the event loop. Every call has its own timeout and carries an idempotency
+key derived from the invoice, so retrying a checkout can never create a second session.
+"""
+
+import asyncio
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from typing import Any, Optional
+from urllib.parse import urlencode
+from uuid import UUID, uuid4
+
+import httpx
+
+from ..config import settings
+
+
+@dataclass
+class CheckoutSession:
+    id: str
+    url: str
+
+
+class PaymentError(Exception):
+    def __init__(self, message: str, timeout: bool = False):
+        self.timeout = timeout
+        super().__init__(message)
+
+
+def idempotency_key(invoice_id: UUID) -> str:
+    return f"checkout-session-{invoice_id}"
+
+
+def encode_form(params: dict[str, Any], prefix: str = "") -> list[tuple[str, str]]:
+    """Flatten nested dicts and lists into Stripe's `a[b][0][c]=value` form encoding"""
+    pairs = []
+    items = params.items() if isinstance(params, dict) else enumerate(params)
+    for key, value in items:
+        name = f"{prefix}[{key}]" if prefix else str(key)
+        if isinstance(value, (dict, list, tuple)):
+            pairs.extend(encode_form(value, name))
+        elif isinstance(value, bool):
+            pairs.append((name, "true" if value else "false"))
+        elif value is not None:
+            pairs.append((name, str(value)))
+    return pairs
+
+
+class PaymentProvider(ABC):
+    async def start(self):
+        pass
+
+    async def close(self):
+        pass
+
+    @abstractmethod
+    async def create_checkout_session(
+        self, invoice_id: UUID, params: dict[str, Any]
+    ) -> CheckoutSession:
+        ...
+
+
+class StripeProvider(PaymentProvider):
+    def __init__(
+        self,
+        api_key: str,
+        base_url: str,
+        timeout: float,
+        connect_timeout: float,
+        max_connections: int,
+    ):
+        self.api_key = api_key
+        self.base_url = base_url
+        self.timeout = httpx.Timeout(timeout, connect=connect_timeout)
+        self.limits = httpx.Limits(
+            max_connections=max_connections, max_keepalive_connections=max_connections
+        )
+        self._client: Optional[httpx.AsyncClient] = None
+
+    async def start(self):
+        if self._client is None:
+            # One pooled client for the whole process keeps TLS connections warm
+            self._client = httpx.AsyncClient(
+                base_url=self.base_url,
+                auth=(self.api_key, ""),
+                timeout=self.timeout,
+                limits=self.limits,
+            )
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def create_checkout_session(
+        self, invoice_id: UUID, params: dict[str, Any]
+    ) -> CheckoutSession:
+        await self.start()
+        try:
+            response = await self._client.post(
+                "/checkout/sessions",
+                content=urlencode(encode_form(params)),
+                headers={
+                    "Content-Type": "application/x-www-form-urlencoded",
+                    "Idempotency-Key": idempotency_key(invoice_id),
+                },
+            )
+        except httpx.TimeoutException as e:
+            raise PaymentError(f"Payment provider timed out: {e}", timeout=True) from e
+        except httpx.HTTPError as e:
+            raise PaymentError(f"Payment provider unreachable: {e}") from e
+        if response.is_error:
+            try:
+                message = response.json()["error"]["message"]
+            except (ValueError, KeyError):
+                message = response.text
+            raise PaymentError(f"Payment provider error: {message}")
+        session = response.json()
+        return CheckoutSession(id=session["id"], url=session["url"])
+
+
+class FakePaymentProvider(PaymentProvider):
+    """In-process provider for tests and benchmarks, with optional simulated latency"""
+
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self.sessions: dict[str, CheckoutSession] = {}
+        self.requests: list[dict[str, Any]] = []
+
+    async def create_checkout_session(
+        self, invoice_id: UUID, params: dict[str, Any]
+    ) -> CheckoutSession:
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        self.requests.append(params)
+        key = idempotency_key(invoice_id)
+        if key not in self.sessions:
+            session_id = f"cs_fake_{uuid4().hex}"
+            self.sessions[key] = CheckoutSession(
+                id=session_id, url=f"{settings.host_url}/checkout/fake/{session_id}"
+            )
+        return self.sessions[key]
+
+
+def build_payment_provider() -> PaymentProvider:
+    if settings.payment_provider == "fake":
+        return FakePaymentProvider()
+    return StripeProvider(
+        api_key=settings.stripe_secret_key,
+        base_url=settings.stripe_api_base,
+        timeout=settings.payment_timeout,
+        connect_timeout=settings.payment_connect_timeout,
+        max_connections=settings.payment_max_connections,
+    )
+
+
+payment_provider = build_payment_provider()
+
+
+def get_payment_provider() -> PaymentProvider:
+    return payment_provider
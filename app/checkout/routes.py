@@ -1,28 +1,37 @@
+from datetime import date
 from typing import Optional
 from uuid import UUID
 
-import stripe
-from fastapi import APIRouter, Depends, HTTPException, Security
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, Security
 from fastapi.responses import RedirectResponse
+from tortoise.transactions import in_transaction
 
 from ..users.models import Admin, BaseUser, Guest
+from .billing import invoice_completed_stays
 from .models import Invoice, PaidStatus
+from ..analytics.rollups import reservation_stays, track_stays
 from ..auth.utils import authorize_obj_access, get_current_active_user
 from ..config import settings
+from ..exports import ExportFormat, export_response, filter_date_range
+from ..pagination import Page, PageParams, paginate
+from ..pricing.engine import reservation_price
 from ..reservations.models import Reservation
-from ..schemas import Invoice_Pydantic, InvoiceUpdate
+from ..versioning import etag_matches, not_modified
+from .payments import PaymentError, PaymentProvider, get_payment_provider
+from .schema import Invoice_Pydantic, InvoiceUpdate
 
 
 invoice_router = APIRouter(prefix="/invoices", tags=["Invoices"])
+# Mounted under the admin routers, which require an authenticated admin
+admin_invoice_router = APIRouter(prefix="/invoices", tags=["Invoices"])
 checkout_router = APIRouter(prefix="/checkout", tags=["Checkout"])
 
-stripe.api_key = settings.stripe_secret_key
 
-
-@invoice_router.get("/", response_model=list[Invoice_Pydantic])
+@invoice_router.get("/", response_model=Page[Invoice_Pydantic])
 async def get_invoices(
     status: Optional[PaidStatus] = None,
     guest_email: Optional[str] = None,
+    page: PageParams = Depends(),
     current_user: Admin = Security(get_current_active_user, scopes=["admin-read"])
 ):
     query = Invoice.all()
@@ -30,20 +39,55 @@ async def get_invoices(
         query = query.filter(status=status)
     if guest_email:
         query = query.filter(guest_email=guest_email)
-    return await Invoice_Pydantic.from_queryset(query)
+    return await paginate(query, Invoice_Pydantic, page)
+
+
+@admin_invoice_router.get("/export")
+async def export_invoices(
+    format: ExportFormat = ExportFormat.NDJSON,
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    status: Optional[PaidStatus] = None,
+):
+    """Stream invoices created within `[date_from, date_to]`"""
+    query = filter_date_range(Invoice.all(), "created_at", date_from, date_to)
+    if status:
+        query = query.filter(status=status)
+    fields = [
+        "id",
+        "reservation_id",
+        "created_at",
+        "status",
+        "transaction_id",
+        "guest_email",
+        "amount",
+    ]
+    return export_response(query, fields, format, "invoices")
+
+
+@admin_invoice_router.post("/batch", response_model=dict[str, int])
+async def invoice_completed_reservations():
+    """Night audit: invoice every reservation checked out or past its check-out date"""
+    return {"invoiced": await invoice_completed_stays()}
 
 
 @invoice_router.get("/{invoice_id}", response_model=Invoice_Pydantic)
 async def get_invoice(
-    invoice_id: UUID, 
+    invoice_id: UUID,
+    request: Request,
+    response: Response,
     current_user: BaseUser = Depends(get_current_active_user)
 ):
-    invoice = await Invoice.get(id=invoice_id)
+    guest_email = await Invoice.get(id=invoice_id).values_list("guest_email", flat=True)
     if not current_user.is_admin:
         try:
-            assert current_user.email == invoice.guest_email
+            assert current_user.email == guest_email
         except AssertionError:
             raise HTTPException(403, "Unauthorized access")
+    etag = await Invoice.etag(id=invoice_id)
+    if etag_matches(request, etag):
+        return not_modified(etag)
+    response.headers["ETag"] = etag
     return await Invoice_Pydantic.from_queryset_single(Invoice.get(id=invoice_id))
 
 
@@ -55,7 +99,7 @@ async def create_invoice(
     reservation = await Reservation.get(id=reservation_id).prefetch_related("guest")
     invoice = await Invoice.create(
         reservation_id=reservation.id,
-        amount=reservation.reservation_due(),
+        amount=await reservation_price(reservation.id),
         guest_email=reservation.guest.email
     )
     return await Invoice_Pydantic.from_tortoise_orm(invoice)
@@ -81,66 +125,68 @@ async def delete_invoice(
     current_user: Admin = Security(get_current_active_user, scopes=["admin-write"])
 ):
     invoice = await Invoice.get(id=invoice_id)
-    await invoice.delete()
+    async with in_transaction("default"), track_stays(reservation_stays(invoice.reservation_id)):
+        await invoice.delete()
     return {}
 
 
 @checkout_router.post("/session/{invoice_id}")
 async def create_checkout_session(
     invoice_id: UUID,
-    current_user: Guest = Depends(get_current_active_user)
+    current_user: Guest = Depends(get_current_active_user),
+    payment_provider: PaymentProvider = Depends(get_payment_provider),
 ):
     invoice = await Invoice.get(id=invoice_id)
-    reservation = await Reservation.get(id=invoice.reservation_id).prefetch_related("room", "guest")
-    try:
-        desc = f"Reservation for {reservation.room.room_type} Room (Room #{reservation.room.room_number})"
-        checkout_session = stripe.checkout.Session.create(
-            line_items=[
-                {
-                    "quantity": 1,
-                    "price_data": {
-                        "currency": "usd", 
-                        "unit_amount": int(invoice.amount*100), 
-                        "product_data": {
-                            "name": "Room Reservation",
-                            "description": desc
-                        }
+    reservation = await Reservation.get(id=invoice.reservation_id).prefetch_related(
+        "rooms", "guest"
+    )
+    rooms = list(reservation.rooms)
+    room_numbers = ", ".join(f"#{room.room_number}" for room in rooms)
+    room_types = ", ".join(sorted({str(room.room_type.value) for room in rooms if room.room_type}))
+    desc = f"Reservation for {room_types} Room (Room {room_numbers})"
+    params = {
+        "line_items": [
+            {
+                "quantity": 1,
+                "price_data": {
+                    "currency": "usd",
+                    "unit_amount": int(invoice.amount * 100),
+                    "product_data": {"name": "Room Reservation", "description": desc},
+                },
+            },
+            {
+                "quantity": 1,
+                "price_data": {
+                    "currency": "usd",
+                    "unit_amount": 5500,
+                    "product_data": {
+                        "name": "Room Service",
+                        "description": "Additional Room Service Fee",
                     },
                 },
-                {
-                    "quantity": 1,
-                    "price_data": {
-                        "currency": "usd",
-                        "unit_amount": 5500,
-                        "product_data": {
-                            "name": "Room Service",
-                            "description": "Additional Room Service Fee"
-                        }
-                    }
-                }
-            ],
-            guest_email=invoice.guest_email,
-            mode="payment",
-            success_url=f"{settings.host_url}/checkout/success?session_id={{CHECKOUT_SESSION_ID}}",
-            cancel_url=f"{settings.host_url}/checkout/cancelled",
-            payment_method_types=["card", "paypal"],
-            payment_intent_data={
-                "description": desc,
-                "metadata": {
-                    "Reservation ID": str(reservation.id),
-                    "guest name": reservation.guest.full_name(),
-                    "guest email": reservation.guest.email,
-                    "Room number": reservation.room.room_number,
-                    "Room type": reservation.room.room_type,
-                }
             },
-            invoice_creation={
-                "enabled": True,
-                "invoice_data": {"description": desc}
-            }
-        )
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        ],
+        "customer_email": invoice.guest_email,
+        "mode": "payment",
+        "success_url": f"{settings.host_url}/checkout/success?session_id={{CHECKOUT_SESSION_ID}}",
+        "cancel_url": f"{settings.host_url}/checkout/cancelled",
+        "payment_method_types": ["card", "paypal"],
+        "payment_intent_data": {
+            "description": desc,
+            "metadata": {
+                "Reservation ID": str(reservation.id),
+                "guest name": reservation.guest.full_name(),
+                "guest email": reservation.guest.email,
+                "Room number": room_numbers,
+                "Room type": room_types,
+            },
+        },
+        "invoice_creation": {"enabled": True, "invoice_data": {"description": desc}},
+    }
+    try:
+        checkout_session = await payment_provider.create_checkout_session(invoice.id, params)
+    except PaymentError as e:
+        raise HTTPException(status_code=504 if e.timeout else 502, detail=str(e))
     invoice.transaction_id = checkout_session.id
     await invoice.save()
     return RedirectResponse(checkout_session.url, status_code=303)
@@ -152,8 +198,9 @@ async def payment_successful(
     current_user: Guest = Depends(get_current_active_user)
 ):
     invoice = await Invoice.get(transaction_id=session_id)
-    invoice.status = PaidStatus.paid
-    await invoice.save()
+    async with in_transaction("default"), track_stays(reservation_stays(invoice.reservation_id)):
+        invoice.status = PaidStatus.paid
+        await invoice.save()
     return {"message": "Payment Successful"}
 
 
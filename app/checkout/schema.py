@@ -0,0 +1,11 @@
+from pydantic import BaseModel, EmailStr
+from tortoise.contrib.pydantic import pydantic_model_creator
+
+from .models import Invoice
+
+
+Invoice_Pydantic = pydantic_model_creator(Invoice, name="Invoice")
+
+
+class InvoiceUpdate(BaseModel):
+    email: EmailStr
@@ -0,0 +1,175 @@
+"""
+Database connection profiles, pool metrics and the startup check.
+
+`settings.database_profile` selects the default connection: a local SQLite file for
+development, or Postgres through the instrumented asyncpg backend in `app.database.asyncpg`,
+whose pool size, statement cache, timeouts and connection lifetime all come from settings.
+Every acquisition from that pool is timed, so saturation and wait times can be read from
+`database_metrics()`.
+"""
+
+import asyncio
+import logging
+import time
+from collections import deque
+
+from tortoise import connections
+
+from ..config import settings
+
+
+logger = logging.getLogger(__name__)
+
+
+def _percentile(values: list[float], percentile: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * percentile))]
+
+
+class PoolMetrics:
+    """Acquisition counters and wait times of one connection pool"""
+
+    def __init__(self, max_size: int, window: int = 1024):
+        self.max_size = max_size
+        self.acquired = 0
+        self.saturated = 0
+        self.timeouts = 0
+        self.in_use = 0
+        self.peak_in_use = 0
+        self.waiting = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+        self._recent_waits: deque[float] = deque(maxlen=window)
+        self._started = time.monotonic()
+
+    def start_acquire(self) -> bool:
+        """Register a pending acquisition, returning whether it will have to queue"""
+        saturated = self.in_use + self.waiting >= self.max_size
+        self.waiting += 1
+        return saturated
+
+    def record_acquire(self, waited: float, saturated: bool):
+        self.waiting -= 1
+        self.acquired += 1
+        self.saturated += saturated
+        self.in_use += 1
+        self.peak_in_use = max(self.peak_in_use, self.in_use)
+        self._record_wait(waited)
+
+    def record_timeout(self, waited: float):
+        self.waiting -= 1
+        self.timeouts += 1
+        self._record_wait(waited)
+
+    def record_abandoned(self):
+        self.waiting -= 1
+
+    def record_release(self):
+        self.in_use -= 1
+
+    def _record_wait(self, waited: float):
+        self.wait_seconds_total += waited
+        self.wait_seconds_max = max(self.wait_seconds_max, waited)
+        self._recent_waits.append(waited)
+
+    def snapshot(self, size: int, idle: int) -> dict:
+        recent = list(self._recent_waits)
+        return {
+            "max_size": self.max_size,
+            "size": size,
+            "idle": idle,
+            "in_use": self.in_use,
+            "peak_in_use": self.peak_in_use,
+            "waiting": self.waiting,
+            "utilization": self.in_use / self.max_size if self.max_size else 0.0,
+            "acquired_total": self.acquired,
+            # Acquisitions that found every connection checked out and had to queue
+            "saturated_total": self.saturated,
+            "timeouts_total": self.timeouts,
+            "wait_seconds_total": self.wait_seconds_total,
+            "wait_seconds_avg": self.wait_seconds_total / self.acquired if self.acquired else 0.0,
+            "wait_seconds_max": self.wait_seconds_max,
+            "wait_seconds_p50": _percentile(recent, 0.50),
+            "wait_seconds_p95": _percentile(recent, 0.95),
+            "wait_seconds_p99": _percentile(recent, 0.99),
+            "uptime_seconds": time.monotonic() - self._started,
+        }
+
+
+class InstrumentedPool:
+    """Wraps an asyncpg pool to time every acquisition; everything else is delegated"""
+
+    def __init__(self, pool, acquire_timeout: float):
+        self._pool = pool
+        self.acquire_timeout = acquire_timeout
+        self.metrics = PoolMetrics(pool.get_max_size())
+
+    async def acquire(self):
+        saturated = self.metrics.start_acquire()
+        started = time.perf_counter()
+        try:
+            connection = await self._pool.acquire(timeout=self.acquire_timeout)
+        except asyncio.TimeoutError:
+            self.metrics.record_timeout(time.perf_counter() - started)
+            raise
+        except BaseException:
+            # Cancelled while queueing, e.g. the client disconnected
+            self.metrics.record_abandoned()
+            raise
+        self.metrics.record_acquire(time.perf_counter() - started, saturated)
+        return connection
+
+    async def release(self, connection):
+        self.metrics.record_release()
+        await self._pool.release(connection)
+
+    def snapshot(self) -> dict:
+        return self.metrics.snapshot(self._pool.get_size(), self._pool.get_idle_size())
+
+    def __getattr__(self, name):
+        return getattr(self._pool, name)
+
+
+def database_metrics() -> dict:
+    """Pool metrics of every pooled connection that has been opened, keyed by connection name"""
+    metrics = {}
+    for client in connections.all():
+        pool = getattr(client, "_pool", None)
+        if isinstance(pool, InstrumentedPool):
+            metrics[client.connection_name] = pool.snapshot()
+    return metrics
+
+
+async def check_database(connection_name: str = "default"):
+    """
+    Fail startup early when the database is unreachable, and open the pool's minimum number
+    of connections before the first request instead of during it.
+    """
+    if settings.db_pool_min_size > settings.db_pool_max_size:
+        raise RuntimeError("db_pool_min_size must not be larger than db_pool_max_size")
+    client = connections.get(connection_name)
+    dialect = client.capabilities.dialect
+    try:
+        await client.execute_query("SELECT 1")
+    except Exception as e:
+        raise RuntimeError(f"Database connection {connection_name!r} is unavailable: {e}") from e
+
+    if dialect != "postgres":
+        logger.info(f"Database connection {connection_name!r} ready ({dialect})")
+        return
+    [server] = await client.execute_query_dict(
+        "SELECT current_setting('server_version') AS version, "
+        "current_setting('max_connections')::int AS max_connections"
+    )
+    max_connections = server["max_connections"]
+    if settings.db_pool_max_size >= max_connections:
+        logger.warning(
+            f"db_pool_max_size={settings.db_pool_max_size} per worker leaves no headroom "
+            f"below the server's max_connections={max_connections}"
+        )
+    logger.info(
+        f"Database connection {connection_name!r} ready (PostgreSQL {server['version']}, "
+        f"pool {settings.db_pool_min_size}-{settings.db_pool_max_size})"
+    )
@@ -0,0 +1,20 @@
+"""
+Tortoise engine for the Postgres profile: the stock asyncpg client with an instrumented pool.
+
+Selected with `"engine": "app.database.asyncpg"`; credentials are the same as for
+`tortoise.backends.asyncpg`.
+"""
+
+from tortoise.backends.asyncpg.client import AsyncpgDBClient
+
+from ..config import settings
+from . import InstrumentedPool
+
+
+class InstrumentedAsyncpgClient(AsyncpgDBClient):
+    async def create_pool(self, **kwargs) -> InstrumentedPool:
+        pool = await super().create_pool(**kwargs)
+        return InstrumentedPool(pool, settings.db_pool_acquire_timeout)
+
+
+client_class = InstrumentedAsyncpgClient
@@ -0,0 +1,17 @@
+from fastapi.routing import APIRouter
+
+from . import database_metrics
+from .routing import replica_monitor
+
+
+database_router = APIRouter(tags=["Database"])
+
+
+@database_router.get("/pool", response_model=dict)
+async def get_pool_metrics():
+    return database_metrics()
+
+
+@database_router.get("/replicas", response_model=dict)
+async def get_replica_status():
+    return replica_monitor.status()
@@ -0,0 +1,177 @@
+"""
+Read-replica routing.
+
+Routers that serve reads declare `Depends(route_reads)`. For GET and HEAD requests it lets
+Tortoise send that request's queries to a replica connection (`replica_0`, `replica_1`, ...);
+every other request, and all code outside a request, keeps using the primary `default`
+connection. Reads are pinned to the primary in three further cases:
+
+- inside a transaction, so a transaction never mixes primary and replica data;
+- within `pin_primary()`, for reads that must observe a write made earlier in the same flow;
+- for `db_replica_max_lag` seconds after the same client sent a write request, tracked with a
+  cookie set by the `mark_writes` middleware, so clients read their own writes.
+
+`ReplicaMonitor` polls each replica's replication lag and takes replicas lagging by more than
+`db_replica_max_lag` out of rotation until they catch up.
+"""
+
+import asyncio
+import itertools
+import logging
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Optional
+
+from fastapi import Request, Response
+from tortoise import connections
+from tortoise.backends.base.client import BaseTransactionWrapper
+
+from ..config import settings
+
+
+logger = logging.getLogger(__name__)
+
+LAST_WRITE_COOKIE = "last_write"
+SAFE_METHODS = ("GET", "HEAD")
+
+# Whether queries of the current request may go to a replica
+_replica_reads: ContextVar[bool] = ContextVar("replica_reads", default=False)
+
+
+def replica_names() -> list[str]:
+    return [f"replica_{index}" for index in range(len(settings.replica_urls))]
+
+
+class ReplicaMonitor:
+    def __init__(self, names: list[str], max_lag: float, interval: float):
+        self.names = names
+        self.max_lag = max_lag
+        self.interval = interval
+        self.lag: dict[str, Optional[float]] = {name: None for name in names}
+        self.available: list[str] = []
+        self._rotation = itertools.cycle(())
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        if self.names and self._task is None:
+            self._task = asyncio.create_task(self._run(), name="replica-monitor")
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        while True:
+            await self.check()
+            await asyncio.sleep(self.interval)
+
+    async def measure_lag(self, name: str) -> float:
+        client = connections.get(name)
+        if client.capabilities.dialect != "postgres":
+            # SQLite "replicas" are extra connections to the same file, useful for local testing
+            await client.execute_query("SELECT 1")
+            return 0.0
+        [row] = await client.execute_query_dict(
+            "SELECT CASE WHEN NOT pg_is_in_recovery() "
+            "OR pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 "
+            "ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()) END AS lag"
+        )
+        return float(row["lag"] or 0.0)
+
+    async def check(self):
+        available = []
+        for name in self.names:
+            try:
+                self.lag[name] = await self.measure_lag(name)
+            except Exception as e:
+                logger.warning(f"Replica {name} is unreachable: {e}")
+                self.lag[name] = None
+                continue
+            if self.lag[name] <= self.max_lag:
+                available.append(name)
+        if available != self.available:
+            logger.info(f"Replicas in rotation: {available or 'none, reading from primary'}")
+            self.available = available
+            self._rotation = itertools.cycle(available)
+
+    def choose(self) -> Optional[str]:
+        """Next replica in rotation, or None when every replica is lagging or down"""
+        return next(self._rotation, None)
+
+    def status(self) -> dict:
+        return {
+            "max_lag_seconds": self.max_lag,
+            "replicas": {
+                name: {"lag_seconds": self.lag[name], "in_rotation": name in self.available}
+                for name in self.names
+            },
+        }
+
+
+replica_monitor = ReplicaMonitor(
+    replica_names(), settings.db_replica_max_lag, settings.db_replica_check_interval
+)
+
+
+class ReplicaRouter:
+    """Tortoise connection router, enabled in `settings.tortoise_config` when replicas exist"""
+
+    def db_for_read(self, model) -> Optional[str]:
+        if not _replica_reads.get():
+            return None
+        primary = connections.get(model._meta.default_connection)
+        if isinstance(primary, BaseTransactionWrapper):
+            return None
+        return replica_monitor.choose()
+
+    def db_for_write(self, model) -> Optional[str]:
+        return None
+
+
+@contextmanager
+def pin_primary():
+    """Read from the primary within this block, e.g. right after a write in the same flow"""
+    token = _replica_reads.set(False)
+    try:
+        yield
+    finally:
+        _replica_reads.reset(token)
+
+
+async def route_reads(request: Request):
+    """Router dependency that sends the reads of safe requests to a replica"""
+    if request.method in SAFE_METHODS:
+        try:
+            last_write = float(request.cookies.get(LAST_WRITE_COOKIE, 0))
+        except ValueError:
+            last_write = 0.0
+        _replica_reads.set(time.time() - last_write > settings.db_replica_max_lag)
+    else:
+        _replica_reads.set(False)
+    try:
+        yield
+    finally:
+        _replica_reads.set(False)
+
+
+async def mark_writes(request: Request, call_next) -> Response:
+    """
+    HTTP middleware stamping the responses to write requests with the read-your-writes cookie.
+    A dependency cannot do it: FastAPI drops its response headers when a route returns its own
+    `Response`.
+    """
+    response = await call_next(request)
+    if request.method not in SAFE_METHODS:
+        response.set_cookie(
+            LAST_WRITE_COOKIE,
+            str(time.time()),
+            max_age=max(1, int(settings.db_replica_max_lag + 1)),
+            httponly=True,
+        )
+    return response
@@ -0,0 +1,279 @@
+"""
+Dispatch of guest requests to staff.
+
+Pending requests are kept in memory in one priority queue per `RequestType`: a heap ordered by
+`RequestPriority` (urgent first, requests without a priority last) and then by age, so the next
+request to handle is found in O(log n). Claims are decided by the database with a conditional
+UPDATE of a pending row, so of two staff members claiming the same request exactly one wins,
+whichever worker they reach.
+
+Every change is pushed to the subscribers of its request type as a Server-Sent Event. Changes
+made by other workers are picked up by the sync task, which reads the requests updated since its
+last pass every `settings.dispatch_sync_interval` seconds: one indexed query per process instead
+of one full-table query per polling tablet. The window is widened by
+`settings.dispatch_sync_overlap` seconds to tolerate clock skew between workers, and changes
+already applied are recognised by their `updated` time and not pushed twice.
+"""
+
+import asyncio
+import heapq
+import logging
+from collections import Counter
+from datetime import datetime, timedelta
+from typing import AsyncIterator, Iterable, Optional
+from uuid import UUID
+
+from tortoise import timezone
+from tortoise.queryset import QuerySet
+
+from ..config import settings
+from ..serialization import dumps
+from .models import GuestRequest, RequestPriority, RequestStatus, RequestType
+
+
+logger = logging.getLogger(__name__)
+
+PRIORITY_RANK = {
+    RequestPriority.URGENT: 0,
+    RequestPriority.HIGH: 1,
+    RequestPriority.MEDIUM: 2,
+    RequestPriority.LOW: 3,
+}
+# Columns of the request payloads kept in the queue and pushed to subscribers
+FIELDS = (
+    "id",
+    "request",
+    "request_type",
+    "request_status",
+    "priority",
+    "extra",
+    "created",
+    "updated",
+    "claimed_by_id",
+    "claimed_at",
+)
+
+
+def queue_key(row: dict) -> tuple[int, datetime]:
+    return PRIORITY_RANK.get(row["priority"], len(PRIORITY_RANK)), row["created"]
+
+
+def server_event(event: str, data) -> bytes:
+    return b"event: " + event.encode() + b"\ndata: " + dumps(data) + b"\n\n"
+
+
+class Subscriber:
+    __slots__ = ("request_types", "events")
+
+    def __init__(self, request_types: set[RequestType], max_events: int):
+        self.request_types = request_types
+        self.events: asyncio.Queue = asyncio.Queue(max_events)
+
+    def wants(self, row: dict) -> bool:
+        return not self.request_types or row["request_type"] in self.request_types
+
+
+class DispatchQueue:
+    def __init__(self, sync_interval: float = 2.0, sync_overlap: float = 5.0):
+        self.sync_interval = sync_interval
+        self.sync_overlap = timedelta(seconds=sync_overlap)
+        self._heaps: dict[RequestType, list[tuple[int, datetime, int]]] = {
+            request_type: [] for request_type in RequestType
+        }
+        self._keys: dict[int, tuple[int, datetime]] = {}
+        self._pending: dict[int, dict] = {}
+        self._live: Counter = Counter()
+        # `updated` of the last change applied per request, to push each change only once
+        self._seen: dict[int, datetime] = {}
+        self._subscribers: set[Subscriber] = set()
+        self._cursor: Optional[datetime] = None
+        self._task: Optional[asyncio.Task] = None
+
+    @staticmethod
+    def _rows(query: QuerySet):
+        return query.order_by("updated", "id").values(*FIELDS, room_number="room__room_number")
+
+    async def load(self):
+        """(Re)build the queues from the pending requests"""
+        cursor = timezone.now()
+        rows = await self._rows(GuestRequest.filter(request_status=RequestStatus.PENDING))
+        self._heaps = {request_type: [] for request_type in RequestType}
+        self._keys, self._pending, self._seen = {}, {}, {}
+        self._live = Counter()
+        for row in rows:
+            self._apply(row)
+        self._cursor = cursor
+        logger.info(f"Dispatch queue loaded: {len(rows)} pending requests")
+
+    def _apply(self, row: dict) -> bool:
+        request_id = row["id"]
+        seen = self._seen.get(request_id)
+        if seen is not None and row["updated"] <= seen:
+            return False
+        self._seen[request_id] = row["updated"]
+        if row["request_status"] == RequestStatus.PENDING:
+            key = queue_key(row)
+            if self._keys.get(request_id) != key:
+                if request_id not in self._keys:
+                    self._live[row["request_type"]] += 1
+                heapq.heappush(self._heaps[row["request_type"]], (*key, request_id))
+                self._keys[request_id] = key
+            self._pending[request_id] = row
+        else:
+            self._discard(request_id)
+        return True
+
+    def _discard(self, request_id: int):
+        # Its heap entries are dropped when they reach the top or the heap is compacted
+        if self._keys.pop(request_id, None) is not None:
+            self._live[self._pending.pop(request_id)["request_type"]] -= 1
+
+    def _is_live(self, entry: tuple[int, datetime, int]) -> bool:
+        return self._keys.get(entry[2]) == entry[:2]
+
+    def _compact(self):
+        for request_type, heap in self._heaps.items():
+            if len(heap) > 2 * self._live[request_type] + 64:
+                self._heaps[request_type] = [entry for entry in heap if self._is_live(entry)]
+                heapq.heapify(self._heaps[request_type])
+
+    def peek(self, request_type: RequestType) -> Optional[int]:
+        """Id of the next request of `request_type` to handle"""
+        heap = self._heaps.get(request_type, [])
+        while heap and not self._is_live(heap[0]):
+            heapq.heappop(heap)
+        return heap[0][2] if heap else None
+
+    def pending(self, request_type: Optional[RequestType] = None, limit: int = 50) -> list[dict]:
+        """The next `limit` requests to handle, of one type or of all of them"""
+        heaps = self._heaps.values() if request_type is None else [self._heaps[request_type]]
+        entries = (entry for heap in heaps for entry in heap if self._is_live(entry))
+        return [self._pending[entry[2]] for entry in heapq.nsmallest(limit, entries)]
+
+    def _publish(self, row: dict):
+        for subscriber in list(self._subscribers):
+            if not subscriber.wants(row):
+                continue
+            try:
+                subscriber.events.put_nowait(row)
+            except asyncio.QueueFull:
+                # Too slow to keep up: disconnect it, the client reconnects to a fresh snapshot
+                self._subscribers.discard(subscriber)
+                while not subscriber.events.empty():
+                    subscriber.events.get_nowait()
+                subscriber.events.put_nowait(None)
+
+    def apply(self, row: dict) -> bool:
+        """Mirror a request row in the queues and push it, unless it was already applied"""
+        if not self._apply(row):
+            return False
+        self._publish(row)
+        return True
+
+    async def refresh(self, request_id: int) -> Optional[dict]:
+        """Re-read a request after a write, pushing the change. None if it does not exist."""
+        row = await self._rows(GuestRequest.filter(id=request_id).first())
+        if row is None:
+            self._discard(request_id)
+            return None
+        self.apply(row)
+        return row
+
+    async def claim(self, request_id: int, admin_id: UUID) -> Optional[dict]:
+        """Assign a pending request to `admin_id`, None if it is no longer pending"""
+        now = timezone.now()
+        claimed = await GuestRequest.filter(
+            id=request_id, request_status=RequestStatus.PENDING
+        ).update(
+            request_status=RequestStatus.IN_PROGRESS,
+            claimed_by_id=admin_id,
+            claimed_at=now,
+            updated=now,
+        )
+        row = await self.refresh(request_id)
+        return row if claimed else None
+
+    async def claim_next(self, request_type: RequestType, admin_id: UUID) -> Optional[dict]:
+        """Claim the most urgent, then oldest, pending request of `request_type`"""
+        while (request_id := self.peek(request_type)) is not None:
+            # A failed claim refreshes the request, taking it off the queue
+            row = await self.claim(request_id, admin_id)
+            if row is not None:
+                return row
+        return None
+
+    async def set_status(self, request_id: int, status: RequestStatus) -> Optional[dict]:
+        """Move a request to `status`, back to pending releases its claim"""
+        values = {"request_status": status, "updated": timezone.now()}
+        if status == RequestStatus.PENDING:
+            values.update(claimed_by_id=None, claimed_at=None)
+        if not await GuestRequest.filter(id=request_id).update(**values):
+            return None
+        return await self.refresh(request_id)
+
+    async def events(
+        self, request_types: Iterable[RequestType] = (), keepalive: float = 15.0
+    ) -> AsyncIterator[bytes]:
+        """Server-Sent Events: a snapshot of the pending requests, then every change"""
+        subscriber = Subscriber(set(request_types), settings.dispatch_max_events)
+        self._subscribers.add(subscriber)
+        try:
+            snapshot = [
+                row
+                for request_type in subscriber.request_types or RequestType
+                for row in self.pending(request_type, limit=settings.page_max_limit)
+            ]
+            yield server_event("snapshot", snapshot)
+            while True:
+                try:
+                    row = await asyncio.wait_for(subscriber.events.get(), keepalive)
+                except asyncio.TimeoutError:
+                    yield b": keepalive\n\n"
+                    continue
+                if row is None:
+                    return
+                yield server_event("request", row)
+        finally:
+            self._subscribers.discard(subscriber)
+
+    async def sync(self) -> int:
+        """Apply the changes made since the last pass, returns how many were new"""
+        if self._cursor is None:
+            await self.load()
+            return 0
+        cursor = timezone.now()
+        since = self._cursor - self.sync_overlap
+        applied = 0
+        for row in await self._rows(GuestRequest.filter(updated__gt=since)):
+            applied += self.apply(row)
+        self._cursor = cursor
+        # Rows this old are never read again
+        self._seen = {
+            request_id: updated for request_id, updated in self._seen.items() if updated > since
+        }
+        self._compact()
+        return applied
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run(), name="dispatch-sync")
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        while True:
+            try:
+                await self.sync()
+            except Exception as e:
+                logger.exception(f"Dispatch sync failed: {e}")
+            await asyncio.sleep(self.sync_interval)
+
+
+dispatch_queue = DispatchQueue(settings.dispatch_sync_interval, settings.dispatch_sync_overlap)
@@ -41,6 +41,15 @@ class GuestRequest(models.Model):
     reservation = fields.ForeignKeyField(
         "models.Reservation", related_name="requests", null=True
     )
+    claimed_by = fields.ForeignKeyField(
+        "models.Admin", related_name="claimed_requests", null=True, on_delete=fields.SET_NULL
+    )
+    claimed_at = fields.DatetimeField(null=True)
+
+    class Meta:
+        ordering = ("-created",)
+        # `updated` is scanned by the dispatch sync, see `app.guest_requests.dispatch`
+        indexes = (("created", "id"), ("updated", "id"))
 
     class PydanticMeta:
-        exclude = ("reservation",)
+        exclude = ("reservation", "claimed_by")
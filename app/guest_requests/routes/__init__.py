@@ -1 +1,2 @@
+from .admin import dispatch_router
 from .guests import guest_request_router as guest_request
@@ -0,0 +1,75 @@
+from typing import Optional
+
+from fastapi import HTTPException, Query, Security
+from fastapi.responses import StreamingResponse
+from fastapi.routing import APIRouter
+
+from ..dispatch import dispatch_queue
+from ..models import GuestRequest, RequestType
+from ..schema import DispatchedRequest, RequestStatusUpdate
+from ...auth.utils import get_current_active_user
+from ...config import settings
+from ...serialization import FastJSONResponse
+from ...users.models import Admin
+
+
+dispatch_router = APIRouter(tags=["Guest Request"])
+
+
+@dispatch_router.get("/queue", response_model=list[DispatchedRequest])
+async def get_dispatch_queue(
+    request_type: Optional[RequestType] = None,
+    limit: int = Query(settings.page_default_limit, ge=1, le=settings.page_max_limit),
+):
+    """Pending requests, most urgent and then oldest first, served from memory"""
+    return FastJSONResponse(dispatch_queue.pending(request_type, limit))
+
+
+@dispatch_router.get("/events")
+async def stream_request_events(request_type: Optional[list[RequestType]] = Query(None)):
+    """
+    Server-Sent Events for the given request types (all by default): a `snapshot` event with
+    the pending requests, then a `request` event for every new or updated request
+    """
+    return StreamingResponse(
+        dispatch_queue.events(request_type or (), settings.dispatch_keepalive),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@dispatch_router.post("/claim", response_model=DispatchedRequest)
+async def claim_next_request(
+    request_type: RequestType,
+    current_user: Admin = Security(get_current_active_user, scopes=["admin-write"]),
+):
+    claimed = await dispatch_queue.claim_next(request_type, current_user.uid)
+    if claimed is None:
+        raise HTTPException(404, f"No pending {request_type.value} request")
+    return FastJSONResponse(claimed)
+
+
+@dispatch_router.post("/{request_id}/claim", response_model=DispatchedRequest)
+async def claim_request(
+    request_id: int,
+    current_user: Admin = Security(get_current_active_user, scopes=["admin-write"]),
+):
+    claimed = await dispatch_queue.claim(request_id, current_user.uid)
+    if claimed is None:
+        if not await GuestRequest.exists(id=request_id):
+            raise HTTPException(404, "Request not found")
+        raise HTTPException(409, "Request has already been claimed")
+    return FastJSONResponse(claimed)
+
+
+@dispatch_router.put("/{request_id}/status", response_model=DispatchedRequest)
+async def update_request_status(
+    request_id: int,
+    data: RequestStatusUpdate,
+    current_user: Admin = Security(get_current_active_user, scopes=["admin-write"]),
+):
+    """Completes a request, or puts it back in the queue with `pending`"""
+    updated = await dispatch_queue.set_status(request_id, data.request_status)
+    if updated is None:
+        raise HTTPException(404, "Request not found")
+    return FastJSONResponse(updated)
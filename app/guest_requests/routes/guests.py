@@ -1,17 +1,68 @@
+from typing import Optional
+
 from fastapi import Depends, HTTPException
 from fastapi.routing import APIRouter
-from tortoise.transactions import in_transaction
+from tortoise import timezone
 
-from ..models import GuestRequest
-from ..schema import GuestRequest_In, GuestRequest_Pydantic, GuestRequest_Pydantic_List
+from ..dispatch import dispatch_queue
+from ..models import GuestRequest, RequestStatus, RequestType
+from ..schema import DispatchedRequest, GuestRequestCreate, GuestRequest_Pydantic
 from ...auth.utils import get_current_active_user
-from ...rooms.models import Room
+from ...database.routing import route_reads
+from ...pagination import Page, PageParams, paginate
+from ...reservations.models import Reservation
+from ...rooms.models import RoomAvailability
+from ...serialization import FastJSONResponse
 from ...users.models import Guest
 
 
-guest_request_router = APIRouter(tags=["Guest Request"])
+guest_request_router = APIRouter(
+    tags=["Guest Request"], dependencies=[Depends(route_reads)]
+)
+
+
+@guest_request_router.get("/", response_model=Page[GuestRequest_Pydantic])
+async def get_request(
+    request_type: Optional[RequestType] = None,
+    request_status: Optional[RequestStatus] = None,
+    page: PageParams = Depends(),
+    current_user: Guest = Depends(get_current_active_user),
+):
+    """The requests of the current guest"""
+    query = GuestRequest.filter(guest_id=current_user.uid)
+    if request_type:
+        query = query.filter(request_type=request_type)
+    if request_status:
+        query = query.filter(request_status=request_status)
+    return await paginate(query, GuestRequest_Pydantic, page)
 
 
-@guest_request_router.get("/", response_model=GuestRequest_Pydantic_List)
-async def get_request():
-    return await GuestRequest_Pydantic.from_queryset(GuestRequest.all())
+@guest_request_router.post("/", response_model=DispatchedRequest, status_code=201)
+async def create_request(
+    data: GuestRequestCreate, current_user: Guest = Depends(get_current_active_user)
+):
+    """Requests are made for a room the guest is staying in and dispatched to staff at once"""
+    today = timezone.now().date()
+    stay = await (
+        RoomAvailability.filter(
+            room__room_number=data.room_number,
+            reservation__guest_id=current_user.uid,
+            start_date__lte=today,
+            end_date__gte=today,
+        )
+        .exclude(reservation__status=Reservation.ReservationStatus.CANCELLED)
+        .first()
+        .values("room_id", "reservation_id")
+    )
+    if stay is None:
+        raise HTTPException(403, f"You are not staying in room {data.room_number}")
+    guest_request = await GuestRequest.create(
+        request=data.request,
+        request_type=data.request_type,
+        request_status=RequestStatus.PENDING,
+        priority=data.priority,
+        extra=data.extra,
+        guest=current_user,
+        **stay,
+    )
+    return FastJSONResponse(await dispatch_queue.refresh(guest_request.id), status_code=201)
@@ -1,20 +1,38 @@
+from datetime import datetime
 from typing import Optional
+from uuid import UUID
+
 from pydantic import BaseModel
 from tortoise.contrib.pydantic import pydantic_model_creator, pydantic_queryset_creator
 
 from .models import GuestRequest, RequestPriority, RequestStatus, RequestType
-from ..users.models import Guest
 
 
 GuestRequest_Pydantic = pydantic_model_creator(GuestRequest)
 GuestRequest_Pydantic_List = pydantic_queryset_creator(GuestRequest)
 
 
-class GuestRequest_In(BaseModel):
+class GuestRequestCreate(BaseModel):
     room_number: int
-    guest: Guest
     request: str
-    req_type: RequestType
-    status: RequestStatus
-    priority: RequestPriority
+    request_type: RequestType
+    priority: Optional[RequestPriority] = None
     extra: Optional[str] = None
+
+
+class RequestStatusUpdate(BaseModel):
+    request_status: RequestStatus
+
+
+class DispatchedRequest(BaseModel):
+    id: int
+    request: str
+    request_type: RequestType
+    request_status: RequestStatus
+    priority: Optional[RequestPriority]
+    extra: Optional[str]
+    room_number: int
+    created: datetime
+    updated: datetime
+    claimed_by_id: Optional[UUID]
+    claimed_at: Optional[datetime]
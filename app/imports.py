@@ -0,0 +1,115 @@
+"""
+Streaming NDJSON/CSV imports, the counterpart of `app.exports`.
+
+The request body is decoded as it arrives and handed out in chunks of parsed records, so an
+upload is never held in memory as a whole. Records are numbered from 1 (the CSV header is not
+counted) and rows that cannot be parsed are returned as `ImportRowError`s in place of their
+record, so callers can report them next to validation errors.
+"""
+
+import codecs
+import csv
+import json
+from typing import Any, AsyncIterator, Union
+
+from pydantic import BaseModel, ValidationError
+
+from .exports import ExportFormat
+
+
+class ImportRowError(BaseModel):
+    row: int
+    errors: list[str]
+
+
+Record = tuple[int, Union[dict[str, Any], ImportRowError]]
+
+
+def validation_messages(error: ValidationError) -> list[str]:
+    return [
+        f"{'.'.join(str(part) for part in detail['loc']) or 'row'}: {detail['msg']}"
+        for detail in error.errors()
+    ]
+
+
+def complete_csv_records(text: str) -> int:
+    """Length of the prefix of `text` made of whole CSV records, a newline inside quotes
+    does not end a record"""
+    end = text.rfind("\n")
+    while end != -1 and text.count('"', 0, end) % 2:
+        end = text.rfind("\n", 0, end)
+    return end + 1
+
+
+async def iter_text(stream: AsyncIterator[bytes], import_format: ExportFormat):
+    """Decode `stream` into pieces that each end on a record boundary"""
+    decoder = codecs.getincrementaldecoder("utf-8-sig")()
+    pending = ""
+    async for data in stream:
+        pending += decoder.decode(data)
+        if import_format == ExportFormat.CSV:
+            end = complete_csv_records(pending)
+        else:
+            end = pending.rfind("\n") + 1
+        if end:
+            yield pending[:end]
+            pending = pending[end:]
+    pending += decoder.decode(b"", final=True)
+    if pending.strip():
+        yield pending + "\n"
+
+
+async def iter_records(
+    stream: AsyncIterator[bytes], import_format: ExportFormat
+) -> AsyncIterator[list[Record]]:
+    row = 0
+    header = None
+    async for text in iter_text(stream, import_format):
+        records: list[Record] = []
+        if import_format == ExportFormat.CSV:
+            for values in csv.reader(text.splitlines(keepends=True)):
+                if not any(values):
+                    continue
+                if header is None:
+                    header = [name.strip() for name in values]
+                    continue
+                row += 1
+                if len(values) != len(header):
+                    error = f"expected {len(header)} columns, got {len(values)}"
+                    records.append((row, ImportRowError(row=row, errors=[error])))
+                    continue
+                # Empty cells fall back to the field defaults
+                records.append(
+                    (row, {name: value for name, value in zip(header, values) if value != ""})
+                )
+        else:
+            for line in text.splitlines():
+                if not line.strip():
+                    continue
+                row += 1
+                try:
+                    record = json.loads(line)
+                except ValueError as e:
+                    records.append((row, ImportRowError(row=row, errors=[f"invalid JSON: {e}"])))
+                    continue
+                if not isinstance(record, dict):
+                    error = "expected a JSON object"
+                    records.append((row, ImportRowError(row=row, errors=[error])))
+                    continue
+                records.append((row, record))
+        if records:
+            yield records
+
+
+async def iter_record_chunks(
+    stream: AsyncIterator[bytes], import_format: ExportFormat, chunk_size: int
+) -> AsyncIterator[list[Record]]:
+    """Records of `stream` in chunks of `chunk_size`, the last one possibly shorter"""
+    chunk: list[Record] = []
+    async for records in iter_records(stream, import_format):
+        chunk.extend(records)
+        while len(chunk) >= chunk_size:
+            yield chunk[:chunk_size]
+            chunk = chunk[chunk_size:]
+    if chunk:
+        yield chunk
@@ -0,0 +1,223 @@
+"""
+Asynchronous outbound email delivery.
+
+Emails are written to the `OutboxEmail` table first, so nothing is lost if the process dies
+before delivery. A single `MailDispatcher` task per process drains the outbox in batches
+over one long-lived SMTP session and retries failed messages with exponential backoff.
+
+Dispatchers claim each batch before sending it: one conditional UPDATE marks the due emails
+`SENDING` under a fresh claim id for `claim_timeout` seconds, so dispatchers running in
+several workers never send the same email twice. Emails claimed by a dispatcher that died
+before finishing become due again once their claim expires.
+"""
+
+import asyncio
+import logging
+from datetime import timedelta
+from email.message import EmailMessage
+from typing import Optional
+from uuid import uuid4
+
+import aiosmtplib
+from tortoise import timezone
+from tortoise.expressions import Subquery
+from tortoise.functions import Count
+
+from ..config import settings
+from .models import OutboxEmail, OutboxStatus
+
+
+logger = logging.getLogger(__name__)
+
+
+class MailDispatcher:
+    def __init__(
+        self,
+        hostname: str,
+        port: int,
+        username: Optional[str] = None,
+        password: Optional[str] = None,
+        start_tls: bool = True,
+        batch_size: int = 50,
+        poll_interval: float = 5.0,
+        max_attempts: int = 5,
+        retry_backoff: float = 30.0,
+        claim_timeout: float = 300.0,
+    ):
+        self.hostname = hostname
+        self.port = port
+        self.username = username
+        self.password = password
+        self.start_tls = start_tls
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.max_attempts = max_attempts
+        self.retry_backoff = retry_backoff
+        self.claim_timeout = claim_timeout
+        self.sent = 0
+        self.failed = 0
+        self._smtp: Optional[aiosmtplib.SMTP] = None
+        self._task: Optional[asyncio.Task] = None
+        self._wakeup = asyncio.Event()
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run(), name="mail-dispatcher")
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self._disconnect()
+
+    def notify(self):
+        """Wake the dispatcher up instead of waiting for the next poll"""
+        self._wakeup.set()
+
+    async def _run(self):
+        while True:
+            try:
+                delivered = await self.dispatch_batch()
+            except Exception as e:
+                logger.exception(f"Mail dispatch failed: {e}")
+                delivered = 0
+            if delivered < self.batch_size:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+                self._wakeup.clear()
+
+    async def _connect(self) -> aiosmtplib.SMTP:
+        if self._smtp is None or not self._smtp.is_connected:
+            self._smtp = aiosmtplib.SMTP(
+                hostname=self.hostname, port=self.port, start_tls=self.start_tls
+            )
+            await self._smtp.connect()
+            if self.username and self.password:
+                await self._smtp.login(self.username, self.password)
+        return self._smtp
+
+    async def _disconnect(self):
+        if self._smtp is not None and self._smtp.is_connected:
+            try:
+                await self._smtp.quit()
+            except aiosmtplib.SMTPException:
+                self._smtp.close()
+        self._smtp = None
+
+    def _build_message(self, email: OutboxEmail) -> EmailMessage:
+        message = EmailMessage()
+        message["From"] = self.username or settings.email_user
+        message["To"] = email.recipient
+        message["Subject"] = email.subject
+        message.set_content(email.body)
+        return message
+
+    async def claim_batch(self) -> list[OutboxEmail]:
+        """Take up to `batch_size` due emails for this dispatcher alone"""
+        now = timezone.now()
+        due = OutboxEmail.filter(
+            status__in=[OutboxStatus.PENDING, OutboxStatus.SENDING], next_attempt_at__lte=now
+        )
+        claim = uuid4()
+        # The due condition is re-checked by the UPDATE itself, so of two dispatchers racing
+        # for an email only one claims it
+        claimed = await due.filter(
+            id__in=Subquery(due.order_by("next_attempt_at").limit(self.batch_size).values("id"))
+        ).update(
+            status=OutboxStatus.SENDING,
+            claim=claim,
+            next_attempt_at=now + timedelta(seconds=self.claim_timeout),
+        )
+        if not claimed:
+            return []
+        return await OutboxEmail.filter(claim=claim, status=OutboxStatus.SENDING)
+
+    async def dispatch_batch(self) -> int:
+        """Send one batch of due emails, returning how many were handled"""
+        emails = await self.claim_batch()
+        if not emails:
+            return 0
+        now = timezone.now()
+        delivered = []
+        for email in emails:
+            try:
+                smtp = await self._connect()
+                await smtp.send_message(self._build_message(email))
+            except (aiosmtplib.SMTPException, OSError) as e:
+                # Drop the session so the next message starts from a fresh connection
+                await self._disconnect()
+                await self._record_failure(email, str(e), now)
+            else:
+                delivered.append(email.id)
+        if delivered:
+            # Scoped to the claim, in case it expired and another dispatcher took over
+            await OutboxEmail.filter(id__in=delivered, claim=emails[0].claim).update(
+                status=OutboxStatus.SENT, sent_at=timezone.now()
+            )
+            self.sent += len(delivered)
+        return len(emails)
+
+    async def _record_failure(self, email: OutboxEmail, error: str, now):
+        email.attempts += 1
+        email.last_error = error
+        if email.attempts >= self.max_attempts:
+            email.status = OutboxStatus.FAILED
+            self.failed += 1
+            logger.error(f"Giving up on {email} after {email.attempts} attempts: {error}")
+        else:
+            delay = self.retry_backoff * 2 ** (email.attempts - 1)
+            email.status = OutboxStatus.PENDING
+            email.next_attempt_at = now + timedelta(seconds=delay)
+        await email.save(update_fields=["attempts", "last_error", "status", "next_attempt_at"])
+
+    async def metrics(self) -> dict:
+        counts = dict(
+            await OutboxEmail.all()
+            .annotate(count=Count("id"))
+            .group_by("status")
+            .values_list("status", "count")
+        )
+        oldest = (
+            await OutboxEmail.filter(status__in=[OutboxStatus.PENDING, OutboxStatus.SENDING])
+            .order_by("created_at")
+            .first()
+            .values_list("created_at", flat=True)
+        )
+        return {
+            "queue_depth": (
+                counts.get(OutboxStatus.PENDING, 0) + counts.get(OutboxStatus.SENDING, 0)
+            ),
+            "failed_total": counts.get(OutboxStatus.FAILED, 0),
+            "oldest_pending_age_seconds": (
+                (timezone.now() - oldest).total_seconds() if oldest else 0.0
+            ),
+            "sent_since_start": self.sent,
+            "failed_since_start": self.failed,
+            "running": self._task is not None and not self._task.done(),
+        }
+
+
+mail_dispatcher = MailDispatcher(
+    hostname=settings.email_host,
+    port=settings.email_port,
+    username=settings.email_user,
+    password=settings.email_password,
+    start_tls=settings.email_use_tls,
+    batch_size=settings.mail_batch_size,
+    poll_interval=settings.mail_poll_interval,
+    max_attempts=settings.mail_max_attempts,
+    retry_backoff=settings.mail_retry_backoff,
+    claim_timeout=settings.mail_claim_timeout,
+)
+
+
+async def queue_email(to: str, subject: str, contents: str) -> OutboxEmail:
+    email = await OutboxEmail.create(recipient=to, subject=subject, body=contents)
+    mail_dispatcher.notify()
+    return email
@@ -0,0 +1,31 @@
+from enum import Enum
+
+from tortoise import fields, models, timezone
+
+
+class OutboxStatus(str, Enum):
+    PENDING = "pending"
+    SENDING = "sending"
+    SENT = "sent"
+    FAILED = "failed"
+
+
+class OutboxEmail(models.Model):
+    id = fields.IntField(pk=True)
+    recipient = fields.CharField(max_length=100)
+    subject = fields.CharField(max_length=255)
+    body = fields.TextField()
+    status = fields.CharEnumField(OutboxStatus, default=OutboxStatus.PENDING, index=True)
+    attempts = fields.IntField(default=0)
+    next_attempt_at = fields.DatetimeField(default=timezone.now, index=True)
+    last_error = fields.TextField(null=True)
+    # Set by the dispatcher sending the email, see `MailDispatcher.claim_batch`
+    claim = fields.UUIDField(null=True, index=True)
+    created_at = fields.DatetimeField(auto_now_add=True)
+    sent_at = fields.DatetimeField(null=True)
+
+    class Meta:
+        ordering = ("next_attempt_at",)
+
+    def __str__(self) -> str:
+        return f"<OutboxEmail: {self.subject} -> {self.recipient}>"
@@ -0,0 +1,11 @@
+from fastapi.routing import APIRouter
+
+from .dispatcher import mail_dispatcher
+
+
+outbox_router = APIRouter(tags=["Notifications"])
+
+
+@outbox_router.get("/metrics", response_model=dict)
+async def get_outbox_metrics():
+    return await mail_dispatcher.metrics()
@@ -0,0 +1,115 @@
+"""
+Keyset (cursor) pagination shared by every list endpoint.
+
+Pages are ordered by the model's `Meta.ordering` with the primary key as a tie-breaker. The
+cursor is an opaque, URL-safe token holding the ordering values of the last row returned, so
+the next page is fetched with an indexed range condition instead of an `OFFSET` scan.
+"""
+
+import base64
+import json
+from typing import Generic, Optional, Sequence, Type, TypeVar
+
+from fastapi import HTTPException, Query
+from pydantic import BaseModel
+from pypika import Order
+from tortoise.models import Model
+from tortoise.queryset import QuerySet
+from tortoise.expressions import Q
+
+from .config import settings
+
+
+T = TypeVar("T")
+
+
+class Page(BaseModel, Generic[T]):
+    items: list[T]
+    next_cursor: Optional[str] = None
+
+
+class PageParams:
+    def __init__(
+        self,
+        cursor: Optional[str] = Query(None, description="`next_cursor` of the previous page"),
+        limit: int = Query(settings.page_default_limit, ge=1, le=settings.page_max_limit),
+    ):
+        self.cursor = cursor
+        self.limit = limit
+
+
+def keyset_ordering(
+    model: Type[Model], order_by: Optional[Sequence[str]] = None
+) -> list[tuple[str, Order]]:
+    """`order_by` (e.g. `("-rating_average",)`) overrides the model's `Meta.ordering`"""
+    if order_by is None:
+        ordering = list(model._meta.ordering)
+    else:
+        ordering = [
+            (field.lstrip("-"), Order.desc if field.startswith("-") else Order.asc)
+            for field in order_by
+        ]
+    pk = model._meta.pk_attr
+    if pk not in {field for field, _ in ordering}:
+        direction = ordering[-1][1] if ordering else Order.asc
+        ordering.append((pk, direction))
+    return ordering
+
+
+def encode_cursor(values: list) -> str:
+    values = [value.isoformat() if hasattr(value, "isoformat") else str(value) for value in values]
+    return base64.urlsafe_b64encode(json.dumps(values).encode()).decode().rstrip("=")
+
+
+def decode_cursor(model: Type[Model], ordering: list[tuple[str, Order]], cursor: str) -> list:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded))
+        assert isinstance(values, list) and len(values) == len(ordering)
+        fields_map = model._meta.fields_map
+        return [
+            fields_map[field].to_python_value(value)
+            for (field, _), value in zip(ordering, values)
+        ]
+    except Exception:
+        raise HTTPException(400, "Invalid pagination cursor")
+
+
+def keyset_filter(ordering: list[tuple[str, Order]], values: list) -> Q:
+    """Rows strictly after `values` in `ordering`, i.e. a row-value comparison spelt out"""
+    clauses = []
+    for index, (field, direction) in enumerate(ordering):
+        conditions = {prior: value for (prior, _), value in zip(ordering[:index], values)}
+        operator = "gt" if direction == Order.asc else "lt"
+        conditions[f"{field}__{operator}"] = values[index]
+        clauses.append(Q(**conditions))
+    return Q(*clauses, join_type="OR")
+
+
+def page_query(
+    query: QuerySet, params: PageParams, order_by: Optional[Sequence[str]] = None
+) -> tuple[QuerySet, list[tuple[str, Order]]]:
+    """Apply the keyset condition, ordering and limit (plus one look-ahead row) to `query`"""
+    ordering = keyset_ordering(query.model, order_by)
+    if params.cursor:
+        values = decode_cursor(query.model, ordering, params.cursor)
+        query = query.filter(keyset_filter(ordering, values))
+    order_by = [field if direction == Order.asc else f"-{field}" for field, direction in ordering]
+    return query.order_by(*order_by).limit(params.limit + 1), ordering
+
+
+def build_page(rows: list, ordering: list[tuple[str, Order]], params: PageParams, key=getattr):
+    """Trim the look-ahead row and derive the next cursor from the last row on the page"""
+    next_cursor = None
+    if len(rows) > params.limit:
+        rows = rows[: params.limit]
+        next_cursor = encode_cursor([key(rows[-1], field) for field, _ in ordering])
+    return {"items": rows, "next_cursor": next_cursor}
+
+
+async def paginate(
+    query: QuerySet, pydantic_model, params: PageParams, order_by: Optional[Sequence[str]] = None
+) -> dict:
+    query, ordering = page_query(query, params, order_by)
+    rows = await pydantic_model.from_queryset(query)
+    return build_page(rows, ordering, params)
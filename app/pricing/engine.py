@@ -0,0 +1,252 @@
+"""
+Per-night room pricing from rate plans.
+
+A `RatePlan` prices the nights it matches (room type, date range, weekdays, and a minimum
+occupancy of the room type that night) either at a fixed `nightly_price` or at the room's own
+price times `multiplier`. Where several plans match a night the highest `priority` wins, the
+most recent one on ties. Nights that no plan matches cost the room's price.
+
+Plans are compiled into dense tables indexed by (occupancy tier, room type, day), holding the
+multiplier and fixed price of the winning plan. Pricing any number of stays is then a handful
+of array operations: the stays are expanded into one entry per night and every night's rate is
+gathered from the tables at once. Occupancy comes from the daily rollups and is only read when
+a plan depends on it.
+
+Stays are priced when booked and the price is kept on their `RoomAvailability`, so invoices
+are not affected by plans or occupancy changing afterwards.
+
+Compiled tables are cached per process and recompiled once a plan changes, which every worker
+notices from the plans' count and latest `updated_at`.
+"""
+
+import asyncio
+from datetime import date, timedelta
+from decimal import Decimal
+from typing import Optional, Sequence
+from uuid import UUID
+
+import numpy as np
+from tortoise import timezone
+from tortoise.functions import Count, Max
+
+from ..analytics.columns import fetch_columns, lookup
+from ..analytics.models import DailyRollup
+from ..analytics.rollups import type_key
+from ..config import settings
+from ..rooms.models import Room, RoomAvailability
+from .models import RatePlan
+
+
+# Rows of the rate tables, rooms without a type come first
+ROOM_TYPES = np.array(["", *(room_type.value for room_type in Room.RoomType)])
+
+
+class RateTable:
+    """Compiled rate plans for the nights `[first, first + days)`"""
+
+    def __init__(
+        self,
+        first: np.datetime64,
+        thresholds: np.ndarray,
+        multiplier: np.ndarray,
+        fixed: np.ndarray,
+    ):
+        self.first = first
+        self.thresholds = thresholds
+        self.multiplier = multiplier
+        self.fixed = fixed
+
+    @property
+    def days(self) -> int:
+        return self.multiplier.shape[2]
+
+    @property
+    def by_occupancy(self) -> bool:
+        return len(self.thresholds) > 1
+
+    def covers(self, first: date, last: date) -> bool:
+        first, last = np.datetime64(first, "D"), np.datetime64(last, "D")
+        return self.first <= first and last <= self.first + self.days
+
+
+def compile_rate_plans(plans: Sequence[RatePlan], first: date, last: date) -> RateTable:
+    """Rate table of `plans` for the nights `[first, last)`"""
+    days = np.arange(np.datetime64(first, "D"), np.datetime64(last, "D"))
+    # 1970-01-01 was a Thursday
+    weekdays = (days.astype(np.int64) + 3) % 7
+    # Occupancy tier `i` covers the shares from `thresholds[i]` up to the next threshold
+    thresholds = np.unique(
+        [0.0, *(plan.min_occupancy for plan in plans if plan.min_occupancy is not None)]
+    )
+    shape = (len(thresholds), len(ROOM_TYPES), len(days))
+    multiplier = np.ones(shape)
+    fixed = np.full(shape, np.nan)
+
+    # Lowest priority first, so the plans that win overwrite the others
+    for plan in sorted(plans, key=lambda plan: (plan.priority, plan.id)):
+        nights = np.ones(len(days), dtype=bool)
+        if plan.start_date is not None:
+            nights &= days >= np.datetime64(plan.start_date, "D")
+        if plan.end_date is not None:
+            nights &= days <= np.datetime64(plan.end_date, "D")
+        if plan.weekdays is not None:
+            nights &= np.isin(weekdays, plan.weekdays)
+        tiers = thresholds >= (plan.min_occupancy or 0.0)
+        room_types = ROOM_TYPES == type_key(plan.room_type)
+        if plan.room_type is None:
+            room_types[:] = True
+        cells = np.ix_(tiers, room_types, nights)
+        multiplier[cells] = float(plan.multiplier)
+        fixed[cells] = np.nan if plan.nightly_price is None else float(plan.nightly_price)
+    return RateTable(np.datetime64(first, "D"), thresholds, multiplier, fixed)
+
+
+async def plans_fingerprint() -> tuple:
+    return tuple(
+        await RatePlan.annotate(plans=Count("id"), updated=Max("updated_at"))
+        .first()
+        .values_list("plans", "updated")
+    )
+
+
+class RateTableCache:
+    """The compiled rate table of this process, recompiled once the rate plans change"""
+
+    def __init__(self):
+        self._table: Optional[RateTable] = None
+        self._fingerprint: Optional[tuple] = None
+        self._lock = asyncio.Lock()
+
+    async def get(self, first: date, last: date) -> RateTable:
+        """A table covering at least the nights `[first, last)`"""
+        fingerprint = await plans_fingerprint()
+        async with self._lock:
+            table = self._table
+            if table is None or fingerprint != self._fingerprint or not table.covers(first, last):
+                today = timezone.now().date()
+                plans = await RatePlan.all()
+                table = compile_rate_plans(
+                    plans,
+                    min(first, today - timedelta(days=settings.rate_table_past_days)),
+                    max(last, today + timedelta(days=settings.rate_table_days)),
+                )
+                self._table, self._fingerprint = table, fingerprint
+            return table
+
+    def clear(self):
+        self._table = None
+
+
+rate_tables = RateTableCache()
+
+
+async def rollup_occupancy(table: RateTable, first: date, last: date) -> np.ndarray:
+    """Share of every room type sold per night of `table`, filled in for `[first, last)`"""
+    occupancy = np.zeros((len(ROOM_TYPES), table.days))
+    days, room_types, sold, available = await fetch_columns(
+        DailyRollup.filter(day__gte=first, day__lt=last),
+        "day",
+        "room_type",
+        "nights_sold",
+        "rooms_available",
+    )
+    sold = np.array(sold, dtype=np.float64)
+    available = np.array(available, dtype=np.float64)
+    rows = lookup(ROOM_TYPES, np.arange(len(ROOM_TYPES)), np.array(room_types, dtype=str), 0)
+    columns = (np.array(days, dtype="datetime64[D]") - table.first).astype(np.int64)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        occupancy[rows, columns] = np.where(available > 0, sold / available, 0.0)
+    return occupancy
+
+
+def price_nights(
+    table: RateTable,
+    room_types: np.ndarray,
+    prices: np.ndarray,
+    check_ins: np.ndarray,
+    check_outs: np.ndarray,
+    occupancy: Optional[np.ndarray] = None,
+) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Price every night of the stays described by the arrays: the stay's room type row in
+    `ROOM_TYPES`, the room's own price and the check-in and check-out days (datetime64[D]).
+
+    Returns the index of the stay, the date and the price of each night, in stay order.
+    """
+    nights = (check_outs - check_ins).astype(np.int64)
+    stay = np.repeat(np.arange(len(nights)), nights)
+    offset = np.arange(len(stay)) - (np.cumsum(nights) - nights)[stay]
+    dates = check_ins[stay] + offset.astype("timedelta64[D]")
+    day = (dates - table.first).astype(np.int64)
+    room_type = room_types[stay]
+    if occupancy is None:
+        tier = np.zeros(len(stay), dtype=np.int64)
+    else:
+        tier = np.searchsorted(table.thresholds, occupancy[room_type, day], side="right") - 1
+    fixed = table.fixed[tier, room_type, day]
+    rate = np.where(np.isnan(fixed), prices[stay] * table.multiplier[tier, room_type, day], fixed)
+    return stay, dates, np.round(rate, 2)
+
+
+async def price_stays(
+    room_types: Sequence, prices: Sequence, check_ins: Sequence[date], check_outs: Sequence[date]
+) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """`price_nights` for rooms given by their type and price, at the current rates"""
+    first, last = min(check_ins), max(check_outs)
+    table = await rate_tables.get(first, last)
+    occupancy = await rollup_occupancy(table, first, last) if table.by_occupancy else None
+    type_keys = np.array([type_key(room_type) for room_type in room_types], dtype=str)
+    return price_nights(
+        table,
+        lookup(ROOM_TYPES, np.arange(len(ROOM_TYPES)), type_keys, 0),
+        np.array(prices, dtype=np.float64),
+        np.array(check_ins, dtype="datetime64[D]"),
+        np.array(check_outs, dtype="datetime64[D]"),
+        occupancy,
+    )
+
+
+async def stay_prices(rooms: Sequence[Room], check_in: date, check_out: date) -> list[Decimal]:
+    """Price of the stay of each of `rooms` over `[check_in, check_out)`, at the current rates"""
+    stay, _, rates = await price_stays(
+        [room.room_type for room in rooms],
+        [room.price for room in rooms],
+        [check_in] * len(rooms),
+        [check_out] * len(rooms),
+    )
+    return [
+        Decimal(str(round(total, 2)))
+        for total in np.bincount(stay, rates, minlength=len(rooms)).tolist()
+    ]
+
+
+async def reservation_totals(reservation_ids: Sequence[UUID]) -> dict[UUID, Decimal]:
+    """
+    Total of every night of every room of each reservation, at the rates recorded when it was
+    booked. Stays booked before prices were recorded are priced at the current rates.
+    """
+    stays = await RoomAvailability.filter(reservation_id__in=list(reservation_ids)).values_list(
+        "reservation_id", "price", "room__room_type", "room__price", "start_date", "end_date"
+    )
+    totals = dict.fromkeys(reservation_ids, Decimal(0))
+    unpriced = []
+    for reservation_id, price, *columns in stays:
+        if price is None:
+            unpriced.append((reservation_id, *columns))
+        else:
+            totals[reservation_id] += Decimal(price)
+    if unpriced:
+        reservations, *columns = zip(*unpriced)
+        stay, _, rates = await price_stays(*columns)
+        for reservation_id, amount in zip(
+            reservations, np.bincount(stay, rates, minlength=len(unpriced)).tolist()
+        ):
+            totals[reservation_id] += Decimal(str(round(amount, 2)))
+    return {
+        reservation_id: total.quantize(Decimal("0.01")) for reservation_id, total in totals.items()
+    }
+
+
+async def reservation_price(reservation_id: UUID) -> Decimal:
+    """Total of every night of every room of a reservation, at the rates it was booked at"""
+    return (await reservation_totals([reservation_id]))[reservation_id]
@@ -0,0 +1,34 @@
+from tortoise import fields, models
+
+from ..rooms.models import Room
+
+
+class RatePlan(models.Model):
+    """A nightly rate rule for a room type and date range, see `app.pricing.engine`"""
+
+    id = fields.IntField(pk=True)
+    name = fields.CharField(max_length=100)
+    room_type = fields.CharEnumField(
+        Room.RoomType, max_length=10, null=True, description="every room type if null"
+    )
+    start_date = fields.DateField(null=True, description="first night, open-ended if null")
+    end_date = fields.DateField(null=True, description="last night, open-ended if null")
+    weekdays = fields.JSONField(null=True, description="nights it applies to, 0 is Monday")
+    min_occupancy = fields.FloatField(
+        null=True, description="share of the room type sold for the night, from 0 to 1"
+    )
+    multiplier = fields.DecimalField(
+        max_digits=6, decimal_places=3, default=1, description="applied to the room's price"
+    )
+    nightly_price = fields.DecimalField(
+        max_digits=8, decimal_places=3, null=True, description="replaces the room's price"
+    )
+    priority = fields.IntField(default=0)
+    created_at = fields.DatetimeField(auto_now_add=True)
+    updated_at = fields.DatetimeField(auto_now=True)
+
+    class Meta:
+        ordering = ("-priority", "-id")
+
+    def __str__(self) -> str:
+        return f"<RatePlan: {self.name}>"
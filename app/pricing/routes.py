@@ -0,0 +1,84 @@
+import numpy as np
+from fastapi import HTTPException
+from fastapi.routing import APIRouter
+
+from ..rooms.models import Room
+from ..serialization import FastJSONResponse
+from .engine import price_stays, rate_tables
+from .models import RatePlan
+from .schema import Quote, QuoteRequest, RatePlan_Pydantic, RatePlanIn
+
+
+rate_plan_router = APIRouter(tags=["Pricing"])
+quote_router = APIRouter(tags=["Pricing"])
+
+
+@rate_plan_router.get("/", response_model=list[RatePlan_Pydantic])
+async def get_rate_plans():
+    return await RatePlan_Pydantic.from_queryset(RatePlan.all())
+
+
+@rate_plan_router.post("/", response_model=RatePlan_Pydantic, status_code=201)
+async def create_rate_plan(plan: RatePlanIn):
+    new_plan = await RatePlan.create(**plan.model_dump())
+    rate_tables.clear()
+    return await RatePlan_Pydantic.from_tortoise_orm(new_plan)
+
+
+@rate_plan_router.put("/{plan_id}", response_model=RatePlan_Pydantic)
+async def update_rate_plan(plan_id: int, plan: RatePlanIn):
+    rate_plan = await RatePlan.get(id=plan_id)
+    await rate_plan.update_from_dict(plan.model_dump()).save()
+    rate_tables.clear()
+    return await RatePlan_Pydantic.from_tortoise_orm(rate_plan)
+
+
+@rate_plan_router.delete("/{plan_id}", response_model={}, status_code=204)
+async def delete_rate_plan(plan_id: int):
+    await (await RatePlan.get(id=plan_id)).delete()
+    rate_tables.clear()
+    return {}
+
+
+@quote_router.post("/quotes", response_model=list[Quote])
+async def quote_rooms(request: QuoteRequest):
+    """Price every stay of `items` night by night in one pass, in the order requested"""
+    items = request.items
+    rooms = {
+        room_number: (room_type, price)
+        for room_number, room_type, price in await Room.filter(
+            room_number__in=list({item.room_number for item in items})
+        ).values_list("room_number", "room_type", "price")
+    }
+    missing = sorted({item.room_number for item in items} - rooms.keys())
+    if missing:
+        raise HTTPException(404, f"Room {', '.join(map(str, missing))} does not exist")
+
+    room_types, prices = zip(*(rooms[item.room_number] for item in items))
+    stay, nights, rates = await price_stays(
+        room_types,
+        prices,
+        [item.check_in for item in items],
+        [item.check_out for item in items],
+    )
+    totals = np.bincount(stay, rates, minlength=len(items)).round(2).tolist()
+    ends = np.cumsum(np.bincount(stay, minlength=len(items))).tolist()
+    nights, rates = nights.astype(str).tolist(), rates.tolist()
+    quotes = []
+    start = 0
+    for item, total, end in zip(items, totals, ends):
+        quotes.append(
+            {
+                "room_number": item.room_number,
+                "check_in": item.check_in.isoformat(),
+                "check_out": item.check_out.isoformat(),
+                "nights": end - start,
+                "total": total,
+                "nightly": [
+                    {"night": night, "price": rate}
+                    for night, rate in zip(nights[start:end], rates[start:end])
+                ],
+            }
+        )
+        start = end
+    return FastJSONResponse(quotes)
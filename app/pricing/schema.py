@@ -0,0 +1,72 @@
+from datetime import date
+from decimal import Decimal
+from typing import Optional
+
+from pydantic import BaseModel, Field, field_validator, model_validator
+from tortoise.contrib.pydantic import pydantic_model_creator
+
+from ..config import settings
+from ..rooms.models import Room
+from .models import RatePlan
+
+
+RatePlan_Pydantic = pydantic_model_creator(RatePlan, name="RatePlan")
+
+
+class RatePlanIn(BaseModel):
+    name: str = Field(..., max_length=100)
+    room_type: Optional[Room.RoomType] = None
+    start_date: Optional[date] = None
+    end_date: Optional[date] = None
+    weekdays: Optional[list[int]] = None
+    min_occupancy: Optional[float] = Field(None, ge=0, le=1)
+    multiplier: Decimal = Field(Decimal(1), gt=0, lt=1000)
+    nightly_price: Optional[Decimal] = Field(None, ge=0, lt=100_000)
+    priority: int = 0
+
+    @field_validator("weekdays")
+    @classmethod
+    def validate_weekdays(cls, value: Optional[list[int]]):
+        if value is not None:
+            if not all(0 <= day <= 6 for day in value):
+                raise ValueError("Weekdays go from 0 (Monday) to 6 (Sunday)")
+            value = sorted(set(value))
+        return value
+
+    @model_validator(mode="after")
+    def check_date_range(self):
+        if self.start_date and self.end_date and self.start_date > self.end_date:
+            raise ValueError("start_date must not be after end_date")
+        return self
+
+
+class QuoteItem(BaseModel):
+    room_number: int
+    check_in: date
+    check_out: date
+
+    @model_validator(mode="after")
+    def check_stay(self):
+        if self.check_out <= self.check_in:
+            raise ValueError("check_out must be after check_in")
+        if (self.check_out - self.check_in).days > 30:
+            raise ValueError("Maximum stay is 30 days")
+        return self
+
+
+class QuoteRequest(BaseModel):
+    items: list[QuoteItem] = Field(..., min_length=1, max_length=settings.quote_max_items)
+
+
+class NightPrice(BaseModel):
+    night: date
+    price: float
+
+
+class Quote(BaseModel):
+    room_number: int
+    check_in: date
+    check_out: date
+    nights: int
+    total: float
+    nightly: list[NightPrice]
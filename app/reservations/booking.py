@@ -0,0 +1,264 @@
+"""
+Concurrency-safe reservation creation.
+
+Availability is re-checked inside the same transaction that inserts the booking, and
+concurrent writers for the same rooms are serialized before that check runs:
+
+- On Postgres the requested `Room` rows are locked with `SELECT ... FOR UPDATE`, so two
+  bookings sharing a room run one after the other while unrelated bookings proceed in parallel.
+- On SQLite, which only allows a single writer anyway, bookings go through one process-wide
+  writer lock. Writers in other processes are caught by SQLite's own locking and retried.
+
+`change_reservation` moves an existing reservation to other rooms or dates under the same
+locks, its own current stays aside.
+
+Live `RoomHold`s count as bookings in the check. Passing `hold_id` converts that hold into the
+reservation: the hold is verified and deleted in the same transaction that writes the booking.
+The daily rollups (`app.analytics.rollups`) and the guest's confirmation email
+(`app.notifications`) are written in that transaction too.
+"""
+
+import asyncio
+import logging
+from contextlib import asynccontextmanager, nullcontext
+from datetime import date, datetime
+from typing import Awaitable, Callable, Optional, TypeVar
+from uuid import UUID
+
+from tortoise import connections, timezone
+from tortoise.exceptions import (
+    DoesNotExist,
+    IntegrityError,
+    OperationalError,
+    TransactionManagementError,
+)
+from tortoise.expressions import Subquery
+from tortoise.transactions import in_transaction
+
+from ..analytics.rollups import reservation_stays, track_stays
+from ..cache import invalidate_rooms
+from ..config import settings
+from ..notifications.dispatcher import mail_dispatcher
+from ..pricing.engine import stay_prices
+from ..rooms.availability import availability_index
+from ..rooms.models import Room, RoomAvailability, RoomHold
+from ..users.models import Guest
+from .emails import confirmation_email
+from .models import Reservation, ReservationHold
+from .schema import ReservationIn
+
+
+logger = logging.getLogger(__name__)
+sqlite_writer_lock = asyncio.Lock()
+T = TypeVar("T")
+
+
+class BookingConflict(Exception):
+    def __init__(self, room_numbers: list[int]):
+        self.room_numbers = room_numbers
+        rooms = ", ".join(str(number) for number in room_numbers)
+        super().__init__(f"Room {rooms} is not available within the selected dates")
+
+
+class BookingContention(Exception):
+    """Raised when a booking could not be written after all retries"""
+
+
+class HoldExpired(Exception):
+    """Raised when converting a hold that expired, was released or belongs to another guest"""
+
+
+@asynccontextmanager
+async def serialized_writer(dialect: str):
+    lock = sqlite_writer_lock if dialect == "sqlite" else nullcontext()
+    async with lock:
+        yield
+
+
+async def lock_rooms(room_numbers: list[int], dialect: str) -> list[Room]:
+    """Fetch the rooms to book, locking their rows on Postgres. Must run in a transaction."""
+    rooms_query = Room.filter(room_number__in=room_numbers)
+    if dialect == "postgres":
+        rooms_query = rooms_query.select_for_update()
+    rooms = await rooms_query
+    if len(rooms) != len(room_numbers):
+        missing = set(room_numbers) - {room.room_number for room in rooms}
+        raise DoesNotExist(f"Room {', '.join(map(str, sorted(missing)))} does not exist")
+    return rooms
+
+
+async def check_conflicts(
+    rooms: list[Room],
+    check_in: date,
+    check_out: date,
+    now: datetime,
+    ignore: Optional[UUID] = None,
+):
+    """
+    Authoritative availability check, made while holding the room locks. The stays of the
+    `ignore` reservation do not count, so a reservation can be moved over its own dates.
+    """
+    room_ids = [room.id for room in rooms]
+    active_reservations = Reservation.exclude(
+        status=Reservation.ReservationStatus.CANCELLED
+    ).values("id")
+    booked = RoomAvailability.filter(
+        room_id__in=room_ids,
+        start_date__lt=check_out,
+        end_date__gt=check_in,
+        reservation_id__in=Subquery(active_reservations),
+    )
+    if ignore is not None:
+        booked = booked.exclude(reservation_id=ignore)
+    booked = await booked.values_list("room_id", flat=True)
+    held = await RoomHold.live(now).filter(
+        room_id__in=room_ids, start_date__lt=check_out, end_date__gt=check_in
+    ).values_list("room_id", flat=True)
+    if booked or held:
+        numbers = {room.id: room.room_number for room in rooms}
+        raise BookingConflict(sorted({numbers[room_id] for room_id in [*booked, *held]}))
+
+
+async def insert_reservation(
+    guest: Guest,
+    reservation: ReservationIn,
+    check_in: date,
+    check_out: date,
+    hold_id: Optional[UUID] = None,
+) -> tuple[Reservation, list[Room]]:
+    dialect = connections.get("default").capabilities.dialect
+    async with serialized_writer(dialect), in_transaction("default"):
+        rooms = await lock_rooms(reservation.room_numbers, dialect)
+        now = timezone.now()
+        if hold_id is not None:
+            # The hold's own rooms must not conflict with the booking replacing it
+            await RoomHold.filter(hold_id=hold_id).delete()
+            if not await ReservationHold.filter(
+                id=hold_id, guest=guest, expires_at__gt=now
+            ).delete():
+                raise HoldExpired(f"Hold {hold_id} has expired")
+        await check_conflicts(rooms, check_in, check_out, now)
+
+        new_reservation = await Reservation.create(
+            guest=guest,
+            check_in_date=reservation.check_in_date,
+            check_out_date=reservation.check_out_date,
+            occupants=reservation.occupants,
+        )
+        async with track_stays(reservation_stays(new_reservation.id)):
+            await link_rooms(new_reservation, rooms, check_in, check_out)
+        # Queued with the booking, so the guest is emailed if and only if it commits
+        await confirmation_email(guest, reservation).save()
+    return new_reservation, rooms
+
+
+async def link_rooms(reservation: Reservation, rooms: list[Room], check_in: date, check_out: date):
+    """
+    Link the reservation with rooms and create RoomAvailability records with a fixed number
+    of statements regardless of how many rooms are booked. Each stay keeps its price at the
+    current rates, before its own nights count towards occupancy, and is invoiced at it.
+    """
+    prices = await stay_prices(rooms, check_in, check_out)
+    await reservation.rooms.add(*rooms)
+    await RoomAvailability.bulk_create(
+        [
+            RoomAvailability(
+                room=room,
+                reservation=reservation,
+                start_date=check_in,
+                end_date=check_out,
+                booked=True,
+                price=price,
+            )
+            for room, price in zip(rooms, prices)
+        ]
+    )
+
+
+async def rebook_reservation(
+    reservation: Reservation, changes: ReservationIn, check_in: date, check_out: date
+) -> tuple[list[Room], list[UUID]]:
+    """Replace the rooms and dates of a reservation, returns its new rooms and its old room ids"""
+    dialect = connections.get("default").capabilities.dialect
+    async with serialized_writer(dialect), in_transaction("default"):
+        rooms = await lock_rooms(changes.room_numbers, dialect)
+        await check_conflicts(rooms, check_in, check_out, timezone.now(), ignore=reservation.id)
+        async with track_stays(reservation_stays(reservation.id)):
+            previous_room_ids = await reservation.rooms.all().values_list("id", flat=True)
+            await RoomAvailability.filter(reservation_id=reservation.id).delete()
+            await reservation.rooms.clear()
+            reservation.check_in_date = changes.check_in_date
+            reservation.check_out_date = changes.check_out_date
+            reservation.occupants = changes.occupants
+            await reservation.save()
+            await link_rooms(reservation, rooms, check_in, check_out)
+    return rooms, previous_room_ids
+
+
+async def retry_on_contention(write: Callable[[], Awaitable[T]]) -> T:
+    """
+    Run `write`, retrying with exponential backoff when it loses a race with another writer.
+
+    Raises `BookingContention` once `settings.booking_max_retries` retries have failed.
+    """
+    for attempt in range(settings.booking_max_retries + 1):
+        try:
+            return await write()
+        except (DoesNotExist, IntegrityError):
+            # Deterministic failures that another attempt would repeat
+            raise
+        except (OperationalError, TransactionManagementError) as e:
+            # Lost a race with another writer (e.g. "database is locked" or a deadlock):
+            # back off and re-check
+            logger.warning(f"Booking attempt {attempt + 1} failed: {e}")
+            if attempt == settings.booking_max_retries:
+                raise BookingContention(str(e)) from e
+            await asyncio.sleep(settings.booking_retry_backoff * 2**attempt)
+
+
+async def create_reservation(
+    guest: Guest, reservation: ReservationIn, hold_id: Optional[UUID] = None
+) -> Reservation:
+    """
+    Book `reservation.room_numbers` for `guest` without ever double-booking a room.
+
+    Raises `BookingConflict` if any room is taken or held for the requested dates,
+    `HoldExpired` if `hold_id` is no longer live, and `BookingContention` if the write
+    kept failing on lock contention after `settings.booking_max_retries` retries.
+    """
+    check_in = reservation.check_in_date.date()
+    check_out = reservation.check_out_date.date()
+    new_reservation, rooms = await retry_on_contention(
+        lambda: insert_reservation(guest, reservation, check_in, check_out, hold_id)
+    )
+
+    # Only index the booking and send its email once the transaction has been committed
+    mail_dispatcher.notify()
+    if hold_id is not None:
+        availability_index.release_hold(hold_id)
+    for room in rooms:
+        availability_index.book(room.id, new_reservation.id, check_in, check_out)
+    await Room.touch(id__in=[room.id for room in rooms])
+    await invalidate_rooms(room_ids=[room.id for room in rooms])
+    return new_reservation
+
+
+async def change_reservation(reservation: Reservation, changes: ReservationIn):
+    """
+    Move `reservation` to the rooms and dates of `changes`, with the same guarantees as
+    `create_reservation`: the new stays are checked against every other booking under lock.
+
+    Raises `BookingConflict` and `BookingContention` like `create_reservation`.
+    """
+    check_in = changes.check_in_date.date()
+    check_out = changes.check_out_date.date()
+    rooms, previous_room_ids = await retry_on_contention(
+        lambda: rebook_reservation(reservation, changes, check_in, check_out)
+    )
+
+    availability_index.release(reservation.id)
+    for room in rooms:
+        availability_index.book(room.id, reservation.id, check_in, check_out)
+    room_ids = list({*previous_room_ids, *(room.id for room in rooms)})
+    await Room.touch(id__in=room_ids)
+    await invalidate_rooms(room_ids=room_ids)
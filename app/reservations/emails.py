@@ -0,0 +1,28 @@
+from ..notifications.models import OutboxEmail
+from ..users.models import Guest
+from .schema import ReservationIn
+
+
+def confirmation_email(guest: Guest, reservation: ReservationIn) -> OutboxEmail:
+    """The new reservation email, to be saved in the transaction writing the booking"""
+    return OutboxEmail(
+        recipient=guest.email,
+        subject="New Reservation, Welcome!",
+        body=f"""
+            Hi {guest.first_name},
+
+            Thank you for booking a reservation at our hotel. 
+            We are excited to welcome you to our establishment and hope you enjoy your stay.
+
+            Your reservation details are as follows:
+
+            Room Numbers: {', '.join(f'#{number}' for number in reservation.room_numbers)}
+            Check-In Date: {reservation.check_in_date.date()}
+            Check-Out Date: {reservation.check_out_date.date()}
+
+            If you have any questions or concerns, please don't hesitate to contact us.
+
+            Best regards,
+            Management.
+        """,
+    )
@@ -0,0 +1,171 @@
+"""
+Short-lived inventory holds for checkout flows.
+
+A hold takes a guest's rooms for `settings.hold_ttl` seconds while they pay, so the rooms
+cannot be booked or held by anyone else in the meantime. Holds are written with the same
+room locks and availability check as bookings (see `app.reservations.booking`) and are
+mirrored in the availability index, which drops them as they expire.
+
+`confirm_hold` converts a live hold into a `Reservation` atomically: the hold is deleted in
+the transaction that writes the booking, so its rooms are never free in between. Expired
+holds are deleted in bulk by `HoldSweeper`, using the index on `expires_at`.
+"""
+
+import asyncio
+import logging
+from datetime import timedelta
+from typing import Optional
+from uuid import UUID
+
+from tortoise import connections, timezone
+from tortoise.transactions import in_transaction
+
+from ..config import settings
+from ..rooms.availability import availability_index
+from ..rooms.models import RoomHold
+from ..users.models import Guest
+from .booking import (
+    HoldExpired,
+    check_conflicts,
+    create_reservation,
+    lock_rooms,
+    retry_on_contention,
+    serialized_writer,
+)
+from .models import Reservation, ReservationHold
+from .schema import ReservationIn
+
+
+logger = logging.getLogger(__name__)
+
+
+class HoldLimitReached(Exception):
+    def __init__(self, limit: int):
+        super().__init__(f"A guest can hold at most {limit} bookings at a time")
+
+
+async def insert_hold(guest: Guest, reservation: ReservationIn) -> ReservationHold:
+    check_in = reservation.check_in_date.date()
+    check_out = reservation.check_out_date.date()
+    dialect = connections.get("default").capabilities.dialect
+    async with serialized_writer(dialect), in_transaction("default"):
+        rooms = await lock_rooms(reservation.room_numbers, dialect)
+        now = timezone.now()
+        live_holds = await ReservationHold.filter(guest=guest, expires_at__gt=now).count()
+        if live_holds >= settings.hold_max_per_guest:
+            raise HoldLimitReached(settings.hold_max_per_guest)
+        await check_conflicts(rooms, check_in, check_out, now)
+
+        expires_at = now + timedelta(seconds=settings.hold_ttl)
+        hold = await ReservationHold.create(
+            guest=guest,
+            occupants=reservation.occupants,
+            check_in_date=reservation.check_in_date,
+            check_out_date=reservation.check_out_date,
+            expires_at=expires_at,
+        )
+        await RoomHold.bulk_create(
+            [
+                RoomHold(
+                    hold=hold,
+                    room=room,
+                    start_date=check_in,
+                    end_date=check_out,
+                    expires_at=expires_at,
+                )
+                for room in rooms
+            ]
+        )
+    # Only index the hold once the transaction has been committed
+    availability_index.hold(
+        [room.id for room in rooms], hold.id, check_in, check_out, expires_at
+    )
+    return hold
+
+
+async def create_hold(guest: Guest, reservation: ReservationIn) -> ReservationHold:
+    """
+    Hold `reservation.room_numbers` for `guest` for `settings.hold_ttl` seconds.
+
+    Raises `BookingConflict` if any room is booked or held for the requested dates,
+    `HoldLimitReached` if the guest already has `settings.hold_max_per_guest` live holds,
+    and `BookingContention` if the write kept failing on lock contention.
+    """
+    return await retry_on_contention(lambda: insert_hold(guest, reservation))
+
+
+async def confirm_hold(guest: Guest, hold_id: UUID) -> Reservation:
+    """Book the rooms of a live hold"""
+    hold = await ReservationHold.get_or_none(
+        id=hold_id, guest=guest, expires_at__gt=timezone.now()
+    )
+    if hold is None:
+        raise HoldExpired(f"Hold {hold_id} has expired")
+    room_numbers = await RoomHold.filter(hold_id=hold_id).values_list(
+        "room__room_number", flat=True
+    )
+    # Built without validation: the request was validated when the hold was made and
+    # re-validating could reject a check-in that turned "past" while the guest paid
+    reservation = ReservationIn.model_construct(
+        room_numbers=sorted(room_numbers),
+        occupants=hold.occupants,
+        check_in_date=hold.check_in_date,
+        check_out_date=hold.check_out_date,
+    )
+    return await create_reservation(guest, reservation, hold_id=hold_id)
+
+
+async def release_hold(guest: Guest, hold_id: UUID) -> bool:
+    """Give up a hold before it expires, returns False if the guest has no such hold"""
+    if not await ReservationHold.exists(id=hold_id, guest=guest):
+        return False
+    dialect = connections.get("default").capabilities.dialect
+    async with serialized_writer(dialect), in_transaction("default"):
+        await RoomHold.filter(hold_id=hold_id).delete()
+        await ReservationHold.filter(id=hold_id).delete()
+    availability_index.release_hold(hold_id)
+    return True
+
+
+class HoldSweeper:
+    def __init__(self, interval: float = 30.0):
+        self.interval = interval
+        self.released = 0
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run(), name="hold-sweeper")
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        while True:
+            try:
+                await self.sweep()
+            except Exception as e:
+                logger.exception(f"Hold sweep failed: {e}")
+            await asyncio.sleep(self.interval)
+
+    async def sweep(self) -> int:
+        """Delete every expired hold with two statements, returns how many were released"""
+        now = timezone.now()
+        dialect = connections.get("default").capabilities.dialect
+        async with serialized_writer(dialect), in_transaction("default"):
+            await RoomHold.filter(expires_at__lte=now).delete()
+            released = await ReservationHold.filter(expires_at__lte=now).delete()
+        availability_index.expire_holds(now)
+        if released:
+            logger.info(f"Released {released} expired holds")
+        self.released += released
+        return released
+
+
+hold_sweeper = HoldSweeper(settings.hold_sweep_interval)
@@ -1,12 +1,13 @@
 import uuid
 
 from enum import Enum
-from decimal import Decimal
 
 from tortoise import fields, models
 
+from ..versioning import VersionMixin, make_etag
 
-class Reservation(models.Model):
+
+class Reservation(VersionMixin, models.Model):
     class ReservationStatus(str, Enum):
         PENDING = "pending"
         CONFIRMED = "confirmed"
@@ -28,11 +29,34 @@ class Reservation(models.Model):
 
     class Meta:
         ordering = ("-created_at",)
+        indexes = (("created_at", "id"),)
 
     class PydanticMeta:
-        exclude = ("availabilities",)
+        # Guest requests are not versioned with the reservation
+        exclude = ("availabilities", "requests")
+
+    @classmethod
+    async def etag(cls, **filters) -> str:
+        # The reservation body embeds its guest, rooms and invoice
+        row = await cls.get(**filters).values_list(
+            "id", "version", "guest__version", "invoice__version"
+        )
+        rooms = await cls.filter(id=row[0]).order_by("rooms__id").values_list(
+            "rooms__id", "rooms__version"
+        )
+        return make_etag(cls.__name__, *row, *rooms)
+
 
-    def reservation_due(self) -> Decimal:
-        room = self.rooms
-        duration_of_stay = (self.check_out_date - self.check_in_date).total_seconds()
-        return room.price * Decimal(duration_of_stay / (3600 * 24))
+class ReservationHold(models.Model):
+    """Rooms set aside for a guest while they check out, see `app.reservations.holds`"""
+
+    id = fields.UUIDField(pk=True, default=uuid.uuid4)
+    guest = fields.ForeignKeyField("models.Guest", related_name="holds", on_delete=fields.CASCADE)
+    occupants = fields.IntField()
+    check_in_date = fields.DatetimeField()
+    check_out_date = fields.DatetimeField()
+    created_at = fields.DatetimeField(auto_now_add=True)
+    expires_at = fields.DatetimeField(index=True)
+
+    class Meta:
+        ordering = ("expires_at",)
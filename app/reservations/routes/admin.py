@@ -1,39 +1,96 @@
+from datetime import date
+from typing import Optional
 from uuid import UUID
 
+from fastapi import Depends, HTTPException, Request
 from fastapi.routing import APIRouter
 from tortoise.transactions import in_transaction
 
 from ..models import Reservation
-from ..schema import Reservation_Pydantic, Reservation_Pydantic_List
+from ...analytics.rollups import reservation_stays, track_stays
+from ...cache import invalidate_rooms
+from ...database.routing import route_reads
+from ...rooms.availability import availability_index
+from ...rooms.models import Room
+from ...versioning import etag_matches, not_modified
+from ..schema import Reservation_Pydantic, Reservation_Serializer, ReservationStatusUpdate
+from ...exports import ExportFormat, export_response, filter_date_range
+from ...pagination import Page, PageParams
+from ...serialization import FastJSONResponse
 
 
-reservation_router = APIRouter(tags=["Reservations"])
+reservation_router = APIRouter(
+    tags=["Reservations"], dependencies=[Depends(route_reads)]
+)
 
 
-@reservation_router.get("/", response_model=Reservation_Pydantic_List)
-async def get_all_reservations():
-    return await Reservation_Pydantic_List.from_queryset(Reservation.all())
+@reservation_router.get("/", response_model=Page[Reservation_Pydantic])
+async def get_all_reservations(page: PageParams = Depends()):
+    return FastJSONResponse(await Reservation_Serializer.page(Reservation.all(), page))
+
+
+@reservation_router.get("/export")
+async def export_reservations(
+    format: ExportFormat = ExportFormat.NDJSON,
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    status: Optional[Reservation.ReservationStatus] = None,
+):
+    """Stream reservations with a check-in date within `[date_from, date_to]`"""
+    query = filter_date_range(Reservation.all(), "check_in_date", date_from, date_to)
+    if status:
+        query = query.filter(status=status)
+    fields = [
+        "id",
+        "guest_id",
+        "created_at",
+        "check_in_date",
+        "check_out_date",
+        "occupants",
+        "status",
+        "guest_checked_out",
+    ]
+    return export_response(query, fields, format, "reservations")
 
 
 @reservation_router.get("/{reservation_id}", response_model=Reservation_Pydantic)
-async def get_single_reservation(reservation_id: UUID):
-    return await Reservation_Pydantic.from_queryset_single(Reservation.get(id=reservation_id))
+async def get_single_reservation(reservation_id: UUID, request: Request):
+    etag = await Reservation.etag(id=reservation_id)
+    if etag_matches(request, etag):
+        return not_modified(etag)
+    reservation = await Reservation_Serializer.one(Reservation.get(id=reservation_id))
+    return FastJSONResponse(reservation, headers={"ETag": etag})
 
 
 @reservation_router.put("/{reservation_id}/checked_out", response_model=dict[str, str])
-async def update_reservation_status(reservation_id: UUID, data: dict[str, bool]):
-    reservation = await Reservation.get(id=reservation_id)
-    await reservation.update_from_dict(data).save()
+async def update_reservation_status(reservation_id: UUID, data: ReservationStatusUpdate):
+    cancelled = Reservation.ReservationStatus.CANCELLED
+    async with in_transaction("default"), track_stays(reservation_stays(reservation_id)):
+        reservation = await Reservation.get(id=reservation_id)
+        # Its rooms may have been booked again since, a cancellation is final
+        if reservation.status == cancelled and data.status not in (None, cancelled):
+            raise HTTPException(409, "A cancelled reservation cannot be reopened")
+        await reservation.update_from_dict(data.model_dump(exclude_none=True)).save()
+    if reservation.status == cancelled:
+        availability_index.release(reservation.id)
+    room_ids = await reservation.rooms.all().values_list("id", flat=True)
+    await Room.touch(id__in=room_ids)
+    await invalidate_rooms(room_ids=room_ids)
     return {"detail": "Reservation has been updated"}
 
 
 @reservation_router.delete("/{reservation_id}", response_model={}, status_code=204)
 async def delete_reservation(reservation_id: UUID):
-    reservation = await Reservation.get(id=reservation_id).prefetch_related("room")
-    async with in_transaction():
-        reserved_rooms = reservation.rooms
+    reservation = await Reservation.get(id=reservation_id).prefetch_related("rooms")
+    reserved_rooms = list(reservation.rooms)
+    async with in_transaction("default"), track_stays(reservation_stays(reservation.id)):
         for room in reserved_rooms:
             room.booked = False
-        await reservation.bulk_update(reserved_rooms, "booked")
+        if reserved_rooms:
+            await Room.bulk_update(reserved_rooms, fields=["booked"])
         await reservation.delete()
-        return {}
+    availability_index.release(reservation.id)
+    room_ids = [room.id for room in reserved_rooms]
+    await Room.touch(id__in=room_ids)
+    await invalidate_rooms(room_ids=room_ids)
+    return {}
@@ -1,118 +1,168 @@
-import yagmail
 from datetime import datetime
+from typing import Optional
 from uuid import UUID
 
-from fastapi import Depends, HTTPException
-from fastapi.background import BackgroundTasks
+from fastapi import Depends, HTTPException, Request
 from fastapi.routing import APIRouter
-from tortoise.transactions import in_transaction
-
+from tortoise import timezone
+
+from ..booking import (
+    BookingConflict,
+    BookingContention,
+    HoldExpired,
+    change_reservation,
+    check_conflicts,
+    create_reservation,
+)
+from ..holds import HoldLimitReached, confirm_hold, create_hold, release_hold
 from ..models import Reservation
-from ..schema import Reservation_Pydantic, ReservationIn
-from ...config import settings
+from ..schema import HoldResponse, Reservation_Pydantic, Reservation_Serializer, ReservationIn
 from ...auth.utils import get_current_active_user
-from ...rooms.models import Room, RoomAvailability
+from ...database.routing import route_reads
+from ...rooms.availability import availability_index
+from ...rooms.models import Room
+from ...serialization import FastJSONResponse
 from ...users.models import Guest
+from ...versioning import etag_matches, not_modified
 
 
-reservation_router = APIRouter(tags=["Reservations"])
+reservation_router = APIRouter(
+    tags=["Reservations"], dependencies=[Depends(route_reads)]
+)
 
 
 def normalize_date(date: datetime):
     return date.replace(second=0, microsecond=0, tzinfo=None)
 
 
-def email_new_reservation(current_user: Guest, reservation: Reservation):
-    with yagmail.SMTP(settings.email_user, settings.email_password) as yag:
-        yag.send(
-            to=current_user.email,
-            subject="New Reservation, Welcome!",
-            contents=f"""
-            Hi {current_user.first_name},
-
-            Thank you for booking a reservation at our hotel. 
-            We are excited to welcome you to our establishment and hope you enjoy your stay.
-
-            Your reservation details are as follows:
-
-            Room Numbers: #{reservation.rooms}
-            # Room Type: room.room_type
-            Cost Per Night: $room.price:.2f
-            Check-In Date: {reservation.check_in_date.date()}
-            Check-Out Date: {reservation.check_out_date.date()}
-            Total Due: ${reservation.reservation_due:.2f}
-
-            If you have any questions or concerns, please don't hesitate to contact us.
-
-            Best regards,
-            Management.
-            """,
-        )
-        return
-
-
 @reservation_router.get("/", response_model=list[Reservation_Pydantic])
 async def guest_reservations(current_user: Guest = Depends(get_current_active_user)):
     # No need to explicitly call the `authorize_obj_access` helper function as
     # reservations are filtered based on `current_user` dependency
-    return await Reservation_Pydantic.from_queryset(
-        Reservation.filter(guest=current_user)
+    return FastJSONResponse(
+        await Reservation_Serializer.all(Reservation.filter(guest=current_user))
+    )
+
+
+async def ensure_available(reservation: ReservationIn, ignore: Optional[UUID] = None):
+    """
+    Fast rejection from the in-memory index, the write itself re-checks under lock. The index of
+    this worker misses the rooms, cancellations and moves of other workers, so whatever it
+    does not accept is decided by the database instead.
+    """
+    check_in = normalize_date(reservation.check_in_date).date()
+    check_out = normalize_date(reservation.check_out_date).date()
+    doubtful = [
+        room_number
+        for room_number in reservation.room_numbers
+        if (room_id := availability_index.room_id(room_number)) is None
+        or not availability_index.is_available(room_id, check_in, check_out, ignore)
+    ]
+    if not doubtful:
+        return
+    rooms = await Room.filter(room_number__in=doubtful)
+    missing = set(doubtful) - {room.room_number for room in rooms}
+    if missing:
+        raise HTTPException(404, f"Room {min(missing)} does not exist")
+    for room in rooms:
+        availability_index.add_room(room.id, room.room_number)
+    try:
+        await check_conflicts(rooms, check_in, check_out, timezone.now(), ignore)
+    except BookingConflict as e:
+        raise HTTPException(409, str(e))
+
+
+def contention_error() -> HTTPException:
+    return HTTPException(
+        409,
+        "The selected rooms are being booked by someone else, please try again",
+        headers={"Retry-After": "1"},
     )
 
 
 @reservation_router.post("/", response_model=Reservation_Pydantic, status_code=201)
 async def make_reservation(
     reservation: ReservationIn,
-    background_task: BackgroundTasks,
     current_user: Guest = Depends(get_current_active_user),
 ):
-    # Check for room availability between check-in and check-out dates
-    for room_number in reservation.room_numbers:
-        check_in = normalize_date(reservation.check_in_date).date()
-        check_out = normalize_date(reservation.check_out_date).date()
-        if await RoomAvailability.check_room_is_available(
-            room_number, check_in, check_out
-        ):
-            raise HTTPException(
-                400, f"Room {room_number} is not available within the selected dates"
-            )
-
-    # Open a transaction to perform multiple db operations
-    async with in_transaction("default"):
-        # Create new reservation
-        new_reservation = await Reservation.create(
-            guest=current_user,
-            check_in_date=reservation.check_in_date,
-            check_out_date=reservation.check_out_date,
-            occupants=reservation.occupants,
-        )
-
-        # Link the reservation with rooms and create RoomAvailability record
-        for room_number in reservation.room_numbers:
-            room = await Room.get_by_room_number(room_number)
-            await new_reservation.rooms.add(room)
-
-            await RoomAvailability.create(
-                room=room,
-                reservation=new_reservation,
-                start_date=new_reservation.check_in_date.date(),
-                end_date=new_reservation.check_out_date.date(),
-                booked=True,
-            )
-
-        # Send new reservation mail
-        background_task.add_task(email_new_reservation, current_user, new_reservation)
-
-        return await Reservation_Pydantic.from_tortoise_orm(new_reservation)
+    await ensure_available(reservation)
+    try:
+        new_reservation = await create_reservation(current_user, reservation)
+    except BookingConflict as e:
+        raise HTTPException(409, str(e))
+    except BookingContention:
+        raise contention_error()
+
+    return await Reservation_Pydantic.from_tortoise_orm(new_reservation)
+
+
+@reservation_router.post("/holds", response_model=HoldResponse, status_code=201)
+async def hold_rooms(
+    reservation: ReservationIn,
+    current_user: Guest = Depends(get_current_active_user),
+):
+    """Take the rooms for `settings.hold_ttl` seconds while the guest checks out"""
+    await ensure_available(reservation)
+    try:
+        hold = await create_hold(current_user, reservation)
+    except BookingConflict as e:
+        raise HTTPException(409, str(e))
+    except HoldLimitReached as e:
+        raise HTTPException(429, str(e))
+    except BookingContention:
+        raise contention_error()
+    return HoldResponse(
+        id=hold.id,
+        room_numbers=reservation.room_numbers,
+        occupants=hold.occupants,
+        check_in_date=hold.check_in_date,
+        check_out_date=hold.check_out_date,
+        expires_at=hold.expires_at,
+    )
+
+
+@reservation_router.post(
+    "/holds/{hold_id}/confirm", response_model=Reservation_Pydantic, status_code=201
+)
+async def confirm_held_rooms(
+    hold_id: UUID,
+    current_user: Guest = Depends(get_current_active_user),
+):
+    try:
+        new_reservation = await confirm_hold(current_user, hold_id)
+    except HoldExpired:
+        raise HTTPException(410, "The hold has expired, please select your rooms again")
+    except BookingConflict as e:
+        raise HTTPException(409, str(e))
+    except BookingContention:
+        raise contention_error()
+
+    return await Reservation_Pydantic.from_tortoise_orm(new_reservation)
+
+
+@reservation_router.delete("/holds/{hold_id}", response_model={}, status_code=204)
+async def release_held_rooms(
+    hold_id: UUID,
+    current_user: Guest = Depends(get_current_active_user),
+):
+    if not await release_hold(current_user, hold_id):
+        raise HTTPException(404, "Hold not found")
+    return {}
 
 
 @reservation_router.get("/{reservation_id}", response_model=Reservation_Pydantic)
 async def get_single_reservation(
-    reservation_id: UUID, current_user: Guest = Depends(get_current_active_user)
+    reservation_id: UUID,
+    request: Request,
+    current_user: Guest = Depends(get_current_active_user),
 ):
-    return await Reservation_Pydantic.from_queryset_single(
+    etag = await Reservation.etag(id=reservation_id, guest=current_user)
+    if etag_matches(request, etag):
+        return not_modified(etag)
+    reservation = await Reservation_Serializer.one(
         Reservation.get(id=reservation_id, guest=current_user)
     )
+    return FastJSONResponse(reservation, headers={"ETag": etag})
 
 
 @reservation_router.put("/{reservation_id}", response_model=Reservation_Pydantic)
@@ -122,14 +172,14 @@ async def update_reservation(
     current_user: Guest = Depends(get_current_active_user),
 ):
     reservation_obj = await Reservation.get(id=reservation_id, guest=current_user)
-    await reservation_obj.update_from_dict(
-        **reservation.model_dump(exclude={"room_numbers"})
-    )
-    await reservation_obj.save()
-    rooms = [
-        await Room.get_by_room_number(room_number)
-        for room_number in reservation.room_numbers
-    ]
-    await reservation_obj.rooms.add(rooms)
+    if reservation_obj.status == Reservation.ReservationStatus.CANCELLED:
+        raise HTTPException(409, "A cancelled reservation cannot be updated")
+    await ensure_available(reservation, ignore=reservation_obj.id)
+    try:
+        await change_reservation(reservation_obj, reservation)
+    except BookingConflict as e:
+        raise HTTPException(409, str(e))
+    except BookingContention:
+        raise contention_error()
 
     return await Reservation_Pydantic.from_tortoise_orm(reservation_obj)
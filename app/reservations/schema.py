@@ -1,14 +1,18 @@
 from datetime import datetime
+from typing import Optional
+from uuid import UUID
 
 from pydantic import BaseModel, Field, model_validator, field_validator
 from tortoise.contrib.pydantic import pydantic_model_creator, pydantic_queryset_creator
 
 from .models import Reservation 
+from ..serialization import ProjectionSerializer
 
 
 Reservation_Pydantic_List = pydantic_queryset_creator(Reservation)
 ReservationBase_Pydantic = pydantic_model_creator(Reservation)
 Reservation_Pydantic = pydantic_model_creator(Reservation)
+Reservation_Serializer = ProjectionSerializer(Reservation_Pydantic)
 
 
 class ReservationHistory(BaseModel):
@@ -40,3 +44,17 @@ class ReservationIn(BaseModel):
         if len(room_numbers) != len(set(room_numbers)):
             raise ValueError("Duplicate room numbers are not allowed.")
         return room_numbers
+
+
+class ReservationStatusUpdate(BaseModel):
+    status: Optional[Reservation.ReservationStatus] = None
+    guest_checked_out: Optional[bool] = None
+
+
+class HoldResponse(BaseModel):
+    id: UUID
+    room_numbers: list[int]
+    occupants: int
+    check_in_date: datetime
+    check_out_date: datetime
+    expires_at: datetime
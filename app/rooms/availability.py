@@ -0,0 +1,199 @@
+"""
+In-process index of booked date ranges per room.
+
+The index mirrors the non-cancelled rows of `RoomAvailability` so availability questions
+("is room X free on [start, end)", "which rooms are free on [start, end)") are answered
+from memory instead of issuing one query per room. It is loaded on startup and must be
+kept up to date by every code path that books, cancels or deletes inventory.
+
+Live `RoomHold`s are indexed like bookings, keyed by their hold id, so held rooms read as
+occupied. Hold expiry times are kept in a min-heap and expired holds are dropped lazily, before
+each availability question, in O(log n) per hold.
+
+Every worker has its own index, which only sees the writes of other workers when it is next
+loaded. It is therefore only trusted where the database has the last word: booking pre-checks
+accept from it and confirm its rejections in the database, and the write re-checks under lock.
+Room search queries the database.
+"""
+
+import heapq
+import logging
+from bisect import bisect_left
+from datetime import date, datetime, timedelta
+from typing import Iterable, Optional
+from uuid import UUID
+
+from tortoise import timezone
+
+from ..reservations.models import Reservation
+from .models import Room, RoomAvailability, RoomHold
+
+
+logger = logging.getLogger(__name__)
+
+
+class RoomIntervals:
+    """Booked `[start, end)` ranges of a single room, sorted by start date."""
+
+    __slots__ = ("starts", "intervals", "longest")
+
+    def __init__(self):
+        self.starts: list[date] = []
+        self.intervals: list[tuple[date, date, UUID]] = []
+        self.longest = timedelta(0)
+
+    def add(self, start: date, end: date, reservation_id: UUID):
+        interval = (start, end, reservation_id)
+        index = bisect_left(self.intervals, interval)
+        self.starts.insert(index, start)
+        self.intervals.insert(index, interval)
+        self.longest = max(self.longest, end - start)
+
+    def remove(self, reservation_id: UUID):
+        kept = [interval for interval in self.intervals if interval[2] != reservation_id]
+        self.intervals = kept
+        self.starts = [interval[0] for interval in kept]
+        self.longest = max((end - start for start, end, _ in kept), default=timedelta(0))
+
+    def overlaps(self, start: date, end: date, ignore: Optional[UUID] = None) -> bool:
+        # Any range overlapping [start, end) must begin before `end` and no earlier than
+        # `start - longest`, so only that slice of the sorted list needs to be inspected.
+        upper = bisect_left(self.starts, end)
+        lower = bisect_left(self.starts, start - self.longest, 0, upper)
+        for interval_start, interval_end, reservation_id in self.intervals[lower:upper]:
+            if interval_end > start and reservation_id != ignore:
+                return True
+        return False
+
+
+class AvailabilityIndex:
+    def __init__(self):
+        self.loaded = False
+        self._rooms: dict[UUID, RoomIntervals] = {}
+        self._room_numbers: dict[int, UUID] = {}
+        self._numbers_by_room: dict[UUID, int] = {}
+        self._reservation_rooms: dict[UUID, set[UUID]] = {}
+        self._hold_expiry: dict[UUID, datetime] = {}
+        self._expiry_heap: list[tuple[datetime, UUID]] = []
+
+    async def load(self):
+        """(Re)build the index from the `Room` and `RoomAvailability` tables."""
+        rooms = await Room.all().values_list("id", "room_number")
+        availabilities = await RoomAvailability.exclude(
+            reservation__status=Reservation.ReservationStatus.CANCELLED
+        ).values_list("room_id", "reservation_id", "start_date", "end_date")
+        holds = await RoomHold.live(timezone.now()).values_list(
+            "room_id", "hold_id", "start_date", "end_date", "expires_at"
+        )
+        self._rooms, self._room_numbers, self._numbers_by_room = {}, {}, {}
+        self._reservation_rooms = {}
+        self._hold_expiry, self._expiry_heap = {}, []
+        for room_id, room_number in rooms:
+            self.add_room(room_id, room_number)
+        for room_id, reservation_id, start, end in availabilities:
+            self.book(room_id, reservation_id, start, end)
+        for room_id, hold_id, start, end, expires_at in holds:
+            self.hold([room_id], hold_id, start, end, expires_at)
+        self.loaded = True
+        logger.info(
+            f"Availability index loaded: {len(rooms)} rooms, {len(availabilities)} bookings, "
+            f"{len(holds)} held rooms."
+        )
+
+    def add_room(self, room_id: UUID, room_number: int):
+        previous_number = self._numbers_by_room.get(room_id)
+        if previous_number is not None:
+            self._room_numbers.pop(previous_number, None)
+        self._rooms.setdefault(room_id, RoomIntervals())
+        self._room_numbers[room_number] = room_id
+        self._numbers_by_room[room_id] = room_number
+
+    def remove_room(self, room_id: UUID):
+        self._rooms.pop(room_id, None)
+        room_number = self._numbers_by_room.pop(room_id, None)
+        if room_number is not None:
+            self._room_numbers.pop(room_number, None)
+        for room_ids in self._reservation_rooms.values():
+            room_ids.discard(room_id)
+
+    def room_id(self, room_number: int) -> Optional[UUID]:
+        return self._room_numbers.get(room_number)
+
+    def book(self, room_id: UUID, reservation_id: UUID, start: date, end: date):
+        self._rooms.setdefault(room_id, RoomIntervals()).add(start, end, reservation_id)
+        self._reservation_rooms.setdefault(reservation_id, set()).add(room_id)
+
+    def release(self, reservation_id: UUID):
+        """Drop every range held by a cancelled or deleted reservation."""
+        for room_id in self._reservation_rooms.pop(reservation_id, ()):
+            if room_id in self._rooms:
+                self._rooms[room_id].remove(reservation_id)
+
+    def hold(
+        self, room_ids: Iterable[UUID], hold_id: UUID, start: date, end: date, expires_at: datetime
+    ):
+        for room_id in room_ids:
+            self.book(room_id, hold_id, start, end)
+        if hold_id not in self._hold_expiry:
+            self._hold_expiry[hold_id] = expires_at
+            heapq.heappush(self._expiry_heap, (expires_at, hold_id))
+
+    def release_hold(self, hold_id: UUID):
+        """Drop a hold that was confirmed or cancelled before expiring"""
+        # Its heap entry is discarded when it reaches the top
+        self._hold_expiry.pop(hold_id, None)
+        self.release(hold_id)
+
+    def expire_holds(self, now: Optional[datetime] = None) -> int:
+        now = now or timezone.now()
+        expired = 0
+        while self._expiry_heap and self._expiry_heap[0][0] <= now:
+            expires_at, hold_id = heapq.heappop(self._expiry_heap)
+            if self._hold_expiry.get(hold_id) == expires_at:
+                del self._hold_expiry[hold_id]
+                self.release(hold_id)
+                expired += 1
+        return expired
+
+    def is_available(
+        self, room_id: UUID, start: date, end: date, ignore: Optional[UUID] = None
+    ) -> bool:
+        self.expire_holds()
+        intervals = self._rooms.get(room_id)
+        return intervals is None or not intervals.overlaps(start, end, ignore)
+
+    def available_rooms(
+        self, start: date, end: date, room_ids: Optional[Iterable[UUID]] = None
+    ) -> list[UUID]:
+        self.expire_holds()
+        candidates = self._rooms.keys() if room_ids is None else room_ids
+        return [room_id for room_id in candidates if self.is_available(room_id, start, end)]
+
+    async def check_consistency(self) -> dict[str, list]:
+        """
+        Compare the index with the database and report any drift.
+
+        An empty `missing` and `unexpected` list means every non-cancelled
+        `RoomAvailability` row is indexed and nothing else is.
+        """
+        rows = await RoomAvailability.exclude(
+            reservation__status=Reservation.ReservationStatus.CANCELLED
+        ).values_list("room_id", "reservation_id", "start_date", "end_date")
+        in_db = {(str(room_id), str(res_id), start, end) for room_id, res_id, start, end in rows}
+        in_index = {
+            (str(room_id), str(res_id), start, end)
+            for room_id, intervals in self._rooms.items()
+            for start, end, res_id in intervals.intervals
+            if res_id not in self._hold_expiry
+        }
+        room_ids = {str(room_id) for room_id in await Room.all().values_list("id", flat=True)}
+        indexed_rooms = {str(room_id) for room_id in self._rooms}
+        return {
+            "missing": sorted(in_db - in_index),
+            "unexpected": sorted(in_index - in_db),
+            "missing_rooms": sorted(room_ids - indexed_rooms),
+            "unexpected_rooms": sorted(indexed_rooms - room_ids),
+        }
+
+
+availability_index = AvailabilityIndex()
@@ -0,0 +1,407 @@
+"""
+Room image upload and storage pipeline.
+
+Uploads are read straight from the multipart request stream: each file part is hashed and
+appended to a temporary file as its chunks arrive, with the file writes in worker threads, so
+memory per upload is bounded by the request chunk size whatever the size of the image.
+
+Images are stored content-addressed under `UPLOAD_DIR`:
+
+    originals/ab/abcdef....jpg      the uploaded file, named after its sha256
+    variants/abcdef.../thumbnail.webp
+
+A file that is already stored is not written again and its variants are reused. Decoding,
+verification and resizing run in a process pool, away from the event loop.
+
+Uploads and deletions of the same file hold a lock keyed by its sha256 from the moment the
+file is stored until its `RoomImage` is committed, and from deleting a `RoomImage` until its
+files are removed. A deletion therefore never removes the files of an upload that found them
+already stored and is about to reference them. The locks are per process, like the SQLite
+writer lock of `app.reservations.booking`.
+"""
+
+import asyncio
+import hashlib
+import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import AsyncExitStack, asynccontextmanager
+from pathlib import Path
+from typing import AsyncIterator, BinaryIO, Iterable, Optional
+from weakref import WeakValueDictionary
+
+import multipart
+from multipart.exceptions import MultipartParseError
+from multipart.multipart import parse_options_header
+from tortoise.transactions import in_transaction
+
+from ..config import UPLOAD_DIR, settings
+from .models import Room, RoomImage
+
+
+# Pillow format name to (file extension, content type)
+FORMATS = {
+    "JPEG": ("jpg", "image/jpeg"),
+    "PNG": ("png", "image/png"),
+    "WEBP": ("webp", "image/webp"),
+    "GIF": ("gif", "image/gif"),
+}
+MAX_FIELD_BYTES = 1024
+
+_pool: Optional[ProcessPoolExecutor] = None
+_digest_locks: WeakValueDictionary[str, asyncio.Lock] = WeakValueDictionary()
+
+
+class ImageRejected(Exception):
+    def __init__(self, status_code: int, detail: str):
+        self.status_code = status_code
+        super().__init__(detail)
+
+
+@asynccontextmanager
+async def digest_locks(digests: Iterable[str]):
+    """Hold the locks of the stored files `digests`, taken in order so writers cannot deadlock"""
+    locks = []
+    for digest in sorted(set(digests)):
+        lock = _digest_locks.get(digest)
+        if lock is None:
+            lock = _digest_locks[digest] = asyncio.Lock()
+        locks.append(lock)
+    async with AsyncExitStack() as stack:
+        for lock in locks:
+            await stack.enter_async_context(lock)
+        yield
+
+
+def original_path(digest: str, extension: str) -> str:
+    return f"originals/{digest[:2]}/{digest}.{extension}"
+
+
+def variant_path(digest: str, name: str) -> str:
+    return f"variants/{digest}/{name}.webp"
+
+
+def save_atomically(image, path: Path, **params):
+    """Write through a temporary file so concurrent uploads of one image never see half a file"""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    temp_path = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    image.save(temp_path, **params)
+    os.replace(temp_path, path)
+
+
+def process_image(
+    source: str, digest: str, root: str, variants: dict[str, int], max_pixels: int
+) -> dict:
+    """
+    Runs in the image process pool: verify the upload at `source`, move it to its
+    content address and produce the resized variants that are not stored yet.
+    """
+    from PIL import Image, ImageOps
+
+    with Image.open(source) as image:
+        if image.format not in FORMATS:
+            raise ValueError(f"unsupported image format {image.format}")
+        image_format, (width, height) = image.format, image.size
+        # Checked before decoding any pixel data
+        if width * height > max_pixels:
+            raise ValueError(f"{width}x{height} exceeds {max_pixels} pixels")
+        image.verify()
+
+    extension, content_type = FORMATS[image_format]
+    original = original_path(digest, extension)
+    stored = Path(root, original)
+    if stored.exists():
+        os.remove(source)
+    else:
+        stored.parent.mkdir(parents=True, exist_ok=True)
+        os.replace(source, stored)
+
+    missing = {
+        name: size
+        for name, size in variants.items()
+        if not Path(root, variant_path(digest, name)).exists()
+    }
+    if missing:
+        with Image.open(stored) as image:
+            # Lets the JPEG decoder downscale while decoding instead of loading full size
+            image.draft("RGB", (max(missing.values()),) * 2)
+            image = ImageOps.exif_transpose(image)
+            has_alpha = "A" in image.getbands() or "transparency" in image.info
+            image = image.convert("RGBA" if has_alpha else "RGB")
+            for name, size in sorted(missing.items(), key=lambda item: -item[1]):
+                image.thumbnail((size, size))
+                path = Path(root, variant_path(digest, name))
+                save_atomically(image, path, format="WEBP", quality=82)
+
+    return {
+        "image_path": original,
+        "content_type": content_type,
+        "width": width,
+        "height": height,
+        "variants": {name: variant_path(digest, name) for name in variants},
+    }
+
+
+def image_pool() -> ProcessPoolExecutor:
+    global _pool
+    if _pool is None:
+        _pool = ProcessPoolExecutor(max_workers=settings.image_workers)
+    return _pool
+
+
+def shutdown_image_pool():
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+
+class ReceivedFile:
+    """A file part streamed to a temporary file under `UPLOAD_DIR/tmp`"""
+
+    def __init__(self, filename: str):
+        self.filename = filename
+        self.size = 0
+        self.path: Optional[Path] = None
+        self._digest = hashlib.sha256()
+        self._file: Optional[BinaryIO] = None
+
+    @property
+    def digest(self) -> str:
+        return self._digest.hexdigest()
+
+    def write(self, data: bytes):
+        """Blocking, called in a worker thread"""
+        if self._file is None:
+            temp_dir = UPLOAD_DIR / "tmp"
+            temp_dir.mkdir(parents=True, exist_ok=True)
+            self._file = tempfile.NamedTemporaryFile(dir=temp_dir, delete=False)
+            self.path = Path(self._file.name)
+        self._file.write(data)
+        self._digest.update(data)
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+
+    def discard(self):
+        self.close()
+        if self.path is not None and self.path.exists():
+            self.path.unlink()
+
+
+class ImageUploadParser:
+    """
+    Multipart parser for image uploads, every file part is an image and text parts named
+    `caption` label the files in order. Modelled on Starlette's `MultiPartParser`, but file
+    data goes to `ReceivedFile`s instead of in-memory spooled files.
+    """
+
+    def __init__(self, content_type: str, stream: AsyncIterator[bytes]):
+        self.content_type = content_type
+        self.stream = stream
+        self.files: list[ReceivedFile] = []
+        self.captions: list[str] = []
+        self._header_name = b""
+        self._header_value = b""
+        self._disposition = b""
+        self._file: Optional[ReceivedFile] = None
+        self._field_name = ""
+        self._field_data = b""
+        self._file_data: list[tuple[ReceivedFile, bytes]] = []
+
+    def on_part_begin(self):
+        self._disposition = b""
+        self._file = None
+        self._field_data = b""
+
+    def on_part_data(self, data: bytes, start: int, end: int):
+        if self._file is not None:
+            self._file_data.append((self._file, data[start:end]))
+            self._file.size += end - start
+            if self._file.size > settings.image_max_bytes:
+                raise ImageRejected(
+                    413, f"{self._file.filename} exceeds {settings.image_max_bytes} bytes"
+                )
+        else:
+            self._field_data += data[start:end]
+            if len(self._field_data) > MAX_FIELD_BYTES:
+                raise ImageRejected(400, f"Field {self._field_name} is too long")
+
+    def on_part_end(self):
+        if self._file is None and self._field_name == "caption":
+            caption = self._field_data.decode("utf-8", errors="replace")
+            if len(caption) > RoomImage._meta.fields_map["caption"].max_length:
+                raise ImageRejected(400, "Caption is too long")
+            self.captions.append(caption)
+
+    def on_header_field(self, data: bytes, start: int, end: int):
+        self._header_name += data[start:end]
+
+    def on_header_value(self, data: bytes, start: int, end: int):
+        self._header_value += data[start:end]
+
+    def on_header_end(self):
+        if self._header_name.lower() == b"content-disposition":
+            self._disposition = self._header_value
+        self._header_name = b""
+        self._header_value = b""
+
+    def on_headers_finished(self):
+        _, options = parse_options_header(self._disposition)
+        self._field_name = options.get(b"name", b"").decode("utf-8", errors="replace")
+        if b"filename" in options:
+            if len(self.files) == settings.image_max_files:
+                raise ImageRejected(400, f"At most {settings.image_max_files} images per upload")
+            self._file = ReceivedFile(options[b"filename"].decode("utf-8", errors="replace"))
+            self.files.append(self._file)
+
+    async def _write_pending(self):
+        # One blocking write per file and request chunk, in a worker thread
+        by_file: dict[ReceivedFile, list[bytes]] = {}
+        for received, data in self._file_data:
+            by_file.setdefault(received, []).append(data)
+        self._file_data.clear()
+        for received, pieces in by_file.items():
+            await asyncio.to_thread(received.write, b"".join(pieces))
+
+    async def parse(self) -> tuple[list[ReceivedFile], list[str]]:
+        _, params = parse_options_header(self.content_type)
+        if b"boundary" not in params:
+            raise ImageRejected(400, "Expected a multipart/form-data body")
+        parser = multipart.MultipartParser(
+            params[b"boundary"],
+            {
+                "on_part_begin": self.on_part_begin,
+                "on_part_data": self.on_part_data,
+                "on_part_end": self.on_part_end,
+                "on_header_field": self.on_header_field,
+                "on_header_value": self.on_header_value,
+                "on_header_end": self.on_header_end,
+                "on_headers_finished": self.on_headers_finished,
+            },
+        )
+        try:
+            async for chunk in self.stream:
+                parser.write(chunk)
+                await self._write_pending()
+            parser.finalize()
+            await self._write_pending()
+        except MultipartParseError as e:
+            await asyncio.to_thread(discard_all, self.files)
+            raise ImageRejected(400, f"Malformed multipart body: {e}") from e
+        except BaseException:
+            await asyncio.to_thread(discard_all, self.files)
+            raise
+        finally:
+            for received in self.files:
+                received.close()
+        if not self.files:
+            raise ImageRejected(400, "No image in the upload")
+        return self.files, self.captions
+
+
+def discard_all(files: list[ReceivedFile]):
+    for received in files:
+        received.discard()
+
+
+async def store_images(
+    room: Room, content_type: str, stream: AsyncIterator[bytes]
+) -> list[RoomImage]:
+    """
+    Store the images of a multipart upload for `room`.
+
+    Raises `ImageRejected` if the upload is malformed, too large, or has a file that is
+    not a supported image. Either every image of the upload is stored or none.
+    """
+    files, captions = await ImageUploadParser(content_type, stream).parse()
+    empty = [received.filename for received in files if received.path is None]
+    if empty:
+        await asyncio.to_thread(discard_all, files)
+        raise ImageRejected(415, f"{', '.join(empty)} is empty")
+    async with digest_locks(received.digest for received in files):
+        return await store_received(room, files, captions)
+
+
+async def store_received(
+    room: Room, files: list[ReceivedFile], captions: list[str]
+) -> list[RoomImage]:
+    """Store the parsed files of an upload, must hold their `digest_locks`"""
+    loop = asyncio.get_running_loop()
+    results = await asyncio.gather(
+        *(
+            loop.run_in_executor(
+                image_pool(),
+                process_image,
+                str(received.path),
+                received.digest,
+                str(UPLOAD_DIR),
+                settings.image_variants,
+                settings.image_max_pixels,
+            )
+            for received in files
+        ),
+        return_exceptions=True,
+    )
+    # Files that were stored have been moved already, this removes the rejected ones
+    await asyncio.to_thread(discard_all, files)
+    for received, result in zip(files, results):
+        if not isinstance(result, BaseException):
+            continue
+        await remove_unreferenced(files, results)
+        if isinstance(result, ValueError):
+            raise ImageRejected(415, f"{received.filename} is not a supported image: {result}")
+        # Pillow could not decode it, its message would name our temporary file
+        raise ImageRejected(415, f"{received.filename} is not a supported image")
+
+    try:
+        async with in_transaction("default"):
+            return [
+                await RoomImage.create(
+                    room=room,
+                    caption=captions[index] if index < len(captions) else None,
+                    content_hash=received.digest,
+                    size=received.size,
+                    **result,
+                )
+                for index, (received, result) in enumerate(zip(files, results))
+            ]
+    except BaseException:
+        await remove_unreferenced(files, results)
+        raise
+
+
+async def remove_unreferenced(files: list[ReceivedFile], results: list):
+    """Remove the files an abandoned upload stored that no `RoomImage` shares"""
+    stored = {
+        received.digest: result["image_path"]
+        for received, result in zip(files, results)
+        if not isinstance(result, BaseException)
+    }
+    shared = set(
+        await RoomImage.filter(content_hash__in=list(stored)).values_list(
+            "content_hash", flat=True
+        )
+    )
+    for digest, image_path in stored.items():
+        if digest not in shared:
+            await asyncio.to_thread(remove_stored_files, image_path, digest)
+
+
+def remove_stored_files(image_path: str, digest: str):
+    """Blocking, called in a worker thread"""
+    Path(UPLOAD_DIR, image_path).unlink(missing_ok=True)
+    variants = Path(UPLOAD_DIR, "variants", digest)
+    if variants.is_dir():
+        for variant in variants.iterdir():
+            variant.unlink(missing_ok=True)
+        variants.rmdir()
+
+
+async def delete_image(image: RoomImage):
+    """Delete `image`, and its files once no other image shares them"""
+    async with digest_locks([image.content_hash]):
+        await image.delete()
+        if not await RoomImage.exists(content_hash=image.content_hash):
+            await asyncio.to_thread(remove_stored_files, image.image_path, image.content_hash)
@@ -0,0 +1,124 @@
+"""
+Bulk room inventory import.
+
+Rows are validated with `RoomIn_Pydantic` one chunk at a time while the upload streams in,
+and each chunk is checked against existing room numbers with a single query. Valid rows are
+written with `bulk_create`, in one of two modes:
+
+- atomic: nothing is written unless every row is valid, then all rooms are created in one
+  transaction. Rooms already in the database are errors.
+- batched: every chunk is committed on its own and invalid rows are skipped. Rooms already in
+  the database are skipped too, so re-sending the same file after a failure resumes the import.
+"""
+
+from typing import AsyncIterator
+
+from pydantic import ValidationError
+from tortoise.transactions import in_transaction
+
+from ..analytics.rollups import refresh_rooms_available
+from ..cache import invalidate_rooms
+from ..config import settings
+from ..exports import ExportFormat
+from ..imports import ImportRowError, iter_record_chunks, validation_messages
+from .availability import availability_index
+from .models import Room
+from .schema import RoomImportResult, RoomIn_Pydantic
+
+
+class ImportReport:
+    def __init__(self):
+        self.result = RoomImportResult(rows=0, created=0, skipped=0, failed=0, errors=[])
+
+    def fail(self, error: ImportRowError):
+        self.result.failed += 1
+        if len(self.result.errors) < settings.import_max_reported_errors:
+            self.result.errors.append(error)
+
+
+def build_room(room) -> Room:
+    """ORM instance of a validated row, raises ValueError for values the columns would reject"""
+    price_field = Room._meta.fields_map["price"]
+    if abs(room.price) >= 10 ** (price_field.max_digits - price_field.decimal_places):
+        raise ValueError(f"price: {room.price} has too many digits")
+    try:
+        return Room(**room.model_dump())
+    except ValueError as e:
+        # An unknown `room_type`, which the Pydantic model only checks for length
+        raise ValueError(f"room_type: {e}") from e
+
+
+async def validate_chunk(
+    chunk, seen: set[int], skip_existing: bool, report: ImportReport
+) -> list[Room]:
+    """Rooms of the valid rows of `chunk`, reporting the others"""
+    candidates = []
+    for row, record in chunk:
+        report.result.rows += 1
+        if isinstance(record, ImportRowError):
+            report.fail(record)
+            continue
+        try:
+            # `room_type` is nullable, so a row may leave it out
+            room = RoomIn_Pydantic.model_validate({"room_type": None, **record})
+            room_obj = build_room(room)
+        except ValidationError as e:
+            report.fail(ImportRowError(row=row, errors=validation_messages(e)))
+            continue
+        except ValueError as e:
+            report.fail(ImportRowError(row=row, errors=[str(e)]))
+            continue
+        if room.room_number in seen:
+            error = f"room_number: {room.room_number} appears more than once in the upload"
+            report.fail(ImportRowError(row=row, errors=[error]))
+            continue
+        seen.add(room.room_number)
+        candidates.append((row, room_obj))
+
+    existing = set(
+        await Room.filter(
+            room_number__in=[room.room_number for _, room in candidates]
+        ).values_list("room_number", flat=True)
+    )
+    rooms = []
+    for row, room in candidates:
+        if room.room_number not in existing:
+            rooms.append(room)
+        elif skip_existing:
+            report.result.skipped += 1
+        else:
+            error = f"room_number: room {room.room_number} already exists"
+            report.fail(ImportRowError(row=row, errors=[error]))
+    return rooms
+
+
+async def import_rooms(
+    stream: AsyncIterator[bytes], import_format: ExportFormat, atomic: bool = True
+) -> RoomImportResult:
+    chunk_size = settings.import_chunk_size
+    report = ImportReport()
+    seen: set[int] = set()
+    created: list[Room] = []
+    pending: list[Room] = []
+    async for chunk in iter_record_chunks(stream, import_format, chunk_size):
+        rooms = await validate_chunk(chunk, seen, not atomic, report)
+        if atomic:
+            # Held back until the whole upload is known to be valid
+            pending.extend(rooms)
+        elif rooms:
+            async with in_transaction("default"):
+                await Room.bulk_create(rooms, batch_size=chunk_size)
+            created.extend(rooms)
+
+    if atomic and not report.result.failed and pending:
+        async with in_transaction("default"):
+            await Room.bulk_create(pending, batch_size=chunk_size)
+        created = pending
+
+    for room in created:
+        availability_index.add_room(room.id, room.room_number)
+    if created:
+        await refresh_rooms_available()
+        await invalidate_rooms(room_numbers=[room.room_number for room in created])
+    report.result.created = len(created)
+    return report.result
@@ -1,13 +1,23 @@
 import uuid
 from enum import Enum
-from datetime import date
+from datetime import date, datetime
 
 from tortoise import fields, models
+from tortoise.expressions import Subquery
 
 from ..reservations.models import Reservation
+from ..versioning import VersionMixin, make_etag
 
 
-class Room(models.Model):
+# Review ratings range from 0 to 10 (see `ReviewIn`)
+RATING_SCALE = range(11)
+
+
+def empty_rating_histogram() -> list[int]:
+    return [0] * len(RATING_SCALE)
+
+
+class Room(VersionMixin, models.Model):
     class RoomType(str, Enum):
         STANDARD = "Standard"
         DELUXE = "Deluxe"
@@ -21,19 +31,51 @@ class Room(models.Model):
     price = fields.DecimalField(
         max_digits=5, decimal_places=3, description="price of room per night"
     )
+    # Review aggregates, maintained by `app.rooms.ratings` in the review write transactions
+    review_count = fields.IntField(default=0)
+    rating_sum = fields.IntField(default=0)
+    rating_average = fields.FloatField(default=0.0)
+    rating_histogram = fields.JSONField(
+        default=empty_rating_histogram, description="number of reviews per rating, 0 to 10"
+    )
 
     reservations: fields.ManyToManyRelation[Reservation]
     reviews: fields.ReverseRelation["Review"]
+    images: fields.ReverseRelation["RoomImage"]
 
     class Meta:
         ordering = ("room_number",)
+        # The orderings of `RoomSort`, with the primary key keyset pagination adds
+        indexes = (("rating_average", "review_count", "id"), ("review_count", "id"))
 
     class PydanticMeta:
-        exclude = ("availabilities",)
+        # Guest requests are not versioned with the room, they are served by `guest_requests`.
+        # Guests and invoices change without a `Room.touch`, and are not the public's business,
+        # so the embedded reservations leave them out
+        exclude = (
+            "availabilities",
+            "holds",
+            "images",
+            "request",
+            "reservations.guest",
+            "reservations.invoice",
+        )
 
     def __str__(self) -> str:
         return f"<Room: {self.room_number}>"
 
+    @classmethod
+    async def etag(cls, **filters) -> str:
+        # The room body embeds its reservations and reviews
+        room_id, version = await cls.get(**filters).values_list("id", "version")
+        reservations = await Reservation.filter(rooms__id=room_id).order_by("id").values_list(
+            "id", "version"
+        )
+        reviews = await Review.filter(room_id=room_id).order_by("id").values_list(
+            "id", "version"
+        )
+        return make_etag(cls.__name__, room_id, version, *reservations, *reviews)
+
     @classmethod
     def get_by_room_number(cls, room_number: int):
         return cls.get(room_number=room_number)
@@ -50,13 +92,39 @@ class RoomAvailability(models.Model):
     booked = fields.BooleanField(default=False)
     start_date = fields.DateField()
     end_date = fields.DateField()
+    price = fields.DecimalField(
+        max_digits=12,
+        decimal_places=2,
+        null=True,
+        description="stay at the rates it was booked at, null if booked before prices were kept",
+    )
 
     class Meta:
-        unique_together = ("room", "start_date", "end_date")
+        # Not unique: the rows of cancelled reservations are kept and the same room and dates
+        # can be booked again. Double bookings are prevented by `app.reservations.booking`.
+        indexes = (("room_id", "start_date"),)
 
     @classmethod
     def check_room_is_available(cls, room: Room, start: date, end: date):
-        return cls.filter(room=room, start_date__lt=end, end_date__gt=start).exists()
+        return (
+            cls.filter(room=room, start_date__lt=end, end_date__gt=start)
+            .exclude(reservation__status=Reservation.ReservationStatus.CANCELLED)
+            .exists()
+        )
+
+    @classmethod
+    def booked_room_ids(cls, start: date, end: date):
+        """Subquery of ids of rooms with a non-cancelled booking overlapping `[start, end)`"""
+        active_reservations = Reservation.exclude(
+            status=Reservation.ReservationStatus.CANCELLED
+        ).values("id")
+        return Subquery(
+            cls.filter(
+                start_date__lt=end,
+                end_date__gt=start,
+                reservation_id__in=Subquery(active_reservations),
+            ).values("room_id")
+        )
 
     @classmethod
     async def update_booked_status(
@@ -68,7 +136,56 @@ class RoomAvailability(models.Model):
             await availability.save()
 
 
-class Review(models.Model):
+class RoomHold(models.Model):
+    """One room of a `ReservationHold`, with the hold's dates and expiry copied for lookups"""
+
+    id = fields.IntField(pk=True)
+    hold = fields.ForeignKeyField(
+        "models.ReservationHold", related_name="rooms", on_delete=fields.CASCADE
+    )
+    room = fields.ForeignKeyField("models.Room", related_name="holds", on_delete=fields.CASCADE)
+    start_date = fields.DateField()
+    end_date = fields.DateField()
+    expires_at = fields.DatetimeField(index=True)
+
+    class Meta:
+        indexes = (("room_id", "start_date"),)
+
+    @classmethod
+    def live(cls, now: datetime):
+        return cls.filter(expires_at__gt=now)
+
+    @classmethod
+    def held_room_ids(cls, start: date, end: date, now: datetime):
+        """Subquery of ids of rooms with a live hold overlapping `[start, end)`"""
+        return Subquery(
+            cls.live(now).filter(start_date__lt=end, end_date__gt=start).values("room_id")
+        )
+
+
+class RoomImage(models.Model):
+    """A picture of a room, several rows may share one file, see `app.rooms.images`"""
+
+    id = fields.IntField(pk=True)
+    room = fields.ForeignKeyField("models.Room", related_name="images", on_delete=fields.CASCADE)
+    caption = fields.CharField(max_length=200, null=True)
+    content_hash = fields.CharField(max_length=64, index=True, description="sha256 of the file")
+    image_path = fields.CharField(max_length=255, description="relative to the upload directory")
+    content_type = fields.CharField(max_length=50)
+    size = fields.IntField(description="bytes")
+    width = fields.IntField()
+    height = fields.IntField()
+    variants = fields.JSONField(default=dict, description="variant name to relative path")
+    created_at = fields.DatetimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ("id",)
+
+    class PydanticMeta:
+        exclude = ("room",)
+
+
+class Review(VersionMixin, models.Model):
     id = fields.IntField(pk=True)
     room = fields.ForeignKeyField(
         "models.Room", related_name="reviews", on_delete=fields.CASCADE
@@ -82,8 +199,17 @@ class Review(models.Model):
 
     class Meta:
         ordering = ("-created_at",)
+        indexes = (("created_at", "id"),)
 
     class PydanticMeta:
         exclude = (
             "guest",
         )  # Use the `guest_id` field instead of it's objects (and relations)
+
+    @classmethod
+    async def etag(cls, **filters) -> str:
+        # The review body embeds its room
+        review_id, version, room_id = await cls.get(**filters).values_list(
+            "id", "version", "room_id"
+        )
+        return make_etag(cls.__name__, review_id, version, await Room.etag(id=room_id))
@@ -0,0 +1,100 @@
+"""
+Per-room review aggregates: review count, rating sum, average and histogram.
+
+Review writes apply their delta to the room's aggregate columns inside the same transaction as
+the review itself, with the room row locked, so listings can sort and filter by rating without
+reading `Review`. `rebuild_ratings` recomputes the columns from scratch to repair drift:
+
+    python -m app.rooms.ratings
+"""
+
+import asyncio
+from contextlib import asynccontextmanager
+from typing import Optional
+from uuid import UUID
+
+from tortoise import Tortoise, connections
+from tortoise.functions import Count
+from tortoise.transactions import in_transaction
+
+from ..config import settings
+from ..reservations.booking import serialized_writer
+from .models import RATING_SCALE, Review, Room, empty_rating_histogram
+
+
+def rating_aggregates(histogram: list[int]) -> dict:
+    review_count = sum(histogram)
+    rating_sum = sum(rating * count for rating, count in zip(RATING_SCALE, histogram))
+    return {
+        "review_count": review_count,
+        "rating_sum": rating_sum,
+        "rating_average": rating_sum / review_count if review_count else 0.0,
+        "rating_histogram": histogram,
+    }
+
+
+def for_update(query):
+    """Lock the selected rows until the transaction ends, where the database supports it"""
+    if connections.get("default").capabilities.dialect == "postgres":
+        return query.select_for_update()
+    return query
+
+
+async def update_room_rating(
+    room_id: UUID, removed: Optional[int] = None, added: Optional[int] = None
+):
+    """
+    Move one review's rating out of (`removed`) and/or into (`added`) the aggregates of
+    `room_id`. Must run inside the review write's `rating_transaction`.
+    """
+    room = await for_update(Room.filter(id=room_id)).get()
+    histogram = list(room.rating_histogram or empty_rating_histogram())
+    if removed is not None:
+        histogram[removed] -= 1
+    if added is not None:
+        histogram[added] += 1
+    aggregates = rating_aggregates(histogram)
+    await room.update_from_dict(aggregates).save(update_fields=list(aggregates))
+
+
+@asynccontextmanager
+async def rating_transaction():
+    """Transaction for a review write, serialized with other writers on SQLite"""
+    dialect = connections.get("default").capabilities.dialect
+    async with serialized_writer(dialect), in_transaction("default") as connection:
+        yield connection
+
+
+async def rebuild_ratings() -> int:
+    """Recompute every room's aggregates from `Review`, returning the number of rooms fixed"""
+    async with rating_transaction():
+        histograms: dict[UUID, list[int]] = {}
+        counts = (
+            await Review.annotate(reviews=Count("id"))
+            .group_by("room_id", "rating")
+            .values_list("room_id", "rating", "reviews")
+        )
+        for room_id, rating, reviews in counts:
+            histograms.setdefault(room_id, empty_rating_histogram())[rating] = reviews
+
+        fixed = 0
+        for room in await Room.all():
+            aggregates = rating_aggregates(histograms.get(room.id, empty_rating_histogram()))
+            if all(getattr(room, field) == value for field, value in aggregates.items()):
+                continue
+            await room.update_from_dict(aggregates).save(update_fields=list(aggregates))
+            fixed += 1
+    return fixed
+
+
+async def main():
+    await Tortoise.init(config=settings.tortoise_config)
+    try:
+        fixed = await rebuild_ratings()
+        print(f"Rebuilt rating aggregates, {fixed} room(s) were out of date")
+    finally:
+        await Tortoise.close_connections()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
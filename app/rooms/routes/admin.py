@@ -1,24 +1,43 @@
 from typing import Any, Optional
 from uuid import UUID
 
-from fastapi import Depends
+from fastapi import Depends, HTTPException, Query, Request
 from fastapi.routing import APIRouter
+from tortoise.transactions import in_transaction
 
-from app.config import UPLOAD_DIR
-
+from ...analytics.rollups import refresh_rooms_available, reservation_stays, track_stays
 from ...auth.utils import authorize_obj_access, get_current_active_user
+from ...cache import invalidate_rooms, response_cache
+from ...database.routing import route_reads
+from ...exports import ExportFormat
+from ...pagination import Page, PageParams
+from ...serialization import FastJSONResponse
 from ...users.models import Admin
-from ..models import Review, Room, RoomImage
+from ...versioning import bump_version
+from ..availability import availability_index
+from ..images import ImageRejected, delete_image, store_images
+from ..imports import import_rooms
+from ..models import Review, Room, RoomAvailability, RoomImage
+from ..ratings import for_update, rating_transaction, rebuild_ratings, update_room_rating
 from ..schema import (
-    Room_Pydantic_List,
     Room_Reviews_Pydantic,
+    Room_Reviews_Serializer,
+    Room_Serializer,
     RoomBase_Pydantic,
     RoomHistory,
     RoomImage_Pydantic,
+    RoomImportResult,
     RoomIn_Pydantic,
+    RoomSort,
 )
 
-room_router = APIRouter(tags=["Rooms"])
+room_router = APIRouter(tags=["Rooms"], dependencies=[Depends(route_reads)])
+
+
+async def room_reservation_ids(room_id: UUID) -> list[UUID]:
+    return await RoomAvailability.filter(room_id=room_id).values_list(
+        "reservation_id", flat=True
+    )
 
 
 def filter_room_query(query, filters: dict[str, Any]):
@@ -26,34 +45,84 @@ def filter_room_query(query, filters: dict[str, Any]):
         query = query.filter(booked=filters["booked"])
     if filters.get("room_type"):
         query = query.filter(room_type=filters["room_type"])
+    if filters.get("min_rating") is not None:
+        query = query.filter(rating_average__gte=filters["min_rating"], review_count__gt=0)
     return query
 
 
-@room_router.get("/as_admin", response_model=Room_Pydantic_List)
-async def admin_get_rooms(booked: Optional[bool] = None, room_type: Optional[Room.RoomType] = None):
-    filters = {"booked": booked, "room_type": room_type}
+@room_router.get("/as_admin", response_model=Page[RoomBase_Pydantic])
+async def admin_get_rooms(
+    booked: Optional[bool] = None,
+    room_type: Optional[Room.RoomType] = None,
+    min_rating: Optional[float] = Query(None, ge=0, le=10),
+    sort: Optional[RoomSort] = None,
+    page: PageParams = Depends(),
+):
+    filters = {"booked": booked, "room_type": room_type, "min_rating": min_rating}
     query = filter_room_query(Room.all(), filters)
-    return await Room_Pydantic_List.from_queryset(query)
+    order_by = sort.order_by if sort else None
+    return FastJSONResponse(await Room_Serializer.page(query, page, order_by))
 
 
 @room_router.post("/", response_model=RoomBase_Pydantic, status_code=201)
-async def create_room(
-    room: RoomIn_Pydantic,
-    images: list[RoomImage_Pydantic],
-):
+async def create_room(room: RoomIn_Pydantic):
+    """Images are uploaded separately, see `upload_room_images`"""
     new_room = await Room.create(**room.dict())
-    file_path = f"{UPLOAD_DIR}/{new_room.room_number}_images"
-    for file in images:
-        image_path = f"{file_path}/{file.image_file.filename}"
-        with open(image_path, "wb") as room_image:
-            room_image.write(file.file)
-        await RoomImage.create(room=new_room, caption=file.caption, image_path=image_path)
+    await refresh_rooms_available()
+    availability_index.add_room(new_room.id, new_room.room_number)
+    await invalidate_rooms(room_numbers=[new_room.room_number])
     return await RoomBase_Pydantic.from_tortoise_orm(new_room)
 
 
+@room_router.post("/bulk", response_model=RoomImportResult)
+async def bulk_import_rooms(
+    request: Request,
+    format: ExportFormat = ExportFormat.NDJSON,
+    atomic: bool = True,
+):
+    """
+    Create rooms from a CSV or NDJSON request body with one room per row, CSV columns
+    and NDJSON keys named after the `RoomIn_Pydantic` fields.
+
+    With `atomic`, rooms are only created if every row is valid. Otherwise valid rows are
+    committed chunk by chunk and rooms that already exist are skipped, so a failed import
+    can be resumed by sending the same file again.
+    """
+    result = await import_rooms(request.stream(), format, atomic)
+    if atomic and result.failed:
+        raise HTTPException(422, result.model_dump())
+    return result
+
+
+@room_router.post(
+    "/{room_id}/images", response_model=list[RoomImage_Pydantic], status_code=201
+)
+async def upload_room_images(room_id: UUID, request: Request):
+    """
+    Upload pictures of a room as `multipart/form-data`: one file part per image, with
+    optional `caption` text parts labelling the images in order.
+
+    Stored files and their variants are served from `/media/<image_path>`.
+    """
+    room = await Room.get(id=room_id)
+    try:
+        images = await store_images(
+            room, request.headers.get("content-type", ""), request.stream()
+        )
+    except ImageRejected as e:
+        raise HTTPException(e.status_code, str(e))
+    return [await RoomImage_Pydantic.from_tortoise_orm(image) for image in images]
+
+
+@room_router.delete("/images/{image_id}", response_model={}, status_code=204)
+async def delete_room_image(image_id: int):
+    await delete_image(await RoomImage.get(id=image_id))
+    return {}
+
+
 @room_router.get("/{room_id}/as_admin", response_model=RoomBase_Pydantic)
 async def admin_get_single_room(room_id: UUID):
-    return await RoomBase_Pydantic.from_queryset_single(Room.get(id=room_id))
+    return FastJSONResponse(await Room_Serializer.one(Room.get(id=room_id)))
 
 
 @room_router.put("/{room_id}", response_model=RoomBase_Pydantic)
@@ -61,17 +130,46 @@ async def admin_update_room(
     room_id: UUID,
     room: RoomIn_Pydantic,
 ):
-    await Room.filter(id=room_id).update(**room.dict())
+    previous_number = await Room.get(id=room_id).values_list("room_number", flat=True)
+    # A new type or price moves the room's stays between rollups
+    reservation_ids = await room_reservation_ids(room_id)
+    async with in_transaction("default"), track_stays(reservation_stays(*reservation_ids)):
+        await Room.filter(id=room_id).update(**bump_version(**room.dict()))
+    await refresh_rooms_available()
+    availability_index.add_room(room_id, room.room_number)
+    await invalidate_rooms(room_ids=[room_id], room_numbers=[previous_number, room.room_number])
     return await RoomBase_Pydantic.from_queryset_single(Room.get(id=room_id))
 
 
 @room_router.delete("/{room_id}", response_model={}, status_code=204)
 async def admin_delete_room(room_id: UUID):
     room_obj = await Room.get(id=room_id)
-    await room_obj.delete()
+    reservation_ids = await room_reservation_ids(room_id)
+    async with in_transaction("default"), track_stays(reservation_stays(*reservation_ids)):
+        await room_obj.delete()
+    await refresh_rooms_available()
+    availability_index.remove_room(room_obj.id)
+    await invalidate_rooms(room_ids=[room_obj.id], room_numbers=[room_obj.room_number])
     return {}
 
 
+@room_router.get("/availability/consistency", response_model=dict[str, list])
+async def check_availability_index():
+    return await availability_index.check_consistency()
+
+
+@room_router.post("/ratings/rebuild", response_model=dict[str, int])
+async def rebuild_room_ratings():
+    fixed = await rebuild_ratings()
+    await invalidate_rooms()
+    return {"rooms_fixed": fixed}
+
+
+@room_router.get("/cache/stats", response_model=dict[str, Any])
+async def get_cache_stats():
+    return response_cache.stats()
+
+
 @room_router.get("/{room_id}/history", response_model=list[RoomHistory])
 async def room_reservations_history(
     room_id: UUID,
@@ -83,13 +181,16 @@ async def room_reservations_history(
 # --- Review end points ---
 @room_router.get("/{room_id}/reviews", response_model=Room_Reviews_Pydantic)
 async def get_room_reviews(room_id: UUID):
-    return await Room_Reviews_Pydantic.from_queryset_single(Room.get(id=room_id))
+    return FastJSONResponse(await Room_Reviews_Serializer.one(Room.get(id=room_id)))
 
 
 @room_router.delete("/reviews/{review_id}", status_code=204)
 async def delete_review(review_id: int, current_user: Admin = Depends(get_current_active_user)):
-    review_obj = await Review.get(id=review_id).select_related("guest")
-    if not current_user.is_admin:
-        await authorize_obj_access(review_obj, current_user)
-    await review_obj.delete()
+    async with rating_transaction():
+        review_obj = await for_update(Review.filter(id=review_id)).select_related("guest").get()
+        if not current_user.is_admin:
+            await authorize_obj_access(review_obj, current_user)
+        await review_obj.delete()
+        await update_room_rating(review_obj.room_id, removed=review_obj.rating)
+    await invalidate_rooms(room_ids=[review_obj.room_id])
     return {}
@@ -1,22 +1,35 @@
-from datetime import datetime
+from datetime import date, datetime
 from typing import Any, Optional
 from uuid import UUID
 
-from fastapi import Depends, HTTPException
+from fastapi import Depends, HTTPException, Query, Request
 from fastapi.routing import APIRouter
+from tortoise import timezone
 
 from ...auth.utils import authorize_obj_access, get_current_active_user
+from ...cache import ROOM_LIST_TAG, invalidate_rooms, response_cache, room_tags
+from ...database.routing import route_reads
+from ...pagination import Page, PageParams
+from ...serialization import FastJSONResponse, dumps
 from ...users.models import Guest
-from ..models import Review, Room
+from ...versioning import etag_matches, not_modified
+from ..models import Review, Room, RoomAvailability, RoomHold, RoomImage
+from ..ratings import for_update, rating_transaction, update_room_rating
 from ..schema import (
+    AvailableRoom_Pydantic,
+    AvailableRoom_Serializer,
     Review_Pydantic,
+    Review_Serializer,
     ReviewIn,
-    Room_Pydantic_List,
     Room_Reviews_Pydantic,
+    Room_Reviews_Serializer,
+    Room_Serializer,
     RoomBase_Pydantic,
+    RoomImage_Pydantic,
+    RoomSort,
 )
 
-room_router = APIRouter(tags=["Rooms"])
+room_router = APIRouter(tags=["Rooms"], dependencies=[Depends(route_reads)])
 
 
 def filter_room_query(query, filters: dict[str, Any]):
@@ -24,25 +37,105 @@ def filter_room_query(query, filters: dict[str, Any]):
         query = query.filter(booked=filters["booked"])
     if filters.get("room_type"):
         query = query.filter(room_type=filters["room_type"])
+    if filters.get("min_rating") is not None:
+        query = query.filter(rating_average__gte=filters["min_rating"], review_count__gt=0)
     return query
 
 
-@room_router.get("/", response_model=Room_Pydantic_List)
-async def get_rooms(booked: Optional[bool] = None, room_type: Optional[Room.RoomType] = None):
-    filters = {"booked": booked, "room_type": room_type}
-    query = filter_room_query(Room.all(), filters)
-    return await Room_Pydantic_List.from_queryset(query)
+@room_router.get("/", response_model=Page[RoomBase_Pydantic])
+async def get_rooms(
+    booked: Optional[bool] = None,
+    room_type: Optional[Room.RoomType] = None,
+    min_rating: Optional[float] = Query(None, ge=0, le=10),
+    sort: Optional[RoomSort] = None,
+    page: PageParams = Depends(),
+):
+    async def render():
+        filters = {"booked": booked, "room_type": room_type, "min_rating": min_rating}
+        query = filter_room_query(Room.all(), filters)
+        order_by = sort.order_by if sort else None
+        return dumps(await Room_Serializer.page(query, page, order_by)), [ROOM_LIST_TAG]
+
+    key = ":".join(
+        str(part)
+        for part in (
+            "rooms:list",
+            booked,
+            room_type and room_type.value,
+            min_rating,
+            sort and sort.value,
+            page.cursor,
+            page.limit,
+        )
+    )
+    return await response_cache.respond(key, render)
+
+
+def has_capacity(capacity: str, min_capacity: int):
+    # `Room.capacity` is free text, rooms without a numeric capacity never match
+    try:
+        return int(capacity) >= min_capacity
+    except ValueError:
+        return False
+
+
+async def capacities_at_least(min_capacity: int) -> list[str]:
+    """The distinct `Room.capacity` values of at least `min_capacity` guests"""
+    capacities = await Room.all().distinct().order_by("capacity").values_list(
+        "capacity", flat=True
+    )
+    return [capacity for capacity in capacities if has_capacity(capacity, min_capacity)]
+
+
+@room_router.get("/available", response_model=list[AvailableRoom_Pydantic])
+async def get_available_rooms(
+    check_in: date,
+    check_out: date,
+    room_type: Optional[Room.RoomType] = None,
+    min_capacity: Optional[int] = None,
+):
+    if check_in >= check_out:
+        raise HTTPException(400, "Check-out must be after check-in")
+    query = filter_room_query(Room.all(), {"room_type": room_type})
+    if min_capacity is not None:
+        query = query.filter(capacity__in=await capacities_at_least(min_capacity))
+    # Anti-join against overlapping bookings and live holds. The in-memory index is not used
+    # here: it only sees the bookings and holds of this worker after its startup
+    query = query.exclude(
+        id__in=RoomAvailability.booked_room_ids(check_in, check_out)
+    ).exclude(id__in=RoomHold.held_room_ids(check_in, check_out, timezone.now()))
+    return FastJSONResponse(await AvailableRoom_Serializer.all(query))
 
 
 @room_router.get("/{room_id}", response_model=RoomBase_Pydantic)
-async def get_single_room(room_id: UUID):
-    return await RoomBase_Pydantic.from_queryset_single(Room.get(id=room_id))
+async def get_single_room(room_id: UUID, request: Request):
+    etag = await Room.etag(id=room_id)
+    if etag_matches(request, etag):
+        return not_modified(etag)
+
+    async def render():
+        room = await Room_Serializer.one(Room.get(id=room_id))
+        return dumps(room), room_tags(room["id"], room["room_number"])
+
+    response = await response_cache.respond(f"room:{room_id}:{etag}", render)
+    response.headers["ETag"] = etag
+    return response
+
+
+@room_router.get("/{room_id}/images", response_model=list[RoomImage_Pydantic])
+async def get_room_images(room_id: UUID):
+    """Image files are served from `/media/<image_path>` and `/media/<variant path>`"""
+    return await RoomImage_Pydantic.from_queryset(RoomImage.filter(room_id=room_id))
 
 
 # Review end points
 @room_router.get("/{room_number}/reviews", response_model=Room_Reviews_Pydantic)
 async def get_room_reviews(room_number: int):
-    return await Room_Reviews_Pydantic.from_queryset_single(Room.get_by_room_number(room_number))
+    async def render():
+        room = await Room_Reviews_Serializer.one(Room.get_by_room_number(room_number))
+        return dumps(room), room_tags(room["id"], room["room_number"])
+
+    return await response_cache.respond(f"room-reviews:{room_number}", render)
 
 
 @room_router.post("/{room_number}/reviews", response_model=Review_Pydantic, status_code=201)
@@ -51,23 +144,29 @@ async def add_review(
     review: ReviewIn,
     current_user: Guest = Depends(get_current_active_user),
 ):
+    room = await Room.get_by_room_number(room_number)
     now = datetime.now()
-    guest_reserv = current_user.reservations.filter(
-        room__room_number=room_number, check_out_date__lt=now
+    guest_reserv = await current_user.reservations.filter(
+        rooms__id=room.id, check_out_date__lt=now
     ).exists()
     if not guest_reserv:
         raise HTTPException(400, "You must stay in a room at least 24 hours to leave a review")
-    new_review = await Review.create(
-        **review.model_dump(), room__room_number=room_number, guest=current_user
-    )
+    async with rating_transaction():
+        new_review = await Review.create(
+            **review.model_dump(exclude_none=True), room=room, guest=current_user
+        )
+        await update_room_rating(room.id, added=new_review.rating)
+    await invalidate_rooms(room_ids=[room.id])
     return await Review_Pydantic.from_tortoise_orm(new_review)
 
 
-@room_router.get("/{room_number}/reviews/{reviews_id}", response_model=Review_Pydantic)
-async def get_room_review(room_number: int, review_id: int):
-    return await Review_Pydantic.from_queryset_single(
-        Review.get(room__room_number=room_number, id=review_id)
-    )
+@room_router.get("/{room_number}/reviews/{review_id}", response_model=Review_Pydantic)
+async def get_room_review(room_number: int, review_id: int, request: Request):
+    etag = await Review.etag(room__room_number=room_number, id=review_id)
+    if etag_matches(request, etag):
+        return not_modified(etag)
+    review = await Review_Serializer.one(Review.get(room__room_number=room_number, id=review_id))
+    return FastJSONResponse(review, headers={"ETag": etag})
 
 
 @room_router.put("/{room_number}/reviews/{review_id}", response_model=Review_Pydantic)
@@ -77,10 +176,18 @@ async def update_review(
     review: ReviewIn,
     current_user: Guest = Depends(get_current_active_user),
 ):
-    review_obj = await Review.get(id=review_id, room__room_number=room_number)
-    await authorize_obj_access(review_obj, current_user)
-    await Review.filter(id=review_id).update(**review.model_dump())
-    return await Review_Pydantic.from_tortoise_orm(review_obj)
+    async with rating_transaction():
+        review_obj = await for_update(
+            Review.filter(id=review_id, room__room_number=room_number)
+        ).select_related("guest").get()
+        await authorize_obj_access(review_obj, current_user)
+        previous_rating = review_obj.rating
+        await review_obj.update_from_dict(review.model_dump(exclude_none=True)).save()
+        await update_room_rating(
+            review_obj.room_id, removed=previous_rating, added=review_obj.rating
+        )
+    await invalidate_rooms(room_ids=[review_obj.room_id])
+    return await Review_Pydantic.from_queryset_single(Review.get(id=review_id))
 
 
 @room_router.delete("/{room_number}/reviews/{review_id}", status_code=204)
@@ -89,7 +196,12 @@ async def delete_review(
     review_id: int,
     current_user: Guest = Depends(get_current_active_user),
 ):
-    review_obj = await Review.get(id=review_id, room__room_number=room_number)
-    await authorize_obj_access(review_obj, current_user)
-    await review_obj.delete()
+    async with rating_transaction():
+        review_obj = await for_update(
+            Review.filter(id=review_id, room__room_number=room_number)
+        ).select_related("guest").get()
+        await authorize_obj_access(review_obj, current_user)
+        await review_obj.delete()
+        await update_room_rating(review_obj.room_id, removed=review_obj.rating)
+    await invalidate_rooms(room_ids=[review_obj.room_id])
     return {}
@@ -1,17 +1,54 @@
+from enum import Enum
 from typing import Optional
 
 from pydantic import BaseModel, model_validator, field_validator
 from tortoise.contrib.pydantic import pydantic_model_creator, pydantic_queryset_creator
 
-from .models import Room, Review
-from ..schemas import ReservationBase_Pydantic
+from .models import Room, RoomImage, Review
+from ..imports import ImportRowError
+from ..reservations.schema import ReservationBase_Pydantic
+from ..serialization import ProjectionSerializer
 
 
 Room_Pydantic_List = pydantic_queryset_creator(Room)
 RoomBase_Pydantic = pydantic_model_creator(Room)
 RoomIn_Pydantic = pydantic_model_creator(
-    Room, exclude=("id", "reservations", "reviews")
+    Room,
+    name="RoomIn",
+    exclude=(
+        "id",
+        "reservations",
+        "reviews",
+        "version",
+        "review_count",
+        "rating_sum",
+        "rating_average",
+        "rating_histogram",
+    ),
 )
+AvailableRoom_Pydantic = pydantic_model_creator(
+    Room, name="AvailableRoom", exclude=("reservations", "reviews", "request")
+)
+
+
+class RoomSort(str, Enum):
+    RATING = "rating"
+    REVIEWS = "reviews"
+
+    @property
+    def order_by(self) -> tuple[str, ...]:
+        if self == RoomSort.RATING:
+            return ("-rating_average", "-review_count")
+        return ("-review_count",)
+
+
+class RoomImportResult(BaseModel):
+    rows: int
+    created: int
+    skipped: int
+    failed: int
+    errors: list[ImportRowError]
+
 
 class RoomHistory(BaseModel):
     room: RoomBase_Pydantic
@@ -23,6 +60,12 @@ class RoomHistory(BaseModel):
 
 Room_Reviews_Pydantic = pydantic_model_creator(Room, exclude=("reservations",))
 Review_Pydantic = pydantic_model_creator(Review)
+RoomImage_Pydantic = pydantic_model_creator(RoomImage)
+
+Room_Serializer = ProjectionSerializer(RoomBase_Pydantic)
+AvailableRoom_Serializer = ProjectionSerializer(AvailableRoom_Pydantic)
+Room_Reviews_Serializer = ProjectionSerializer(Room_Reviews_Pydantic)
+Review_Serializer = ProjectionSerializer(Review_Pydantic)
 
 
 class ReviewIn(BaseModel):
@@ -0,0 +1,222 @@
+"""
+Projection-based fast path for serializing query results.
+
+`pydantic_model.from_queryset()` builds full ORM instances, prefetches relations into them and
+then validates every object again into Pydantic. A `ProjectionSerializer` produces the same
+JSON shape from `.values()` rows instead: the Pydantic model is compiled once into the columns
+to select and one batched `.values()` query per nested relation, and the resulting plain dicts
+are encoded with orjson.
+"""
+
+import typing
+from decimal import Decimal
+from typing import Any, Optional, Sequence
+
+import orjson
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+from pypika import Order
+from tortoise.expressions import Subquery
+from tortoise.queryset import QuerySet
+
+from .pagination import PageParams, build_page, keyset_ordering, page_query
+
+
+def _default(value: Any):
+    if isinstance(value, Decimal):
+        return str(value)
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def dumps(content: Any) -> bytes:
+    """Encode `content` to JSON bytes, formatted the way Pydantic formats it"""
+    return orjson.dumps(content, default=_default, option=orjson.OPT_UTC_Z)
+
+
+class FastJSONResponse(JSONResponse):
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+class _Row(dict):
+    """Attribute access to a `.values()` row, so model methods can compute fields from it"""
+
+    __getattr__ = dict.__getitem__
+
+
+def _submodel(annotation) -> type[BaseModel]:
+    for arg in typing.get_args(annotation) or (annotation,):
+        if isinstance(arg, type) and issubclass(arg, BaseModel):
+            return arg
+    raise TypeError(f"No Pydantic model in {annotation!r}")
+
+
+def _order_by(model) -> list[str]:
+    ordering = keyset_ordering(model)
+    return [field if direction == Order.asc else f"-{field}" for field, direction in ordering]
+
+
+def _joins(query: QuerySet) -> bool:
+    # Tortoise drops the joins of a query nested in a `Subquery`, so only join-free
+    # queries can be reused that way
+    return " JOIN " in query.values(query.model._meta.pk_attr).sql()
+
+
+class _Relation:
+    def __init__(self, name: str, kind: str, field, serializer: "ProjectionSerializer"):
+        self.name = name
+        self.kind = kind
+        self.field = field
+        self.serializer = serializer
+
+    async def load(self, model, rows: list[dict], query: Optional[QuerySet]) -> None:
+        """
+        Attach the serialized related objects of every row in `rows` under `self.name`.
+
+        When the rows came from a join-free `query`, related rows are selected with a subquery
+        on it rather than with a literal list of keys, which is expensive to build for long
+        lists.
+        """
+        pk = model._meta.pk_attr
+        related = self.serializer
+        if self.kind in ("fk", "o2o"):
+            source = self.field.source_field
+            if query is not None:
+                keys = Subquery(query.values(source))
+            else:
+                keys = {row[source] for row in rows if row[source] is not None}
+            children = await related.fetch(related.model.filter(pk__in=keys))
+            by_pk = {child[related.pk]: related.strip(child) for child in children}
+            for row in rows:
+                row[self.name] = by_pk.get(row[source])
+            return
+
+        pks = Subquery(query.values(pk)) if query is not None else [row[pk] for row in rows]
+        groups: dict[Any, list] = {row[pk]: [] for row in rows}
+        if self.kind == "m2m":
+            target = f"{self.name}__{related.pk}"
+            links = await model.filter(pk__in=pks).values_list(pk, target)
+            pairs = [pair for pair in links if pair[1] is not None]
+            keys = {child_pk for _, child_pk in pairs}
+            children = await related.fetch(related.model.filter(pk__in=keys)) if keys else []
+            rank = {child[related.pk]: index for index, child in enumerate(children)}
+            by_pk = {child[related.pk]: related.strip(child) for child in children}
+            for parent_pk, child_pk in sorted(pairs, key=lambda pair: rank[pair[1]]):
+                if parent_pk in groups:
+                    groups[parent_pk].append(by_pk[child_pk])
+        else:
+            relation_field = self.field.relation_field
+            children = await related.fetch(
+                related.model.filter(**{f"{relation_field}__in": pks}), extra=[relation_field]
+            )
+            for child in children:
+                if child[relation_field] in groups:
+                    groups[child[relation_field]].append(related.strip(child))
+
+        for row in rows:
+            group = groups[row[pk]]
+            if self.kind == "backward_o2o":
+                row[self.name] = group[0] if group else None
+            else:
+                row[self.name] = group
+
+
+class ProjectionSerializer:
+    """
+    Serialize querysets of `pydantic_model.model_config["orig_model"]` into the same shape as
+    `pydantic_model`, reading plain `.values()` rows instead of ORM instances.
+
+    Compilation is deferred to first use, when Tortoise has resolved every relation.
+    """
+
+    def __init__(self, pydantic_model: type[BaseModel]):
+        self.pydantic_model = pydantic_model
+        self._compiled = False
+
+    def _compile(self):
+        model = self.pydantic_model.model_config["orig_model"]
+        meta = model._meta
+        kinds = {
+            **{name: "fk" for name in meta.fk_fields},
+            **{name: "o2o" for name in meta.o2o_fields},
+            **{name: "m2m" for name in meta.m2m_fields},
+            **{name: "backward_fk" for name in meta.backward_fk_fields},
+            **{name: "backward_o2o" for name in meta.backward_o2o_fields},
+        }
+        self.model = model
+        self.pk = meta.pk_attr
+        self.columns = []
+        self.relations = []
+        for name, field_info in self.pydantic_model.model_fields.items():
+            if name in meta.fields_db_projection:
+                self.columns.append(name)
+            elif name in kinds:
+                field = meta.fields_map[name]
+                serializer = ProjectionSerializer(_submodel(field_info.annotation))
+                serializer._compile()
+                self.relations.append(_Relation(name, kinds[name], field, serializer))
+        self.computed = [
+            (name, getattr(model, name))
+            for name in self.pydantic_model.__pydantic_decorators__.computed_fields
+        ]
+        # Keys needed to load relations, selected but not part of the output
+        self.keys = [self.pk] + [
+            relation.field.source_field
+            for relation in self.relations
+            if relation.kind in ("fk", "o2o")
+        ]
+        self.output = list(self.columns)
+        self.output += [relation.name for relation in self.relations]
+        self.output += [name for name, _ in self.computed]
+        self._compiled = True
+
+    def _selected(self, extra: Optional[list[str]] = None) -> list[str]:
+        return list(dict.fromkeys(self.columns + self.keys + (extra or [])))
+
+    async def complete(self, rows: list[dict], query: Optional[QuerySet] = None) -> list[dict]:
+        """Add relations and computed fields to the `.values()` rows of `query`, in place"""
+        if not rows:
+            return rows
+        for relation in self.relations:
+            await relation.load(self.model, rows, query)
+        for name, function in self.computed:
+            for row in rows:
+                row[name] = function(_Row(row))
+        return rows
+
+    def strip(self, row: dict) -> dict:
+        """Drop the key columns that are not part of the output"""
+        return {key: row[key] for key in self.output}
+
+    async def fetch(self, query: QuerySet, extra: Optional[list[str]] = None) -> list[dict]:
+        """Rows of a join-free `query` with their relations, in the model's default order"""
+        query = query.order_by(*_order_by(self.model))
+        return await self.complete(await query.values(*self._selected(extra)), query)
+
+    async def all(self, query: QuerySet) -> list[dict]:
+        if not self._compiled:
+            self._compile()
+        query = query.order_by(*_order_by(self.model))
+        rows = await query.values(*self._selected())
+        rows = await self.complete(rows, None if _joins(query) else query)
+        return [self.strip(row) for row in rows]
+
+    async def one(self, query: QuerySet) -> dict:
+        """Serialize the single object a `Model.get(...)` query points at"""
+        if not self._compiled:
+            self._compile()
+        row = await query.values(*self._selected())
+        return self.strip((await self.complete([row]))[0])
+
+    async def page(
+        self, query: QuerySet, params: PageParams, order_by: Optional[Sequence[str]] = None
+    ) -> dict:
+        """Keyset-paginated equivalent of `pagination.paginate`"""
+        if not self._compiled:
+            self._compile()
+        query, ordering = page_query(query, params, order_by)
+        rows = await query.values(*self._selected([field for field, _ in ordering]))
+        page = build_page(rows, ordering, params, key=dict.__getitem__)
+        items = await self.complete(page["items"], None if _joins(query) else query)
+        page["items"] = [self.strip(row) for row in items]
+        return page
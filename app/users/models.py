@@ -4,9 +4,10 @@ from datetime import date
 from tortoise import fields, models
 
 from ..reservations.models import Reservation
+from ..versioning import VersionMixin
 
 
-class BaseUser(models.Model):
+class BaseUser(VersionMixin, models.Model):
     uid = fields.UUIDField(pk=True, default=uuid4)
     first_name = fields.CharField(max_length=50)
     last_name = fields.CharField(max_length=50)
@@ -34,6 +35,11 @@ class BaseUser(models.Model):
 class Admin(BaseUser):
     is_superuser = fields.BooleanField(default=False)
 
+    # Tortoise does not inherit `Meta` from abstract models
+    class Meta:
+        ordering = ("-joined_at",)
+        indexes = (("joined_at", "uid"),)
+
     class PydanticMeta:
         exclude = ("password_hash",)
         computed = ("full_name",)
@@ -42,7 +48,11 @@ class Admin(BaseUser):
 class Guest(BaseUser):
     reservations: fields.ReverseRelation[Reservation]
 
+    class Meta:
+        ordering = ("-joined_at",)
+        indexes = (("joined_at", "uid"),)
+
     class PydanticMeta:
-        exclude = ("password_hash", "reviews")
+        exclude = ("password_hash", "reviews", "holds", "requests")
         computed = ("full_name",)
 
@@ -1,36 +1,46 @@
+from datetime import date
+from typing import Optional
 from uuid import UUID
 
 from fastapi import Depends, Security
 from fastapi.routing import APIRouter
 
+from ...auth.cache import principal_cache
+from ...database.routing import route_reads
 from ...auth.utils import (
     authorize_obj_access,
     get_current_active_admin,
     hash_password,
 )
+from ...exports import ExportFormat, export_response
+from ...pagination import Page, PageParams, paginate
+from ...serialization import FastJSONResponse
 from ...users.models import Admin, Guest
+from ...versioning import bump_version
 from ..schema import (
     Admin_Pydantic,
     Guest_Pydantic,
+    Guest_Serializer,
     UserIn,
     UserUpdate,
 )
 
-admin_router = APIRouter(tags=["Admin"])
+admin_router = APIRouter(tags=["Admin"], dependencies=[Depends(route_reads)])
 
 
-@admin_router.get("/", response_model=list[Admin_Pydantic])
+@admin_router.get("/", response_model=Page[Admin_Pydantic])
 async def get_all_admins(
-    current_user: Admin = Security(get_current_active_admin, scopes=["superuser-rw"])
+    page: PageParams = Depends(),
+    current_user: Admin = Security(get_current_active_admin, scopes=["superuser-rw"]),
 ):
-    return await Admin_Pydantic.from_queryset(Admin.all())
+    return await paginate(Admin.all(), Admin_Pydantic, page)
 
 
 @admin_router.post("/sign-up", response_model=Admin_Pydantic, status_code=201)
 async def admin_sign_up(admin: UserIn):
     password = admin.password.get_secret_value()
     admin_obj = await Admin(**admin.model_dump(exclude={"password_hash"}))
-    admin_obj.password_hash = hash_password(password)
+    admin_obj.password_hash = await hash_password(password)
     await admin_obj.save()
     return await Admin_Pydantic.from_tortoise_orm(admin_obj)
 
@@ -53,7 +63,10 @@ async def update_admin(
 ):
     admin_obj = await Admin.get(uid=admin_uid)
     await authorize_obj_access(admin_obj, current_user)
-    await Admin.filter(uid=admin_uid).update(**admin.model_dump(exclude={"full_name"}))
+    await Admin.filter(uid=admin_uid).update(
+        **bump_version(**admin.model_dump(exclude={"full_name"}))
+    )
+    principal_cache.invalidate(admin_uid)
     return await Admin_Pydantic.from_queryset_single(Admin.get(uid=admin_uid))
 
 
@@ -63,7 +76,8 @@ async def update_admin_active_status(
     admin: dict[str, bool],
     current_user: Admin = Security(get_current_active_admin, scopes=["superuser-rw"]),
 ):
-    await Admin.filter(uid=admin_uid).update(**admin)
+    await Admin.filter(uid=admin_uid).update(**bump_version(**admin))
+    principal_cache.invalidate(admin_uid)
     return await Admin_Pydantic.from_queryset_single(Admin.get(uid=admin_uid))
 
 
@@ -75,6 +89,7 @@ async def delete_admin(
     admin_obj = await Admin.get(uid=admin_uid)
     await authorize_obj_access(admin_obj, current_user)
     await admin_obj.delete()
+    principal_cache.invalidate(admin_uid)
     return {}
 
 
@@ -82,25 +97,45 @@ async def delete_admin(
 admin_guest_router = APIRouter()
 
 
-@admin_guest_router.get("/", response_model=list[Guest_Pydantic])
-async def get_guests():
-    return await Guest_Pydantic.from_queryset(Guest.all())
+@admin_guest_router.get("/", response_model=Page[Guest_Pydantic])
+async def get_guests(page: PageParams = Depends()):
+    return FastJSONResponse(await Guest_Serializer.page(Guest.all(), page))
+
+
+@admin_guest_router.get("/export")
+async def export_guests(
+    format: ExportFormat = ExportFormat.NDJSON,
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+):
+    """Stream guests who joined within `[date_from, date_to]`"""
+    query = Guest.all()
+    if date_from:
+        query = query.filter(joined_at__gte=date_from)
+    if date_to:
+        query = query.filter(joined_at__lte=date_to)
+    fields = ["uid", "first_name", "last_name", "email", "joined_at", "is_active"]
+    return export_response(query, fields, format, "guests")
 
 
 @admin_guest_router.get("/{guest_uid}", response_model=Guest_Pydantic)
 async def get_a_guest(guest_uid: UUID):
-    return await Guest_Pydantic.from_queryset_single(Guest.get(uid=guest_uid))
+    return FastJSONResponse(await Guest_Serializer.one(Guest.get(uid=guest_uid)))
 
 
 @admin_guest_router.put("/{guest_uid}", response_model=Guest_Pydantic)
 async def update_guest(guest_uid: UUID, guest: UserUpdate):
-    await Guest.filter(uid=guest_uid).update(**guest.model_dump(exclude={"full_name"}))
+    await Guest.filter(uid=guest_uid).update(
+        **bump_version(**guest.model_dump(exclude={"full_name"}))
+    )
+    principal_cache.invalidate(guest_uid)
     return await Guest_Pydantic.from_queryset_single(Guest.get(uid=guest_uid))
 
 
 @admin_guest_router.patch("/{guest_uid}", response_model=Guest_Pydantic)
 async def update_guest_active_status(guest_uid: UUID, guest: dict[str, bool]):
-    await Guest.filter(uid=guest_uid).update(**guest)
+    await Guest.filter(uid=guest_uid).update(**bump_version(**guest))
+    principal_cache.invalidate(guest_uid)
     return await Guest_Pydantic.from_queryset_single(Guest.get(uid=guest_uid))
 
 
@@ -108,6 +143,7 @@ async def update_guest_active_status(guest_uid: UUID, guest: dict[str, bool]):
 async def admin_delete_guest(guest_uid: UUID):
     guest_obj = await Guest.get(uid=guest_uid)
     await guest_obj.delete()
+    principal_cache.invalidate(guest_uid)
     return {}
 
 
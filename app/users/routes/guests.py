@@ -8,30 +8,37 @@ from fastapi import Depends
 from fastapi.routing import APIRouter
 
 from ..models import Guest
-from ..schema import Guest_Pydantic, UserIn, UserUpdate
+from ..schema import Guest_Pydantic, Guest_Serializer, UserIn, UserUpdate
+from ...auth.cache import principal_cache
 from ...auth.utils import get_current_active_user, hash_password
+from ...database.routing import route_reads
+from ...serialization import FastJSONResponse
+from ...versioning import bump_version
 
 
-guest_router = APIRouter(tags=["guests"])
+guest_router = APIRouter(tags=["guests"], dependencies=[Depends(route_reads)])
 
 
 @guest_router.get("/", response_model=Guest_Pydantic)
 async def get_guest(current_user: Guest = Depends(get_current_active_user)):
-    return await Guest_Pydantic.from_queryset_single(Guest.get(uid=current_user.uid))
+    return FastJSONResponse(await Guest_Serializer.one(Guest.get(uid=current_user.uid)))
 
 
 @guest_router.post("/sign-up", response_model=Guest_Pydantic, status_code=201)
 async def guest_sign_up(guest: UserIn):
     password = guest.password.get_secret_value()
     new_guest = await Guest(**guest.model_dump(exclude={"password_hash"}))
-    new_guest.password_hash = hash_password(password)
+    new_guest.password_hash = await hash_password(password)
     await new_guest.save()
     return await Guest_Pydantic.from_tortoise_orm(new_guest)
 
 
 @guest_router.put("/", response_model=Guest_Pydantic)
 async def update_guest(guest: UserUpdate, current_user: Guest = Depends(get_current_active_user)):
-    await Guest.filter(uid=current_user.uid).update(**guest.model_dump(exclude={"full_name"}))
+    await Guest.filter(uid=current_user.uid).update(
+        **bump_version(**guest.model_dump(exclude={"full_name"}))
+    )
+    principal_cache.invalidate(current_user.uid)
     return await Guest_Pydantic.from_queryset_single(Guest.get(uid=current_user.uid))
 
 
@@ -39,6 +46,7 @@ async def update_guest(guest: UserUpdate, current_user: Guest = Depends(get_curr
 async def delete_guest(current_user: Guest = Depends(get_current_active_user)):
     current_user.is_active = False
     await current_user.save()
+    principal_cache.invalidate(current_user.uid)
     return {}
 
 
@@ -1,4 +1,5 @@
 from datetime import date
+from typing import Literal, Optional
 from uuid import UUID
 
 from pydantic import (
@@ -11,10 +12,12 @@ from tortoise.contrib.pydantic.creator import pydantic_model_creator
 
 from .models import Admin, Guest
 from ..reservations.schema import Reservation_Pydantic_List
+from ..serialization import ProjectionSerializer
 
 
 Admin_Pydantic = pydantic_model_creator(Admin)
 Guest_Pydantic = pydantic_model_creator(Guest)
+Guest_Serializer = ProjectionSerializer(Guest_Pydantic)
 
 
 class TokenResponse(BaseModel):
@@ -25,6 +28,8 @@ class TokenResponse(BaseModel):
 class TokenData(BaseModel):
     user_id: UUID
     scopes: list[str]
+    # Absent from tokens issued before the user type was embedded
+    user_type: Optional[Literal["admin", "guest"]] = None
 
 
 class UserIn(BaseModel):
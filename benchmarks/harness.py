@@ -0,0 +1,397 @@
+"""
+Load-test harness: drives the real ASGI app in process with a mixed guest workload.
+
+Every virtual user logs in as one of the `loadtest<N>@example.com` guests created by
+`benchmarks.seed`, then loops over weighted scenarios until `--duration` runs out:
+
+- browse: the room catalog, a room's detail and its reviews
+- search: availability searches over random dates
+- book:   a reservation for a random room and stay
+- pay:    a checkout session for one of the user's invoices, and its payment confirmation
+- review: a review of a room the guest stayed in
+
+Requests go through `httpx.ASGITransport`, so routing, validation, dependencies and
+serialization are all measured, without network noise. Results are reported per route (count,
+errors, throughput, p50/p95/p99) and can be saved as a JSON baseline, and compared against one
+to catch regressions. A route that never succeeded only measured its rejection path: the run
+then exits non-zero and writes no baseline.
+
+    python -m benchmarks.seed --rooms-per-type 50 --guests 5000
+    python -m benchmarks.harness --users 32 --duration 60 --output benchmarks/baselines/main.json
+    python -m benchmarks.harness --users 32 --duration 60 --compare benchmarks/baselines/main.json
+
+The app runs against the configured database, with the fake payment provider and without the
+mail dispatcher: `DATABASE_PROFILE=sqlite` (the default) uses the file at `SQLITE_PATH`,
+`DATABASE_PROFILE=postgres` connects to `DATABASE_URL`. Seed the same database, e.g.
+
+    python -m benchmarks.seed --db-url sqlite://bench.sqlite3
+    SQLITE_PATH=bench.sqlite3 python -m benchmarks.harness
+"""
+
+import os
+
+# Read by `app.config` at import time, so they must be set before the app is imported
+os.environ.setdefault("PAYMENT_PROVIDER", "fake")
+os.environ.setdefault("MAIL_DISPATCHER_ENABLED", "false")
+
+import argparse
+import asyncio
+import importlib
+import json
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import time
+from collections import defaultdict
+from datetime import date, datetime, timedelta, timezone
+from typing import Optional
+
+import httpx
+from tortoise import connections
+
+from app.checkout.models import Invoice
+from app.rooms.models import Room, RoomAvailability
+from app.users.models import Guest
+from benchmarks.seed import CHECK_IN_TIME, CHECK_OUT_TIME, COMMENTS, LOGIN_EMAIL_PREFIX
+
+API = "/api/v1"
+SCENARIOS = ("browse", "search", "book", "pay", "review")
+DEFAULT_MIX = "browse=40,search=25,book=15,pay=10,review=10"
+
+
+def parse_mix(mix: str) -> dict[str, int]:
+    weights = {}
+    for part in mix.split(","):
+        name, _, weight = part.partition("=")
+        if name not in SCENARIOS:
+            raise argparse.ArgumentTypeError(f"Unknown scenario {name!r}")
+        weights[name] = int(weight)
+    return weights
+
+
+def percentile(values: list[float], percent: float) -> float:
+    """Nearest-rank percentile of sorted `values`"""
+    if not values:
+        return 0.0
+    return values[max(0, min(len(values) - 1, round(percent / 100 * len(values)) - 1))]
+
+
+class RouteStats:
+    def __init__(self):
+        self.latencies: list[float] = []
+        self.errors = 0
+        self.rejected = 0
+
+    @property
+    def succeeded(self) -> int:
+        return len(self.latencies) - self.errors - self.rejected
+
+    def record(self, latency: float, status: Optional[int]):
+        self.latencies.append(latency)
+        if status is None or status >= 500:
+            self.errors += 1
+        elif status >= 400:
+            self.rejected += 1
+
+    def summary(self, elapsed: float) -> dict:
+        latencies = sorted(self.latencies)
+        return {
+            "requests": len(latencies),
+            "errors": self.errors,
+            # 4xx answers, e.g. 409 when a booking loses a race for a room
+            "rejected": self.rejected,
+            "throughput": len(latencies) / elapsed,
+            "mean_ms": statistics.fmean(latencies) * 1000 if latencies else 0.0,
+            "p50_ms": percentile(latencies, 50) * 1000,
+            "p95_ms": percentile(latencies, 95) * 1000,
+            "p99_ms": percentile(latencies, 99) * 1000,
+        }
+
+
+class Workload:
+    """Seeded data the scenarios pick from, loaded once from the database"""
+
+    def __init__(
+        self,
+        rooms: list[tuple],
+        users: dict[str, list[int]],
+        invoices: dict[str, list[str]],
+        horizon: int,
+    ):
+        self.room_ids = [room_id for room_id, _ in rooms]
+        self.room_numbers = [room_number for _, room_number in rooms]
+        self.users = users
+        self.invoices = invoices
+        self.horizon = horizon
+
+    @classmethod
+    async def load(cls, horizon: int) -> "Workload":
+        rooms = await Room.all().values_list("id", "room_number")
+        emails = await Guest.filter(email__startswith=LOGIN_EMAIL_PREFIX).values_list(
+            "email", flat=True
+        )
+        if not rooms or not emails:
+            raise SystemExit("No load-test data found, run `python -m benchmarks.seed` first")
+        users = {email: [] for email in emails}
+        stays = await RoomAvailability.filter(
+            reservation__guest__email__in=emails, end_date__lt=date.today()
+        ).values_list("reservation__guest__email", "room__room_number")
+        for email, room_number in stays:
+            users[email].append(room_number)
+        invoices = {email: [] for email in emails}
+        for email, invoice_id in await Invoice.filter(guest_email__in=emails).values_list(
+            "guest_email", "id"
+        ):
+            invoices[email].append(str(invoice_id))
+        return cls(rooms, users, invoices, horizon)
+
+
+class VirtualUser:
+    def __init__(
+        self,
+        client: httpx.AsyncClient,
+        email: str,
+        workload: Workload,
+        stats: dict[str, RouteStats],
+        rng: random.Random,
+    ):
+        self.client = client
+        self.email = email
+        self.workload = workload
+        self.stats = stats
+        self.rng = rng
+        self.recording = False
+        self.headers: dict[str, str] = {}
+        self.reservations: list[str] = []
+
+    async def request(
+        self, route: str, method: str, url: str, **kwargs
+    ) -> Optional[httpx.Response]:
+        started = time.perf_counter()
+        try:
+            response = await self.client.request(
+                method, API + url, headers=self.headers, **kwargs
+            )
+        except Exception:
+            response = None
+        if self.recording:
+            self.stats[route].record(
+                time.perf_counter() - started, response.status_code if response else None
+            )
+        return response
+
+    async def login(self, password: str):
+        response = await self.request(
+            "POST /login", "POST", "/login", data={"username": self.email, "password": password}
+        )
+        if response is None or response.status_code != 200:
+            raise SystemExit(f"Login failed for {self.email}, was it seeded with this password?")
+        self.headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+    def random_stay(self) -> tuple[date, date]:
+        check_in = date.today() + timedelta(days=self.rng.randint(1, self.workload.horizon))
+        return check_in, check_in + timedelta(days=self.rng.randint(1, 7))
+
+    async def browse(self):
+        await self.request("GET /rooms/", "GET", "/rooms/")
+        room_id = self.rng.choice(self.workload.room_ids)
+        await self.request("GET /rooms/{room_id}", "GET", f"/rooms/{room_id}")
+        room_number = self.rng.choice(self.workload.room_numbers)
+        await self.request(
+            "GET /rooms/{room_number}/reviews", "GET", f"/rooms/{room_number}/reviews"
+        )
+
+    async def search(self):
+        check_in, check_out = self.random_stay()
+        params = {"check_in": check_in.isoformat(), "check_out": check_out.isoformat()}
+        if self.rng.random() < 0.5:
+            params["room_type"] = self.rng.choice(list(Room.RoomType)).value
+        await self.request("GET /rooms/available", "GET", "/rooms/available", params=params)
+
+    async def book(self):
+        check_in, check_out = self.random_stay()
+        response = await self.request(
+            "POST /reservations/",
+            "POST",
+            "/reservations/",
+            json={
+                "room_numbers": [self.rng.choice(self.workload.room_numbers)],
+                "occupants": 1,
+                "check_in_date": datetime.combine(check_in, CHECK_IN_TIME).isoformat(),
+                "check_out_date": datetime.combine(check_out, CHECK_OUT_TIME).isoformat(),
+            },
+        )
+        if response is not None and response.status_code == 201:
+            self.reservations.append(response.json()["id"])
+
+    async def pay(self):
+        invoices = self.workload.invoices[self.email]
+        if not invoices:
+            return await self.browse()
+        invoice_id = self.rng.choice(invoices)
+        response = await self.request(
+            "POST /checkout/session/{invoice_id}", "POST", f"/checkout/session/{invoice_id}"
+        )
+        if response is None or response.status_code != 303:
+            return
+        # The fake provider's checkout URL ends with the session id
+        session_id = response.headers["location"].rsplit("/", 1)[-1]
+        await self.request(
+            "GET /checkout/success", "GET", "/checkout/success", params={"session_id": session_id}
+        )
+
+    async def review(self):
+        stays = self.workload.users[self.email]
+        if not stays:
+            return await self.browse()
+        await self.request(
+            "POST /rooms/{room_number}/reviews",
+            "POST",
+            f"/rooms/{self.rng.choice(stays)}/reviews",
+            json={"rating": self.rng.randint(0, 10), "comment": self.rng.choice(COMMENTS)},
+        )
+
+    async def run(self, mix: dict[str, int], warmup_until: float, deadline: float):
+        names, weights = list(mix), list(mix.values())
+        while (now := time.perf_counter()) < deadline:
+            self.recording = now >= warmup_until
+            await getattr(self, self.rng.choices(names, weights)[0])()
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_report(report: dict):
+    print(
+        f"{'route':<38}{'requests':>9}{'errors':>8}{'4xx':>6}{'req/s':>9}"
+        f"{'p50':>10}{'p95':>10}{'p99':>10}"
+    )
+    for route, summary in [*report["routes"].items(), ("total", report["total"])]:
+        print(
+            f"{route:<38}{summary['requests']:>9}{summary['errors']:>8}{summary['rejected']:>6}"
+            f"{summary['throughput']:>9.1f}{summary['p50_ms']:>8.1f}ms"
+            f"{summary['p95_ms']:>8.1f}ms{summary['p99_ms']:>8.1f}ms"
+        )
+
+
+def compare(report: dict, baseline: dict, threshold: float) -> list[str]:
+    """Print p95 and throughput changes per route, returning the routes whose p95 regressed"""
+    regressions = []
+    meta = baseline["meta"]
+    print(f"\ncompared with {meta.get('git_commit')} ({meta['timestamp']})")
+    print(f"{'route':<38}{'p95':>10}{'change':>9}{'req/s':>9}{'change':>9}")
+    for route, summary in report["routes"].items():
+        before = baseline["routes"].get(route)
+        if not before or not before["requests"]:
+            continue
+        p95_change = (
+            (summary["p95_ms"] - before["p95_ms"]) / before["p95_ms"] if before["p95_ms"] else 0.0
+        )
+        throughput_change = (summary["throughput"] - before["throughput"]) / before["throughput"]
+        flag = "  REGRESSION" if p95_change > threshold else ""
+        print(
+            f"{route:<38}{summary['p95_ms']:>8.1f}ms{p95_change:>+9.1%}"
+            f"{summary['throughput']:>9.1f}{throughput_change:>+9.1%}{flag}"
+        )
+        if flag:
+            regressions.append(route)
+    return regressions
+
+
+async def run(args) -> int:
+    module, _, attribute = args.app.partition(":")
+    app = getattr(importlib.import_module(module), attribute)
+    rng = random.Random(args.seed)
+    stats: dict[str, RouteStats] = defaultdict(RouteStats)
+
+    # Runs the app's startup handlers: ORM initialisation, availability index, ...
+    async with app.router.lifespan_context(app):
+        workload = await Workload.load(args.horizon)
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://harness") as client:
+            emails = sorted(workload.users)
+            users = [
+                VirtualUser(
+                    client,
+                    emails[index % len(emails)],
+                    workload,
+                    stats,
+                    random.Random(rng.random()),
+                )
+                for index in range(args.users)
+            ]
+            for user in users:
+                user.recording = True
+                await user.login(args.password)
+            started = time.perf_counter()
+            warmup_until = started + args.warmup
+            deadline = warmup_until + args.duration
+            await asyncio.gather(*(user.run(args.mix, warmup_until, deadline) for user in users))
+        dialect = connections.get("default").capabilities.dialect
+
+    elapsed = args.duration
+    routes = {route: stats[route].summary(elapsed) for route in sorted(stats)}
+    total = RouteStats()
+    for route_stats in stats.values():
+        total.latencies += route_stats.latencies
+        total.errors += route_stats.errors
+        total.rejected += route_stats.rejected
+    report = {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "git_commit": git_commit(),
+            "python": platform.python_version(),
+            "database": dialect,
+            "users": args.users,
+            "duration": args.duration,
+            "warmup": args.warmup,
+            "mix": args.mix,
+            "seed": args.seed,
+        },
+        "routes": routes,
+        "total": total.summary(elapsed),
+    }
+    print(f"{args.users} users, {args.duration:.0f}s after {args.warmup:.0f}s warmup, {dialect}")
+    print_report(report)
+    never_succeeded = [
+        route for route in sorted(stats) if stats[route].latencies and not stats[route].succeeded
+    ]
+    if never_succeeded:
+        print(f"\nno successful request for {', '.join(never_succeeded)}, check the seeded data")
+        return 1
+    if args.output:
+        os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
+        with open(args.output, "w") as file:
+            json.dump(report, file, indent=2)
+        print(f"\nbaseline written to {args.output}")
+    if args.compare:
+        with open(args.compare) as file:
+            regressions = compare(report, json.load(file), args.threshold)
+        if regressions and args.fail_on_regression:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--app", default="main:api", help="module:attribute of the ASGI app")
+    parser.add_argument("--users", type=int, default=16, help="concurrent virtual users")
+    parser.add_argument("--duration", type=float, default=30.0, help="measured seconds")
+    parser.add_argument("--warmup", type=float, default=5.0, help="unmeasured seconds first")
+    parser.add_argument("--mix", type=parse_mix, default=parse_mix(DEFAULT_MIX))
+    parser.add_argument("--password", default="load-test-password")
+    parser.add_argument("--horizon", type=int, default=180, help="days ahead to search and book")
+    parser.add_argument("--output", default=None, help="write the report as a JSON baseline")
+    parser.add_argument("--compare", default=None, help="baseline to compare the run against")
+    parser.add_argument("--threshold", type=float, default=0.2, help="p95 slowdown to flag")
+    parser.add_argument("--fail-on-regression", action="store_true")
+    parser.add_argument("--seed", type=int, default=0)
+    sys.exit(asyncio.run(run(parser.parse_args())))
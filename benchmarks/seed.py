@@ -0,0 +1,272 @@
+"""
+Synthetic hotel generator for benchmarks and load tests.
+
+Bulk-creates `--rooms-per-type` rooms of every `Room.RoomType`, `--guests` guests and
+`--years` of reservation history up to `--horizon` days ahead. Each room alternates idle gaps
+and stays so that its occupancy follows a seasonal curve: a summer peak, a winter trough,
+busier weekends and some day-to-day noise. A share of past stays leaves a review. Past stays
+are invoiced by the night audit (`app.checkout.billing`) and their invoices paid, except those of
+the login guests, which the load test's pay scenario settles. The room rating aggregates and the
+daily rollups are rebuilt at the end.
+
+The first `--login-guests` guests (`loadtest<N>@example.com`) get a real password hash of
+`--password` so load tests can log in as them; the others get unusable placeholder hashes,
+which keeps seeding fast. Runs with the same `--seed` and `--today` produce the same data.
+
+    python -m benchmarks.seed --rooms-per-type 50 --guests 5000 --years 3
+    python -m benchmarks.seed --db-url sqlite://bench.sqlite3 --today 2026-01-01
+"""
+
+import argparse
+import asyncio
+import math
+import random
+import time
+import uuid
+from datetime import date, datetime, time as day_time, timedelta, timezone
+from decimal import Decimal
+
+from pypika import Table
+from tortoise import Tortoise, connections
+
+from app.analytics.rollups import rebuild_rollups
+from app.auth.utils import pwd_context
+from app.checkout.billing import invoice_completed_stays
+from app.checkout.models import Invoice, PaidStatus
+from app.config import settings
+from app.reservations.models import Reservation
+from app.rooms.models import Review, Room, RoomAvailability
+from app.rooms.ratings import rebuild_ratings
+from app.users.models import Guest
+
+# Nightly price range and capacity per room type
+ROOM_TYPES = {
+    Room.RoomType.STANDARD: ((40, 60), 2),
+    Room.RoomType.DELUXE: ((60, 80), 3),
+    Room.RoomType.SUITE: ((80, 99), 4),
+}
+CHECK_IN_TIME = day_time(14, 0, tzinfo=timezone.utc)
+CHECK_OUT_TIME = day_time(11, 0, tzinfo=timezone.utc)
+COMMENTS = ["Great stay", "Clean and quiet", "Could be better", "Lovely view", "Too noisy", None]
+
+
+LOGIN_EMAIL_PREFIX = "loadtest"
+
+
+def login_email(index: int) -> str:
+    return f"{LOGIN_EMAIL_PREFIX}{index}@example.com"
+
+
+def occupancy(day: date, base: float, rng: random.Random) -> float:
+    """Target share of rooms occupied on `day`"""
+    season = 0.2 * math.cos(2 * math.pi * (day.timetuple().tm_yday - 196) / 365)
+    weekend = 0.08 if day.weekday() in (4, 5) else 0.0
+    return min(0.97, max(0.05, base + season + weekend + rng.gauss(0, 0.03)))
+
+
+def stay_length(rng: random.Random) -> int:
+    return min(14, 1 + int(rng.expovariate(1 / 2.2)))
+
+
+def random_uuid(rng: random.Random) -> uuid.UUID:
+    return uuid.UUID(int=rng.getrandbits(128), version=4)
+
+
+async def seed_rooms(rooms_per_type: int, rng: random.Random) -> list[Room]:
+    rooms = []
+    for floor, (room_type, ((low, high), capacity)) in enumerate(ROOM_TYPES.items(), start=1):
+        for index in range(1, rooms_per_type + 1):
+            rooms.append(
+                Room(
+                    id=random_uuid(rng),
+                    room_number=floor * 1000 + index,
+                    room_type=room_type,
+                    capacity=str(capacity),
+                    price=Decimal(rng.randint(low * 100, high * 100)) / 100,
+                )
+            )
+    await Room.bulk_create(rooms)
+    return rooms
+
+
+async def seed_guests(guests: int, login_guests: int, password: str, rng: random.Random):
+    # bcrypt salts make every hash unique, as `password_hash` requires
+    hashes = [pwd_context.hash(password) for _ in range(min(login_guests, guests))]
+    records = [
+        Guest(
+            uid=random_uuid(rng),
+            first_name="Load" if index < len(hashes) else "Guest",
+            last_name=str(index),
+            email=login_email(index) if index < len(hashes) else f"guest{index}@example.com",
+            password_hash=hashes[index] if index < len(hashes) else f"!{rng.getrandbits(128):x}",
+            joined_at=date(2020, 1, 1),
+        )
+        for index in range(guests)
+    ]
+    await Guest.bulk_create(records, batch_size=1000)
+    return records
+
+
+def plan_stays(first: date, last: date, base: float, rng: random.Random):
+    """(check_in, nights) pairs for one room: idle gaps sized to the occupancy target"""
+    stays = []
+    day = first
+    while day < last:
+        target = occupancy(day, base, rng)
+        nights = stay_length(rng)
+        # Mean gap so that nights / (nights + gap) approaches the target occupancy
+        mean_gap = nights * (1 - target) / target
+        day += timedelta(days=int(rng.expovariate(1 / mean_gap)) if mean_gap > 0 else 0)
+        if day + timedelta(days=nights) > last:
+            break
+        stays.append((day, nights))
+        day += timedelta(days=nights)
+    return stays
+
+
+async def link_rooms(availabilities: list[RoomAvailability]):
+    """Fill `Reservation.rooms`, which routes such as `add_review` filter on, in one statement"""
+    if not availabilities:
+        return
+    rooms = Reservation._meta.fields_map["rooms"]
+    client = connections.get("default")
+    query = client.query_class.into(Table(rooms.through)).columns(
+        rooms.backward_key, rooms.forward_key
+    )
+    for availability in availabilities:
+        query = query.insert(str(availability.reservation_id), str(availability.room_id))
+    await client.execute_query(query.get_sql())
+
+
+async def seed_invoices(today: date) -> int:
+    """Invoice the stays that ended by `today`, leaving unpaid only those of the login guests"""
+    invoiced = await invoice_completed_stays(datetime.combine(today, CHECK_OUT_TIME))
+    await Invoice.exclude(guest_email__startswith=LOGIN_EMAIL_PREFIX).update(
+        status=PaidStatus.paid
+    )
+    return invoiced
+
+
+async def seed_history(args, rooms: list[Room], guests: list[Guest], rng: random.Random):
+    today = args.today
+    first, last = today - timedelta(days=365 * args.years), today + timedelta(days=args.horizon)
+    reservations, availabilities, reviews = [], [], []
+
+    async def flush():
+        await Reservation.bulk_create(reservations, batch_size=args.batch_size)
+        await RoomAvailability.bulk_create(availabilities, batch_size=args.batch_size)
+        await link_rooms(availabilities)
+        await Review.bulk_create(reviews, batch_size=args.batch_size)
+        reservations.clear()
+        availabilities.clear()
+        reviews.clear()
+
+    counts = {"reservations": 0, "booked_nights": 0}
+    for room in rooms:
+        for check_in, nights in plan_stays(first, last, args.occupancy, rng):
+            check_out = check_in + timedelta(days=nights)
+            guest = rng.choice(guests)
+            if check_out <= today:
+                status = Reservation.ReservationStatus.CHECKED_OUT
+            elif check_in <= today:
+                status = Reservation.ReservationStatus.CHECKED_IN
+            else:
+                status = Reservation.ReservationStatus.CONFIRMED
+            # Booked a few weeks ahead on average, and never after `today`
+            booked_at = min(
+                datetime.combine(check_in, CHECK_IN_TIME)
+                - timedelta(days=rng.expovariate(1 / 21), hours=rng.uniform(1, 12)),
+                datetime.combine(today, CHECK_IN_TIME) - timedelta(hours=rng.uniform(1, 720)),
+            )
+            reservation = Reservation(
+                id=random_uuid(rng),
+                guest_id=guest.uid,
+                created_at=booked_at,
+                occupants=rng.randint(1, int(room.capacity)),
+                check_in_date=datetime.combine(check_in, CHECK_IN_TIME),
+                check_out_date=datetime.combine(check_out, CHECK_OUT_TIME),
+                guest_checked_out=status == Reservation.ReservationStatus.CHECKED_OUT,
+                status=status,
+            )
+            reservations.append(reservation)
+            availabilities.append(
+                RoomAvailability(
+                    room_id=room.id,
+                    reservation_id=reservation.id,
+                    booked=True,
+                    start_date=check_in,
+                    end_date=check_out,
+                    # No rate plans are seeded, every night is at the room's price
+                    price=room.price * (check_out - check_in).days,
+                )
+            )
+            if check_out <= today and rng.random() < args.review_rate:
+                reviews.append(
+                    Review(
+                        room_id=room.id,
+                        guest_id=guest.uid,
+                        created_at=min(
+                            datetime.combine(check_out, CHECK_OUT_TIME)
+                            + timedelta(days=rng.expovariate(1 / 3)),
+                            datetime.combine(today, CHECK_OUT_TIME),
+                        ),
+                        rating=max(0, min(10, round(rng.gauss(7, 2)))),
+                        comment=rng.choice(COMMENTS),
+                    )
+                )
+            counts["reservations"] += 1
+            counts["booked_nights"] += nights
+            if len(reservations) >= args.batch_size:
+                await flush()
+    await flush()
+    counts["occupancy"] = counts["booked_nights"] / (len(rooms) * (last - first).days)
+    return counts
+
+
+async def run(args):
+    config = settings.tortoise_config
+    if args.db_url:
+        config["connections"] = {"default": args.db_url}
+    config["routers"] = []
+    config["apps"]["models"]["models"] = [
+        path for path in settings.MODEL_PATHS if path != "aerich.models"
+    ]
+    await Tortoise.init(config=config)
+    try:
+        await Tortoise.generate_schemas()
+        if await Room.exists():
+            raise SystemExit("The database already has rooms, seed an empty database")
+        rng = random.Random(args.seed)
+        started = time.perf_counter()
+        rooms = await seed_rooms(args.rooms_per_type, rng)
+        guests = await seed_guests(args.guests, args.login_guests, args.password, rng)
+        counts = await seed_history(args, rooms, guests, rng)
+        invoices = await seed_invoices(args.today)
+        await rebuild_ratings()
+        await rebuild_rollups()
+        print(f"rooms:         {len(rooms)} ({args.rooms_per_type} per type)")
+        print(f"guests:        {len(guests)} ({min(args.login_guests, args.guests)} can log in)")
+        print(f"reservations:  {counts['reservations']}")
+        print(f"reviews:       {await Review.all().count()}")
+        print(f"invoices:      {invoices}")
+        print(f"occupancy:     {counts['occupancy']:.1%}")
+        print(f"elapsed:       {time.perf_counter() - started:.1f}s")
+    finally:
+        await Tortoise.close_connections()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--db-url", default=None, help="defaults to the configured database")
+    parser.add_argument("--rooms-per-type", type=int, default=50)
+    parser.add_argument("--guests", type=int, default=5000)
+    parser.add_argument("--login-guests", type=int, default=100)
+    parser.add_argument("--password", default="load-test-password")
+    parser.add_argument("--years", type=int, default=3, help="years of history")
+    parser.add_argument("--horizon", type=int, default=180, help="days of future bookings")
+    parser.add_argument("--occupancy", type=float, default=0.65, help="mean occupancy")
+    parser.add_argument("--review-rate", type=float, default=0.2, help="share of stays reviewed")
+    parser.add_argument("--today", type=date.fromisoformat, default=date.today())
+    parser.add_argument("--batch-size", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=0)
+    asyncio.run(run(parser.parse_args()))
@@ -1,14 +1,27 @@
 from fastapi import APIRouter, FastAPI, Security
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.staticfiles import StaticFiles
 from tortoise import Tortoise
 from tortoise.contrib.fastapi import register_tortoise
 
 from app.admin import app as admin_app
+from app.analytics.routes import analytics_router
 from app.auth.routes import auth_router
 from app.auth.utils import get_current_active_admin
-from app.checkout.routes import checkout_router
-from app.config import settings
-from app.guest_requests.routes import guest_request
+from app.checkout.payments import payment_provider
+from app.checkout.routes import admin_invoice_router, checkout_router
+from app.config import UPLOAD_DIR, settings
+from app.database import check_database
+from app.database.routes import database_router
+from app.database.routing import mark_writes, replica_monitor
+from app.guest_requests.dispatch import dispatch_queue
+from app.guest_requests.routes import dispatch_router, guest_request
+from app.notifications.dispatcher import mail_dispatcher
+from app.notifications.routes import outbox_router
+from app.pricing.routes import quote_router, rate_plan_router
+from app.rooms.availability import availability_index
+from app.rooms.images import shutdown_image_pool
+from app.reservations.holds import hold_sweeper
 from app.reservations.routes import admin_reservation_router, guest_reservation_router
 from app.rooms.routes import admin_rooms_router, guest_rooms_router
 from app.users.routes import admin_router, guest_router
@@ -51,15 +64,34 @@ admin_routers_v1.include_router(admin_reservation_router, prefix="/reservations"
 router_v1.include_router(guest_reservation_router, prefix="/reservations")
 
 router_v1.include_router(checkout_router)
+admin_routers_v1.include_router(admin_invoice_router)
 
 # Guest request routers
 router_v1.include_router(guest_request, prefix="/requests")
+admin_routers_v1.include_router(dispatch_router, prefix="/requests")
+
+# Outbound email routers
+admin_routers_v1.include_router(outbox_router, prefix="/outbox")
+
+# Database pool metrics
+admin_routers_v1.include_router(database_router, prefix="/database")
+
+# Occupancy and revenue reporting
+admin_routers_v1.include_router(analytics_router, prefix="/analytics")
+
+# Rate plans and quotes
+admin_routers_v1.include_router(rate_plan_router, prefix="/rate_plans")
+router_v1.include_router(quote_router)
 
 
 api.include_router(router_v1)
 api.include_router(admin_routers_v1)
+# Room images, the directory is created with the first upload
+api.mount("/media", StaticFiles(directory=UPLOAD_DIR, check_dir=False), name="media")
 
 api.mount("/admin", admin_app)
+# Sets the read-your-writes cookie checked by `route_reads`
+api.middleware("http")(mark_writes)
 api.add_middleware(
     CORSMiddleware,
     allow_origins=["http://localhost:8080"],
@@ -68,7 +100,7 @@ api.add_middleware(
     allow_methods=["*"],
 )
 
-TORTOISE_ORM = settings.TORTOISE_CONFIG
+TORTOISE_ORM = settings.tortoise_config
 MODEL_PATHS = settings.MODEL_PATHS
 
 
@@ -79,6 +111,75 @@ async def init():
 
 register_tortoise(api, config=TORTOISE_ORM, add_exception_handlers=True)
 
+
+# Registered after `register_tortoise` so the ORM is initialised first
+@api.on_event("startup")
+async def check_database_connection():
+    await check_database()
+
+
+@api.on_event("startup")
+async def start_replica_monitor():
+    replica_monitor.start()
+
+
+@api.on_event("shutdown")
+async def stop_replica_monitor():
+    await replica_monitor.stop()
+
+
+@api.on_event("startup")
+async def load_availability_index():
+    await availability_index.load()
+
+
+@api.on_event("startup")
+async def start_mail_dispatcher():
+    if settings.mail_dispatcher_enabled:
+        mail_dispatcher.start()
+
+
+@api.on_event("shutdown")
+async def stop_mail_dispatcher():
+    await mail_dispatcher.stop()
+
+
+@api.on_event("startup")
+async def start_hold_sweeper():
+    hold_sweeper.start()
+
+
+@api.on_event("shutdown")
+async def stop_hold_sweeper():
+    await hold_sweeper.stop()
+
+
+@api.on_event("startup")
+async def start_dispatch_queue():
+    await dispatch_queue.load()
+    dispatch_queue.start()
+
+
+@api.on_event("shutdown")
+async def stop_dispatch_queue():
+    await dispatch_queue.stop()
+
+
+@api.on_event("shutdown")
+async def stop_image_pool():
+    shutdown_image_pool()
+
+
+@api.on_event("startup")
+async def start_payment_provider():
+    await payment_provider.start()
+
+
+@api.on_event("shutdown")
+async def close_payment_provider():
+    await payment_provider.close()
+
+
 if __name__ == "__main__":
     import asyncio
 
@@ -2,6 +2,107 @@ from tortoise import BaseDBAsyncClient
 
 
 async def upgrade(db: BaseDBAsyncClient) -> str:
+    if db.capabilities.dialect == "postgres":
+        return """
+            CREATE TABLE IF NOT EXISTS "room" (
+    "id" UUID NOT NULL  PRIMARY KEY,
+    "room_type" VARCHAR(10),
+    "room_number" INT NOT NULL UNIQUE,
+    "booked" BOOL NOT NULL  DEFAULT False,
+    "capacity" VARCHAR(500) NOT NULL,
+    "price" DECIMAL(5,3) NOT NULL
+);
+CREATE INDEX IF NOT EXISTS "idx_room_room_nu_c51115" ON "room" ("room_number");
+COMMENT ON COLUMN "room"."room_type" IS 'STANDARD: Standard\nDELUXE: Deluxe\nSUITE: Suite';
+COMMENT ON COLUMN "room"."price" IS 'price of room per night';
+CREATE TABLE IF NOT EXISTS "admin" (
+    "uid" UUID NOT NULL  PRIMARY KEY,
+    "first_name" VARCHAR(50) NOT NULL,
+    "last_name" VARCHAR(50) NOT NULL,
+    "email" VARCHAR(100) NOT NULL UNIQUE,
+    "password_hash" VARCHAR(200) NOT NULL UNIQUE,
+    "joined_at" DATE NOT NULL,
+    "is_active" BOOL NOT NULL  DEFAULT True,
+    "is_admin" BOOL NOT NULL  DEFAULT False,
+    "is_superuser" BOOL NOT NULL  DEFAULT False
+);
+CREATE INDEX IF NOT EXISTS "idx_admin_email_f3e751" ON "admin" ("email");
+CREATE TABLE IF NOT EXISTS "guest" (
+    "uid" UUID NOT NULL  PRIMARY KEY,
+    "first_name" VARCHAR(50) NOT NULL,
+    "last_name" VARCHAR(50) NOT NULL,
+    "email" VARCHAR(100) NOT NULL UNIQUE,
+    "password_hash" VARCHAR(200) NOT NULL UNIQUE,
+    "joined_at" DATE NOT NULL,
+    "is_active" BOOL NOT NULL  DEFAULT True,
+    "is_admin" BOOL NOT NULL  DEFAULT False
+);
+CREATE INDEX IF NOT EXISTS "idx_guest_email_dbffa6" ON "guest" ("email");
+CREATE TABLE IF NOT EXISTS "reservation" (
+    "id" UUID NOT NULL  PRIMARY KEY,
+    "occupants" INT NOT NULL,
+    "created_at" TIMESTAMPTZ NOT NULL  DEFAULT CURRENT_TIMESTAMP,
+    "check_in_date" TIMESTAMPTZ NOT NULL,
+    "check_out_date" TIMESTAMPTZ NOT NULL,
+    "guest_checked_out" BOOL NOT NULL  DEFAULT False,
+    "status" VARCHAR(11) NOT NULL  DEFAULT 'pending',
+    "guest_id" UUID NOT NULL REFERENCES "guest" ("uid") ON DELETE NO ACTION
+);
+COMMENT ON COLUMN "reservation"."status" IS 'PENDING: pending\nCONFIRMED: confirmed\nCHECKED_IN: checked_in\nCHECKED_OUT: checked_out\nCANCELLED: cancelled';
+CREATE TABLE IF NOT EXISTS "review" (
+    "id" SERIAL NOT NULL PRIMARY KEY,
+    "created_at" TIMESTAMPTZ NOT NULL  DEFAULT CURRENT_TIMESTAMP,
+    "rating" INT NOT NULL  DEFAULT 0,
+    "comment" TEXT,
+    "guest_id" UUID NOT NULL REFERENCES "guest" ("uid") ON DELETE NO ACTION,
+    "room_id" UUID NOT NULL REFERENCES "room" ("id") ON DELETE CASCADE
+);
+CREATE TABLE IF NOT EXISTS "roomavailability" (
+    "id" SERIAL NOT NULL PRIMARY KEY,
+    "booked" BOOL NOT NULL  DEFAULT False,
+    "start_date" DATE NOT NULL,
+    "end_date" DATE NOT NULL,
+    "reservation_id" UUID NOT NULL REFERENCES "reservation" ("id") ON DELETE CASCADE,
+    "room_id" UUID NOT NULL REFERENCES "room" ("id") ON DELETE CASCADE,
+    CONSTRAINT "uid_roomavailab_room_id_3c984a" UNIQUE ("room_id", "start_date", "end_date")
+);
+CREATE TABLE IF NOT EXISTS "guestrequest" (
+    "id" SERIAL NOT NULL PRIMARY KEY,
+    "request" TEXT NOT NULL,
+    "request_type" VARCHAR(20) NOT NULL,
+    "request_status" VARCHAR(11) NOT NULL,
+    "priority" VARCHAR(10),
+    "extra" TEXT,
+    "created" TIMESTAMPTZ NOT NULL  DEFAULT CURRENT_TIMESTAMP,
+    "updated" TIMESTAMPTZ NOT NULL  DEFAULT CURRENT_TIMESTAMP,
+    "guest_id" UUID NOT NULL REFERENCES "guest" ("uid") ON DELETE NO ACTION,
+    "reservation_id" UUID REFERENCES "reservation" ("id") ON DELETE CASCADE,
+    "room_id" UUID NOT NULL REFERENCES "room" ("id") ON DELETE NO ACTION
+);
+COMMENT ON COLUMN "guestrequest"."request_type" IS 'HOUSE_KEEPING: house_keeping\nMAINTENANCE: maintenance\nDINING: dining\nEXTRA_AMENITIES: extra_amenities';
+COMMENT ON COLUMN "guestrequest"."request_status" IS 'PENDING: pending\nIN_PROGRESS: in_progress\nCOMPLETED: completed';
+COMMENT ON COLUMN "guestrequest"."priority" IS 'URGENT: urgent\nHIGH: high\nMEDIUM: medium\nLOW: low';
+CREATE TABLE IF NOT EXISTS "invoice" (
+    "id" UUID NOT NULL  PRIMARY KEY,
+    "created_at" TIMESTAMPTZ NOT NULL  DEFAULT CURRENT_TIMESTAMP,
+    "status" VARCHAR(6) NOT NULL  DEFAULT 'unpaid',
+    "transaction_id" VARCHAR(100),
+    "guest_email" VARCHAR(100) NOT NULL,
+    "amount" DECIMAL(6,3),
+    "reservation_id" UUID NOT NULL UNIQUE REFERENCES "reservation" ("id") ON DELETE CASCADE
+);
+COMMENT ON COLUMN "invoice"."status" IS 'paid: paid\nunpaid: unpaid';
+CREATE TABLE IF NOT EXISTS "aerich" (
+    "id" SERIAL NOT NULL PRIMARY KEY,
+    "version" VARCHAR(255) NOT NULL,
+    "app" VARCHAR(100) NOT NULL,
+    "content" JSONB NOT NULL
+);
+CREATE TABLE IF NOT EXISTS "models.RoomAvailability" (
+    "reservation_id" UUID NOT NULL REFERENCES "reservation" ("id") ON DELETE CASCADE,
+    "room_id" UUID NOT NULL REFERENCES "room" ("id") ON DELETE CASCADE
+);
+CREATE UNIQUE INDEX IF NOT EXISTS "uidx_models.Room_reserva_c21454" ON "models.RoomAvailability" ("reservation_id", "room_id");"""
     return """
         CREATE TABLE IF NOT EXISTS "room" (
     "id" CHAR(36) NOT NULL  PRIMARY KEY,
@@ -0,0 +1,34 @@
+from tortoise import BaseDBAsyncClient
+
+
+async def upgrade(db: BaseDBAsyncClient) -> str:
+    if db.capabilities.dialect == "postgres":
+        return """
+            ALTER TABLE "roomavailability" DROP CONSTRAINT IF EXISTS "uid_roomavailab_room_id_3c984a";
+            CREATE INDEX IF NOT EXISTS "idx_roomavailab_room_id_ef6750" ON "roomavailability" ("room_id", "start_date");"""
+    # SQLite cannot drop a table constraint, the table is rebuilt without it
+    return """
+        CREATE TABLE "_roomavailability_new" (
+    "id" INTEGER PRIMARY KEY AUTOINCREMENT NOT NULL,
+    "booked" INT NOT NULL  DEFAULT 0,
+    "start_date" DATE NOT NULL,
+    "end_date" DATE NOT NULL,
+    "reservation_id" CHAR(36) NOT NULL REFERENCES "reservation" ("id") ON DELETE CASCADE,
+    "room_id" CHAR(36) NOT NULL REFERENCES "room" ("id") ON DELETE CASCADE
+);
+        INSERT INTO "_roomavailability_new" ("id", "booked", "start_date", "end_date", "reservation_id", "room_id")
+            SELECT "id", "booked", "start_date", "end_date", "reservation_id", "room_id" FROM "roomavailability";
+        DROP TABLE "roomavailability";
+        ALTER TABLE "_roomavailability_new" RENAME TO "roomavailability";
+        CREATE INDEX IF NOT EXISTS "idx_roomavailab_room_id_ef6750" ON "roomavailability" ("room_id", "start_date");"""
+
+
+async def downgrade(db: BaseDBAsyncClient) -> str:
+    # Fails if a cancelled stay has since been booked again
+    if db.capabilities.dialect == "postgres":
+        return """
+            DROP INDEX IF EXISTS "idx_roomavailab_room_id_ef6750";
+            ALTER TABLE "roomavailability" ADD CONSTRAINT "uid_roomavailab_room_id_3c984a" UNIQUE ("room_id", "start_date", "end_date");"""
+    return """
+        DROP INDEX IF EXISTS "idx_roomavailab_room_id_ef6750";
+        CREATE UNIQUE INDEX "uid_roomavailab_room_id_3c984a" ON "roomavailability" ("room_id", "start_date", "end_date");"""
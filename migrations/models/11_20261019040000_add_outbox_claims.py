@@ -0,0 +1,18 @@
+from tortoise import BaseDBAsyncClient
+
+
+async def upgrade(db: BaseDBAsyncClient) -> str:
+    if db.capabilities.dialect == "postgres":
+        return """
+            ALTER TABLE "outboxemail" ADD "claim" UUID;
+            CREATE INDEX IF NOT EXISTS "idx_outboxemail_claim_13bdaf" ON "outboxemail" ("claim");"""
+    return """
+        ALTER TABLE "outboxemail" ADD "claim" CHAR(36);
+        CREATE INDEX IF NOT EXISTS "idx_outboxemail_claim_13bdaf" ON "outboxemail" ("claim");"""
+
+
+async def downgrade(db: BaseDBAsyncClient) -> str:
+    return """
+        UPDATE "outboxemail" SET "status" = 'pending' WHERE "status" = 'sending';
+        DROP INDEX IF EXISTS "idx_outboxemail_claim_13bdaf";
+        ALTER TABLE "outboxemail" DROP COLUMN "claim";"""
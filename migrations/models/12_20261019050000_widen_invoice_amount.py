@@ -0,0 +1,17 @@
+from tortoise import BaseDBAsyncClient
+
+
+async def upgrade(db: BaseDBAsyncClient) -> str:
+    # SQLite stores decimals as VARCHAR(40) whatever their precision, nothing to change there
+    if db.capabilities.dialect != "postgres":
+        return ""
+    return """
+        ALTER TABLE "invoice" ALTER COLUMN "amount" TYPE DECIMAL(12,3) USING "amount"::DECIMAL(12,3);"""
+
+
+async def downgrade(db: BaseDBAsyncClient) -> str:
+    # Fails if an invoice of 1000 or more has been recorded since
+    if db.capabilities.dialect != "postgres":
+        return ""
+    return """
+        ALTER TABLE "invoice" ALTER COLUMN "amount" TYPE DECIMAL(6,3) USING "amount"::DECIMAL(6,3);"""
@@ -0,0 +1,13 @@
+from tortoise import BaseDBAsyncClient
+
+
+async def upgrade(db: BaseDBAsyncClient) -> str:
+    # Stays booked before have no price and are invoiced at the current rates
+    column_type = "DECIMAL(12,2)" if db.capabilities.dialect == "postgres" else "VARCHAR(40)"
+    return f"""
+        ALTER TABLE "roomavailability" ADD "price" {column_type};"""
+
+
+async def downgrade(db: BaseDBAsyncClient) -> str:
+    return """
+        ALTER TABLE "roomavailability" DROP COLUMN "price";"""
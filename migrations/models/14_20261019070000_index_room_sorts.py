@@ -0,0 +1,15 @@
+from tortoise import BaseDBAsyncClient
+
+
+async def upgrade(db: BaseDBAsyncClient) -> str:
+    return """
+        DROP INDEX IF EXISTS "idx_room_rating__7eb4c7";
+        CREATE INDEX IF NOT EXISTS "idx_room_rating__d96e97" ON "room" ("rating_average", "review_count", "id");
+        CREATE INDEX IF NOT EXISTS "idx_room_review__2314b5" ON "room" ("review_count", "id");"""
+
+
+async def downgrade(db: BaseDBAsyncClient) -> str:
+    return """
+        DROP INDEX IF EXISTS "idx_room_review__2314b5";
+        DROP INDEX IF EXISTS "idx_room_rating__d96e97";
+        CREATE INDEX IF NOT EXISTS "idx_room_rating__7eb4c7" ON "room" ("rating_average", "id");"""
@@ -0,0 +1,41 @@
+from tortoise import BaseDBAsyncClient
+
+
+async def upgrade(db: BaseDBAsyncClient) -> str:
+    if db.capabilities.dialect == "postgres":
+        return """
+            CREATE TABLE IF NOT EXISTS "outboxemail" (
+    "id" SERIAL NOT NULL PRIMARY KEY,
+    "recipient" VARCHAR(100) NOT NULL,
+    "subject" VARCHAR(255) NOT NULL,
+    "body" TEXT NOT NULL,
+    "status" VARCHAR(7) NOT NULL  DEFAULT 'pending',
+    "attempts" INT NOT NULL  DEFAULT 0,
+    "next_attempt_at" TIMESTAMPTZ NOT NULL,
+    "last_error" TEXT,
+    "created_at" TIMESTAMPTZ NOT NULL  DEFAULT CURRENT_TIMESTAMP,
+    "sent_at" TIMESTAMPTZ
+);
+CREATE INDEX IF NOT EXISTS "idx_outboxemail_status_68867b" ON "outboxemail" ("status");
+CREATE INDEX IF NOT EXISTS "idx_outboxemail_next_at_b76845" ON "outboxemail" ("next_attempt_at");
+COMMENT ON COLUMN "outboxemail"."status" IS 'PENDING: pending\nSENT: sent\nFAILED: failed';"""
+    return """
+        CREATE TABLE IF NOT EXISTS "outboxemail" (
+    "id" INTEGER PRIMARY KEY AUTOINCREMENT NOT NULL,
+    "recipient" VARCHAR(100) NOT NULL,
+    "subject" VARCHAR(255) NOT NULL,
+    "body" TEXT NOT NULL,
+    "status" VARCHAR(7) NOT NULL  DEFAULT 'pending' /* PENDING: pending\nSENT: sent\nFAILED: failed */,
+    "attempts" INT NOT NULL  DEFAULT 0,
+    "next_attempt_at" TIMESTAMP NOT NULL,
+    "last_error" TEXT,
+    "created_at" TIMESTAMP NOT NULL  DEFAULT CURRENT_TIMESTAMP,
+    "sent_at" TIMESTAMP
+);
+CREATE INDEX IF NOT EXISTS "idx_outboxemail_status_68867b" ON "outboxemail" ("status");
+CREATE INDEX IF NOT EXISTS "idx_outboxemail_next_at_b76845" ON "outboxemail" ("next_attempt_at");"""
+
+
+async def downgrade(db: BaseDBAsyncClient) -> str:
+    return """
+        DROP TABLE IF EXISTS "outboxemail";"""
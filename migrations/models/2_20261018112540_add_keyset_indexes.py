@@ -0,0 +1,21 @@
+from tortoise import BaseDBAsyncClient
+
+
+async def upgrade(db: BaseDBAsyncClient) -> str:
+    return """
+        CREATE INDEX IF NOT EXISTS "idx_reservation_created_ffedb8" ON "reservation" ("created_at", "id");
+        CREATE INDEX IF NOT EXISTS "idx_review_created_d20ea6" ON "review" ("created_at", "id");
+        CREATE INDEX IF NOT EXISTS "idx_admin_joined__9e0039" ON "admin" ("joined_at", "uid");
+        CREATE INDEX IF NOT EXISTS "idx_guest_joined__0ae7d2" ON "guest" ("joined_at", "uid");
+        CREATE INDEX IF NOT EXISTS "idx_guestreques_created_6fb1e7" ON "guestrequest" ("created", "id");
+        CREATE INDEX IF NOT EXISTS "idx_invoice_created_1e8221" ON "invoice" ("created_at", "id");"""
+
+
+async def downgrade(db: BaseDBAsyncClient) -> str:
+    return """
+        DROP INDEX IF EXISTS "idx_reservation_created_ffedb8";
+        DROP INDEX IF EXISTS "idx_review_created_d20ea6";
+        DROP INDEX IF EXISTS "idx_admin_joined__9e0039";
+        DROP INDEX IF EXISTS "idx_guest_joined__0ae7d2";
+        DROP INDEX IF EXISTS "idx_guestreques_created_6fb1e7";
+        DROP INDEX IF EXISTS "idx_invoice_created_1e8221";"""
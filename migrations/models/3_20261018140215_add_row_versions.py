@@ -0,0 +1,21 @@
+from tortoise import BaseDBAsyncClient
+
+
+async def upgrade(db: BaseDBAsyncClient) -> str:
+    return """
+        ALTER TABLE "room" ADD "version" INT NOT NULL  DEFAULT 1;
+        ALTER TABLE "review" ADD "version" INT NOT NULL  DEFAULT 1;
+        ALTER TABLE "reservation" ADD "version" INT NOT NULL  DEFAULT 1;
+        ALTER TABLE "invoice" ADD "version" INT NOT NULL  DEFAULT 1;
+        ALTER TABLE "admin" ADD "version" INT NOT NULL  DEFAULT 1;
+        ALTER TABLE "guest" ADD "version" INT NOT NULL  DEFAULT 1;"""
+
+
+async def downgrade(db: BaseDBAsyncClient) -> str:
+    return """
+        ALTER TABLE "room" DROP COLUMN "version";
+        ALTER TABLE "review" DROP COLUMN "version";
+        ALTER TABLE "reservation" DROP COLUMN "version";
+        ALTER TABLE "invoice" DROP COLUMN "version";
+        ALTER TABLE "admin" DROP COLUMN "version";
+        ALTER TABLE "guest" DROP COLUMN "version";"""
@@ -0,0 +1,61 @@
+from tortoise import BaseDBAsyncClient
+
+
+async def upgrade(db: BaseDBAsyncClient) -> str:
+    if db.capabilities.dialect == "postgres":
+        return """
+            ALTER TABLE "room" ADD "review_count" INT NOT NULL  DEFAULT 0;
+            ALTER TABLE "room" ADD "rating_sum" INT NOT NULL  DEFAULT 0;
+            ALTER TABLE "room" ADD "rating_average" DOUBLE PRECISION NOT NULL  DEFAULT 0;
+            ALTER TABLE "room" ADD "rating_histogram" JSONB NOT NULL  DEFAULT '[0,0,0,0,0,0,0,0,0,0,0]';
+            CREATE INDEX IF NOT EXISTS "idx_room_rating__7eb4c7" ON "room" ("rating_average", "id");
+            COMMENT ON COLUMN "room"."rating_histogram" IS 'number of reviews per rating, 0 to 10';
+            UPDATE "room" SET
+                "review_count" = (SELECT COUNT(*) FROM "review" WHERE "review"."room_id" = "room"."id"),
+                "rating_sum" = (SELECT COALESCE(SUM("rating"), 0) FROM "review" WHERE "review"."room_id" = "room"."id"),
+                "rating_average" = (SELECT COALESCE(AVG("rating"), 0) FROM "review" WHERE "review"."room_id" = "room"."id"),
+                "rating_histogram" = jsonb_build_array(
+                (SELECT COUNT(*) FROM "review" WHERE "review"."room_id" = "room"."id" AND "rating" = 0),
+                (SELECT COUNT(*) FROM "review" WHERE "review"."room_id" = "room"."id" AND "rating" = 1),
+                (SELECT COUNT(*) FROM "review" WHERE "review"."room_id" = "room"."id" AND "rating" = 2),
+                (SELECT COUNT(*) FROM "review" WHERE "review"."room_id" = "room"."id" AND "rating" = 3),
+                (SELECT COUNT(*) FROM "review" WHERE "review"."room_id" = "room"."id" AND "rating" = 4),
+                (SELECT COUNT(*) FROM "review" WHERE "review"."room_id" = "room"."id" AND "rating" = 5),
+                (SELECT COUNT(*) FROM "review" WHERE "review"."room_id" = "room"."id" AND "rating" = 6),
+                (SELECT COUNT(*) FROM "review" WHERE "review"."room_id" = "room"."id" AND "rating" = 7),
+                (SELECT COUNT(*) FROM "review" WHERE "review"."room_id" = "room"."id" AND "rating" = 8),
+                (SELECT COUNT(*) FROM "review" WHERE "review"."room_id" = "room"."id" AND "rating" = 9),
+                (SELECT COUNT(*) FROM "review" WHERE "review"."room_id" = "room"."id" AND "rating" = 10)
+            );"""
+    return """
+        ALTER TABLE "room" ADD "review_count" INT NOT NULL  DEFAULT 0;
+        ALTER TABLE "room" ADD "rating_sum" INT NOT NULL  DEFAULT 0;
+        ALTER TABLE "room" ADD "rating_average" REAL NOT NULL  DEFAULT 0;
+        ALTER TABLE "room" ADD "rating_histogram" JSON NOT NULL  DEFAULT '[0,0,0,0,0,0,0,0,0,0,0]';
+        CREATE INDEX IF NOT EXISTS "idx_room_rating__7eb4c7" ON "room" ("rating_average", "id");
+        UPDATE "room" SET
+            "review_count" = (SELECT COUNT(*) FROM "review" WHERE "review"."room_id" = "room"."id"),
+            "rating_sum" = (SELECT COALESCE(SUM("rating"), 0) FROM "review" WHERE "review"."room_id" = "room"."id"),
+            "rating_average" = (SELECT COALESCE(AVG("rating"), 0) FROM "review" WHERE "review"."room_id" = "room"."id"),
+            "rating_histogram" = json_array(
+            (SELECT COUNT(*) FROM "review" WHERE "review"."room_id" = "room"."id" AND "rating" = 0),
+            (SELECT COUNT(*) FROM "review" WHERE "review"."room_id" = "room"."id" AND "rating" = 1),
+            (SELECT COUNT(*) FROM "review" WHERE "review"."room_id" = "room"."id" AND "rating" = 2),
+            (SELECT COUNT(*) FROM "review" WHERE "review"."room_id" = "room"."id" AND "rating" = 3),
+            (SELECT COUNT(*) FROM "review" WHERE "review"."room_id" = "room"."id" AND "rating" = 4),
+            (SELECT COUNT(*) FROM "review" WHERE "review"."room_id" = "room"."id" AND "rating" = 5),
+            (SELECT COUNT(*) FROM "review" WHERE "review"."room_id" = "room"."id" AND "rating" = 6),
+            (SELECT COUNT(*) FROM "review" WHERE "review"."room_id" = "room"."id" AND "rating" = 7),
+            (SELECT COUNT(*) FROM "review" WHERE "review"."room_id" = "room"."id" AND "rating" = 8),
+            (SELECT COUNT(*) FROM "review" WHERE "review"."room_id" = "room"."id" AND "rating" = 9),
+            (SELECT COUNT(*) FROM "review" WHERE "review"."room_id" = "room"."id" AND "rating" = 10)
+        );"""
+
+
+async def downgrade(db: BaseDBAsyncClient) -> str:
+    return """
+        DROP INDEX IF EXISTS "idx_room_rating__7eb4c7";
+        ALTER TABLE "room" DROP COLUMN "review_count";
+        ALTER TABLE "room" DROP COLUMN "rating_sum";
+        ALTER TABLE "room" DROP COLUMN "rating_average";
+        ALTER TABLE "room" DROP COLUMN "rating_histogram";"""
@@ -0,0 +1,55 @@
+from tortoise import BaseDBAsyncClient
+
+
+async def upgrade(db: BaseDBAsyncClient) -> str:
+    if db.capabilities.dialect == "postgres":
+        return """
+            CREATE TABLE IF NOT EXISTS "reservationhold" (
+    "id" UUID NOT NULL  PRIMARY KEY,
+    "occupants" INT NOT NULL,
+    "check_in_date" TIMESTAMPTZ NOT NULL,
+    "check_out_date" TIMESTAMPTZ NOT NULL,
+    "created_at" TIMESTAMPTZ NOT NULL  DEFAULT CURRENT_TIMESTAMP,
+    "expires_at" TIMESTAMPTZ NOT NULL,
+    "guest_id" UUID NOT NULL REFERENCES "guest" ("uid") ON DELETE CASCADE
+);
+            CREATE INDEX IF NOT EXISTS "idx_reservation_expires_2283ad" ON "reservationhold" ("expires_at");
+            COMMENT ON TABLE "reservationhold" IS 'Rooms set aside for a guest while they check out, see `app.reservations.holds`';
+            CREATE TABLE IF NOT EXISTS "roomhold" (
+    "id" SERIAL NOT NULL PRIMARY KEY,
+    "start_date" DATE NOT NULL,
+    "end_date" DATE NOT NULL,
+    "expires_at" TIMESTAMPTZ NOT NULL,
+    "hold_id" UUID NOT NULL REFERENCES "reservationhold" ("id") ON DELETE CASCADE,
+    "room_id" UUID NOT NULL REFERENCES "room" ("id") ON DELETE CASCADE
+);
+            CREATE INDEX IF NOT EXISTS "idx_roomhold_expires_f2ea28" ON "roomhold" ("expires_at");
+            CREATE INDEX IF NOT EXISTS "idx_roomhold_room_id_833b77" ON "roomhold" ("room_id", "start_date");
+            COMMENT ON TABLE "roomhold" IS 'One room of a `ReservationHold`, with the hold''s dates and expiry copied for lookups';"""
+    return """
+        CREATE TABLE IF NOT EXISTS "reservationhold" (
+    "id" CHAR(36) NOT NULL  PRIMARY KEY,
+    "occupants" INT NOT NULL,
+    "check_in_date" TIMESTAMP NOT NULL,
+    "check_out_date" TIMESTAMP NOT NULL,
+    "created_at" TIMESTAMP NOT NULL  DEFAULT CURRENT_TIMESTAMP,
+    "expires_at" TIMESTAMP NOT NULL,
+    "guest_id" CHAR(36) NOT NULL REFERENCES "guest" ("uid") ON DELETE CASCADE
+) /* Rooms set aside for a guest while they check out, see `app.reservations.holds` */;
+        CREATE INDEX IF NOT EXISTS "idx_reservation_expires_2283ad" ON "reservationhold" ("expires_at");
+        CREATE TABLE IF NOT EXISTS "roomhold" (
+    "id" INTEGER PRIMARY KEY AUTOINCREMENT NOT NULL,
+    "start_date" DATE NOT NULL,
+    "end_date" DATE NOT NULL,
+    "expires_at" TIMESTAMP NOT NULL,
+    "hold_id" CHAR(36) NOT NULL REFERENCES "reservationhold" ("id") ON DELETE CASCADE,
+    "room_id" CHAR(36) NOT NULL REFERENCES "room" ("id") ON DELETE CASCADE
+) /* One room of a `ReservationHold`, with the hold's dates and expiry copied for lookups */;
+        CREATE INDEX IF NOT EXISTS "idx_roomhold_expires_f2ea28" ON "roomhold" ("expires_at");
+        CREATE INDEX IF NOT EXISTS "idx_roomhold_room_id_833b77" ON "roomhold" ("room_id", "start_date");"""
+
+
+async def downgrade(db: BaseDBAsyncClient) -> str:
+    return """
+        DROP TABLE IF EXISTS "roomhold";
+        DROP TABLE IF EXISTS "reservationhold";"""
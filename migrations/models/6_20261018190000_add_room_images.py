@@ -0,0 +1,45 @@
+from tortoise import BaseDBAsyncClient
+
+
+async def upgrade(db: BaseDBAsyncClient) -> str:
+    if db.capabilities.dialect == "postgres":
+        return """
+            CREATE TABLE IF NOT EXISTS "roomimage" (
+    "id" SERIAL NOT NULL PRIMARY KEY,
+    "caption" VARCHAR(200),
+    "content_hash" VARCHAR(64) NOT NULL,
+    "image_path" VARCHAR(255) NOT NULL,
+    "content_type" VARCHAR(50) NOT NULL,
+    "size" INT NOT NULL,
+    "width" INT NOT NULL,
+    "height" INT NOT NULL,
+    "variants" JSONB NOT NULL,
+    "created_at" TIMESTAMPTZ NOT NULL  DEFAULT CURRENT_TIMESTAMP,
+    "room_id" UUID NOT NULL REFERENCES "room" ("id") ON DELETE CASCADE
+);
+            CREATE INDEX IF NOT EXISTS "idx_roomimage_content_cf392d" ON "roomimage" ("content_hash");
+            COMMENT ON COLUMN "roomimage"."content_hash" IS 'sha256 of the file';
+            COMMENT ON COLUMN "roomimage"."image_path" IS 'relative to the upload directory';
+            COMMENT ON COLUMN "roomimage"."size" IS 'bytes';
+            COMMENT ON COLUMN "roomimage"."variants" IS 'variant name to relative path';
+            COMMENT ON TABLE "roomimage" IS 'A picture of a room, several rows may share one file, see `app.rooms.images`';"""
+    return """
+        CREATE TABLE IF NOT EXISTS "roomimage" (
+    "id" INTEGER PRIMARY KEY AUTOINCREMENT NOT NULL,
+    "caption" VARCHAR(200),
+    "content_hash" VARCHAR(64) NOT NULL  /* sha256 of the file */,
+    "image_path" VARCHAR(255) NOT NULL  /* relative to the upload directory */,
+    "content_type" VARCHAR(50) NOT NULL,
+    "size" INT NOT NULL  /* bytes */,
+    "width" INT NOT NULL,
+    "height" INT NOT NULL,
+    "variants" JSON NOT NULL  /* variant name to relative path */,
+    "created_at" TIMESTAMP NOT NULL  DEFAULT CURRENT_TIMESTAMP,
+    "room_id" CHAR(36) NOT NULL REFERENCES "room" ("id") ON DELETE CASCADE
+) /* A picture of a room, several rows may share one file, see `app.rooms.images` */;
+        CREATE INDEX IF NOT EXISTS "idx_roomimage_content_cf392d" ON "roomimage" ("content_hash");"""
+
+
+async def downgrade(db: BaseDBAsyncClient) -> str:
+    return """
+        DROP TABLE IF EXISTS "roomimage";"""
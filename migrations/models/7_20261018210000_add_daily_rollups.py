@@ -0,0 +1,36 @@
+from tortoise import BaseDBAsyncClient
+
+
+async def upgrade(db: BaseDBAsyncClient) -> str:
+    if db.capabilities.dialect == "postgres":
+        return """
+            CREATE TABLE IF NOT EXISTS "dailyrollup" (
+    "id" SERIAL NOT NULL PRIMARY KEY,
+    "day" DATE NOT NULL,
+    "room_type" VARCHAR(10) NOT NULL,
+    "nights_sold" INT NOT NULL  DEFAULT 0,
+    "rooms_available" INT NOT NULL  DEFAULT 0,
+    "revenue_booked" DECIMAL(14,3) NOT NULL  DEFAULT 0,
+    "revenue_paid" DECIMAL(14,3) NOT NULL  DEFAULT 0,
+    "updated_at" TIMESTAMPTZ NOT NULL  DEFAULT CURRENT_TIMESTAMP,
+    CONSTRAINT "uid_dailyrollup_day_09b032" UNIQUE ("day", "room_type")
+);
+            COMMENT ON COLUMN "dailyrollup"."room_type" IS 'empty for rooms without a type';
+            COMMENT ON TABLE "dailyrollup" IS 'Sales of one room type on one night, see `app.analytics.rollups`';"""
+    return """
+        CREATE TABLE IF NOT EXISTS "dailyrollup" (
+    "id" INTEGER PRIMARY KEY AUTOINCREMENT NOT NULL,
+    "day" DATE NOT NULL,
+    "room_type" VARCHAR(10) NOT NULL  /* empty for rooms without a type */,
+    "nights_sold" INT NOT NULL  DEFAULT 0,
+    "rooms_available" INT NOT NULL  DEFAULT 0,
+    "revenue_booked" VARCHAR(40) NOT NULL  DEFAULT 0,
+    "revenue_paid" VARCHAR(40) NOT NULL  DEFAULT 0,
+    "updated_at" TIMESTAMP NOT NULL  DEFAULT CURRENT_TIMESTAMP,
+    CONSTRAINT "uid_dailyrollup_day_09b032" UNIQUE ("day", "room_type")
+) /* Sales of one room type on one night, see `app.analytics.rollups` */;"""
+
+
+async def downgrade(db: BaseDBAsyncClient) -> str:
+    return """
+        DROP TABLE IF EXISTS "dailyrollup";"""
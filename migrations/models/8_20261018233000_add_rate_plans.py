@@ -0,0 +1,48 @@
+from tortoise import BaseDBAsyncClient
+
+
+async def upgrade(db: BaseDBAsyncClient) -> str:
+    if db.capabilities.dialect == "postgres":
+        return """
+            CREATE TABLE IF NOT EXISTS "rateplan" (
+    "id" SERIAL NOT NULL PRIMARY KEY,
+    "name" VARCHAR(100) NOT NULL,
+    "room_type" VARCHAR(10),
+    "start_date" DATE,
+    "end_date" DATE,
+    "weekdays" JSONB,
+    "min_occupancy" DOUBLE PRECISION,
+    "multiplier" DECIMAL(6,3) NOT NULL  DEFAULT 1,
+    "nightly_price" DECIMAL(8,3),
+    "priority" INT NOT NULL  DEFAULT 0,
+    "created_at" TIMESTAMPTZ NOT NULL  DEFAULT CURRENT_TIMESTAMP,
+    "updated_at" TIMESTAMPTZ NOT NULL  DEFAULT CURRENT_TIMESTAMP
+);
+            COMMENT ON COLUMN "rateplan"."room_type" IS 'every room type if null';
+            COMMENT ON COLUMN "rateplan"."start_date" IS 'first night, open-ended if null';
+            COMMENT ON COLUMN "rateplan"."end_date" IS 'last night, open-ended if null';
+            COMMENT ON COLUMN "rateplan"."weekdays" IS 'nights it applies to, 0 is Monday';
+            COMMENT ON COLUMN "rateplan"."min_occupancy" IS 'share of the room type sold for the night, from 0 to 1';
+            COMMENT ON COLUMN "rateplan"."multiplier" IS 'applied to the room''s price';
+            COMMENT ON COLUMN "rateplan"."nightly_price" IS 'replaces the room''s price';
+            COMMENT ON TABLE "rateplan" IS 'A nightly rate rule for a room type and date range, see `app.pricing.engine`';"""
+    return """
+        CREATE TABLE IF NOT EXISTS "rateplan" (
+    "id" INTEGER PRIMARY KEY AUTOINCREMENT NOT NULL,
+    "name" VARCHAR(100) NOT NULL,
+    "room_type" VARCHAR(10)   /* every room type if null */,
+    "start_date" DATE   /* first night, open-ended if null */,
+    "end_date" DATE   /* last night, open-ended if null */,
+    "weekdays" JSON   /* nights it applies to, 0 is Monday */,
+    "min_occupancy" REAL   /* share of the room type sold for the night, from 0 to 1 */,
+    "multiplier" VARCHAR(40) NOT NULL  DEFAULT 1 /* applied to the room's price */,
+    "nightly_price" VARCHAR(40)   /* replaces the room's price */,
+    "priority" INT NOT NULL  DEFAULT 0,
+    "created_at" TIMESTAMP NOT NULL  DEFAULT CURRENT_TIMESTAMP,
+    "updated_at" TIMESTAMP NOT NULL  DEFAULT CURRENT_TIMESTAMP
+) /* A nightly rate rule for a room type and date range, see `app.pricing.engine` */;"""
+
+
+async def downgrade(db: BaseDBAsyncClient) -> str:
+    return """
+        DROP TABLE IF EXISTS "rateplan";"""
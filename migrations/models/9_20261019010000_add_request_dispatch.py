@@ -0,0 +1,20 @@
+from tortoise import BaseDBAsyncClient
+
+
+async def upgrade(db: BaseDBAsyncClient) -> str:
+    if db.capabilities.dialect == "postgres":
+        return """
+            ALTER TABLE "guestrequest" ADD "claimed_at" TIMESTAMPTZ;
+            ALTER TABLE "guestrequest" ADD "claimed_by_id" UUID REFERENCES "admin" ("uid") ON DELETE SET NULL;
+            CREATE INDEX IF NOT EXISTS "idx_guestreques_updated_a14483" ON "guestrequest" ("updated", "id");"""
+    return """
+        ALTER TABLE "guestrequest" ADD "claimed_at" TIMESTAMP;
+        ALTER TABLE "guestrequest" ADD "claimed_by_id" CHAR(36) REFERENCES "admin" ("uid") ON DELETE SET NULL;
+        CREATE INDEX IF NOT EXISTS "idx_guestreques_updated_a14483" ON "guestrequest" ("updated", "id");"""
+
+
+async def downgrade(db: BaseDBAsyncClient) -> str:
+    return """
+        DROP INDEX IF EXISTS "idx_guestreques_updated_a14483";
+        ALTER TABLE "guestrequest" DROP COLUMN "claimed_by_id";
+        ALTER TABLE "guestrequest" DROP COLUMN "claimed_at";"""
@@ -0,0 +1,49 @@
+"""
+Fixtures for the API tests: a fresh SQLite database per test, see `tests.utils` for the app
+and data helpers.
+
+    pip install -r requirements.txt -r requirements-dev.txt
+    python -m pytest
+"""
+
+import os
+
+# Read by `app.config` at import time, so they must be set before the app is imported
+os.environ.setdefault("PAYMENT_PROVIDER", "fake")
+os.environ.setdefault("MAIL_DISPATCHER_ENABLED", "false")
+
+import pytest
+from tortoise import Tortoise
+
+from app.config import settings
+
+MODEL_PATHS = [path for path in settings.MODEL_PATHS if path != "aerich.models"]
+# Resolve relations before the test modules create their pydantic models from them
+Tortoise.init_models(MODEL_PATHS, "models")
+
+from app.rooms.availability import availability_index
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+@pytest.fixture
+async def db(tmp_path):
+    await Tortoise.init(
+        config={
+            "connections": {"default": f"sqlite://{tmp_path / 'db.sqlite3'}"},
+            "apps": {
+                "models": {
+                    # Migrations are not run, the schema is generated from the models
+                    "models": MODEL_PATHS,
+                    "default_connection": "default",
+                },
+            },
+        }
+    )
+    await Tortoise.generate_schemas()
+    await availability_index.load()
+    yield
+    await Tortoise.close_connections()
@@ -0,0 +1,50 @@
+import pytest
+from tortoise.exceptions import IntegrityError, OperationalError
+
+from app.config import settings
+from app.reservations.booking import BookingContention, create_reservation, retry_on_contention
+from app.reservations.schema import ReservationIn
+from tests.utils import count_statements, create_guest, create_rooms, stay
+
+pytestmark = [pytest.mark.anyio, pytest.mark.usefixtures("db")]
+
+# Room locks, conflict checks, the reservation and its stays, the rate plans' fingerprint for
+# the stays' prices, the rollups, the confirmation email and the room versions
+BOOKING_STATEMENTS = 16
+
+
+async def booking_statements(room_numbers: list[int]) -> list[str]:
+    guest = await create_guest()
+    reservation = ReservationIn(room_numbers=room_numbers, occupants=2, **stay(10, 3))
+    with count_statements() as statements:
+        await create_reservation(guest, reservation)
+    return statements
+
+
+async def test_booking_statements_do_not_grow_with_rooms():
+    await create_rooms(*range(101, 111))
+    # The first booking of a day creates its rollup rows, later ones update them
+    await booking_statements([110])
+    for room_numbers in ([101], [102, 103], [104, 105, 106, 107, 108]):
+        statements = await booking_statements(room_numbers)
+        assert len(statements) == BOOKING_STATEMENTS, "\n".join(statements)
+
+
+@pytest.mark.parametrize(
+    "error, raised, attempts",
+    [
+        (OperationalError, BookingContention, settings.booking_max_retries + 1),
+        (IntegrityError, IntegrityError, 1),
+    ],
+)
+async def test_only_contention_is_retried(monkeypatch, error, raised, attempts):
+    monkeypatch.setattr(settings, "booking_retry_backoff", 0)
+    calls = []
+
+    async def write():
+        calls.append(1)
+        raise error("failed")
+
+    with pytest.raises(raised):
+        await retry_on_contention(write)
+    assert len(calls) == attempts
@@ -0,0 +1,50 @@
+from datetime import timedelta
+
+import pytest
+from tortoise import timezone
+
+from app.guest_requests.routes import guest_request
+from app.reservations.booking import create_reservation
+from app.reservations.schema import ReservationIn
+from app.rooms.models import RoomAvailability
+from tests.utils import API, auth_headers, client, create_app, create_guest, create_rooms, stay
+
+pytestmark = [pytest.mark.anyio, pytest.mark.usefixtures("db")]
+
+
+@pytest.fixture
+async def api():
+    async with client(create_app(routers=[(guest_request, "/requests")])) as http:
+        yield http
+
+
+async def staying_guest(room_number: int) -> dict[str, str]:
+    """Headers of a guest staying in `room_number` today"""
+    guest = await create_guest()
+    await create_rooms(room_number)
+    reservation = await create_reservation(
+        guest, ReservationIn(room_numbers=[room_number], occupants=2, **stay(10, 3))
+    )
+    today = timezone.now().date()
+    await RoomAvailability.filter(reservation_id=reservation.id).update(
+        start_date=today - timedelta(days=1), end_date=today + timedelta(days=1)
+    )
+    return auth_headers(guest, ["guest-read-write"])
+
+
+async def test_guests_only_see_their_own_requests(api):
+    headers = await staying_guest(101)
+    other_headers = await staying_guest(102)
+    for room_number, request_headers in ((101, headers), (102, other_headers)):
+        response = await api.post(
+            f"{API}/requests/",
+            json={"room_number": room_number, "request": "Towels", "request_type": "house_keeping"},
+            headers=request_headers,
+        )
+        assert response.status_code == 201
+
+    response = await api.get(f"{API}/requests/", headers=headers)
+    assert response.status_code == 200
+    assert [item["room"]["room_number"] for item in response.json()["items"]] == [101]
+    response = await api.get(f"{API}/requests/")
+    assert response.status_code == 401
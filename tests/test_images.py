@@ -0,0 +1,91 @@
+import asyncio
+import io
+import threading
+
+import pytest
+from PIL import Image
+
+from app.rooms import images
+from app.rooms.images import ImageRejected, delete_image, shutdown_image_pool, store_images
+from app.rooms.models import RoomImage
+from tests.utils import create_rooms
+
+pytestmark = [pytest.mark.anyio, pytest.mark.usefixtures("db")]
+
+BOUNDARY = "image-upload"
+CONTENT_TYPE = f"multipart/form-data; boundary={BOUNDARY}"
+
+
+@pytest.fixture
+def upload_dir(tmp_path, monkeypatch):
+    upload_dir = tmp_path / "media"
+    monkeypatch.setattr(images, "UPLOAD_DIR", upload_dir)
+    yield upload_dir
+    shutdown_image_pool()
+
+
+def png(color: str) -> bytes:
+    buffer = io.BytesIO()
+    Image.new("RGB", (32, 32), color).save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+async def multipart_body(*files: tuple[str, bytes]):
+    for filename, data in files:
+        yield (
+            f"--{BOUNDARY}\r\n"
+            f'Content-Disposition: form-data; name="images"; filename="{filename}"\r\n'
+            "Content-Type: application/octet-stream\r\n\r\n"
+        ).encode() + data + b"\r\n"
+    yield f"--{BOUNDARY}--\r\n".encode()
+
+
+def stored_files(upload_dir) -> list[str]:
+    paths = (path.relative_to(upload_dir) for path in upload_dir.rglob("*") if path.is_file())
+    return sorted(str(path) for path in paths if path.parts[0] != "tmp")
+
+
+async def test_rejected_upload_stores_nothing(upload_dir):
+    room, = await create_rooms(101)
+    [stored] = await store_images(room, CONTENT_TYPE, multipart_body(("red.png", png("red"))))
+    existing = stored_files(upload_dir)
+    assert existing
+
+    upload = multipart_body(
+        ("red.png", png("red")), ("blue.png", png("blue")), ("notes.png", b"not an image")
+    )
+    with pytest.raises(ImageRejected) as rejected:
+        await store_images(room, CONTENT_TYPE, upload)
+    assert rejected.value.status_code == 415
+    # The new image is removed, the one shared with an earlier upload is kept
+    assert stored_files(upload_dir) == existing
+    assert await RoomImage.filter(room=room).count() == 1
+    assert (upload_dir / stored.image_path).exists()
+
+
+async def test_deletion_keeps_the_files_of_a_concurrent_upload(upload_dir, monkeypatch):
+    room, = await create_rooms(101)
+    [stored] = await store_images(room, CONTENT_TYPE, multipart_body(("red.png", png("red"))))
+
+    # The deletion has found the file unreferenced and is about to remove it
+    removing, resume = threading.Event(), threading.Event()
+    remove_stored_files = images.remove_stored_files
+
+    def paused_removal(image_path: str, digest: str):
+        removing.set()
+        resume.wait(5)
+        remove_stored_files(image_path, digest)
+
+    monkeypatch.setattr(images, "remove_stored_files", paused_removal)
+    deletion = asyncio.create_task(delete_image(stored))
+    await asyncio.to_thread(removing.wait, 5)
+    upload = asyncio.create_task(
+        store_images(room, CONTENT_TYPE, multipart_body(("red.png", png("red"))))
+    )
+    # Without the digest lock the upload finds the file stored and commits right away
+    await asyncio.wait([upload], timeout=2)
+    resume.set()
+    await deletion
+    [image] = await upload
+    assert (upload_dir / image.image_path).exists()
+    assert all((upload_dir / path).exists() for path in image.variants.values())
@@ -0,0 +1,109 @@
+from decimal import Decimal
+
+import orjson
+import pytest
+
+from app.checkout import billing
+from app.checkout.billing import invoice_completed_stays
+from app.checkout.models import Invoice
+from app.checkout.routes import admin_invoice_router
+from app.pricing.engine import reservation_totals
+from app.pricing.models import RatePlan
+from app.reservations.booking import create_reservation
+from app.reservations.models import Reservation
+from app.reservations.schema import ReservationIn
+from app.rooms.models import RoomAvailability
+from tests.utils import (
+    ADMIN_API,
+    API,
+    auth_headers,
+    client,
+    create_admin,
+    create_app,
+    create_guest,
+    create_rooms,
+    stay,
+)
+
+pytestmark = [pytest.mark.anyio, pytest.mark.usefixtures("db")]
+
+
+@pytest.fixture
+async def api():
+    async with client(create_app(admin_routers=[(admin_invoice_router, "")])) as http:
+        yield http
+
+
+@pytest.fixture
+async def invoice(db):
+    guest = await create_guest()
+    await create_rooms(101)
+    reservation = await create_reservation(
+        guest, ReservationIn(room_numbers=[101], occupants=2, **stay(10, 3))
+    )
+    return await Invoice.create(
+        reservation=reservation, guest_email=guest.email, amount=Decimal("240")
+    )
+
+
+async def test_admins_export_invoices(api, invoice):
+    headers = auth_headers(await create_admin(), ["admin-read"])
+    response = await api.get(f"{ADMIN_API}/invoices/export", headers=headers)
+    assert response.status_code == 200
+    rows = [orjson.loads(line) for line in response.text.splitlines()]
+    assert [row["id"] for row in rows] == [str(invoice.id)]
+
+
+async def test_guests_cannot_export_invoices(api, invoice):
+    # Login grants guests any scope they ask for
+    headers = auth_headers(await create_guest(), ["admin-read", "admin-write"])
+    response = await api.get(f"{ADMIN_API}/invoices/export", headers=headers)
+    assert response.status_code == 403
+    response = await api.get(f"{API}/invoices/export", headers=headers)
+    assert response.status_code == 404
+
+
+async def test_admins_invoice_completed_stays(api):
+    guest = await create_guest()
+    await create_rooms(101, price=Decimal("450.5"))
+    reservation = await create_reservation(
+        guest, ReservationIn(room_numbers=[101], occupants=2, **stay(10, 3))
+    )
+    await Reservation.filter(id=reservation.id).update(guest_checked_out=True)
+
+    headers = auth_headers(await create_guest(), ["admin-read", "admin-write"])
+    response = await api.post(f"{ADMIN_API}/invoices/batch", headers=headers)
+    assert response.status_code == 403
+    assert not await Invoice.exists()
+
+    headers = auth_headers(await create_admin(), ["admin-write"])
+    response = await api.post(f"{ADMIN_API}/invoices/batch", headers=headers)
+    assert response.json() == {"invoiced": 1}
+    # Beyond the former DECIMAL(6,3)
+    assert (await Invoice.get(reservation_id=reservation.id)).amount == Decimal("1351.5")
+    response = await api.post(f"{ADMIN_API}/invoices/batch", headers=headers)
+    assert response.json() == {"invoiced": 0}
+
+
+async def test_invoices_inserted_concurrently_are_not_counted(invoice, monkeypatch):
+    await create_rooms(102)
+    await create_reservation(
+        await create_guest(), ReservationIn(room_numbers=[102], occupants=2, **stay(10, 3))
+    )
+    # As if a concurrent run invoiced `invoice.reservation` between the select and the insert
+    monkeypatch.setattr(billing, "completed_stays", lambda now: Reservation.all())
+    assert await invoice_completed_stays() == 1
+    assert await Invoice.all().count() == 2
+
+
+async def test_stays_are_invoiced_at_the_rates_they_were_booked_at(invoice):
+    await create_rooms(102)
+    earlier = await create_reservation(
+        await create_guest(), ReservationIn(room_numbers=[102], occupants=2, **stay(10, 3))
+    )
+    # Booked before prices were kept
+    await RoomAvailability.filter(reservation_id=earlier.id).update(price=None)
+    await RatePlan.create(name="Peak", nightly_price=Decimal("200"))
+
+    totals = await reservation_totals([invoice.reservation_id, earlier.id])
+    assert totals == {invoice.reservation_id: Decimal("240"), earlier.id: Decimal("600")}
@@ -0,0 +1,114 @@
+import asyncio
+import socket
+from datetime import timedelta
+
+import pytest
+from aiosmtpd.controller import Controller
+from tortoise import timezone
+
+from app.notifications.dispatcher import MailDispatcher, queue_email
+from app.notifications.models import OutboxEmail, OutboxStatus
+from app.reservations.routes import guest_reservation_router
+from tests.utils import API, auth_headers, client, create_app, create_guest, create_rooms, stay
+
+pytestmark = [pytest.mark.anyio, pytest.mark.usefixtures("db")]
+
+
+class Inbox:
+    def __init__(self):
+        self.messages = []
+
+    async def handle_DATA(self, server, session, envelope):
+        self.messages.append(envelope)
+        return "250 Message accepted for delivery"
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+@pytest.fixture
+def smtp_server():
+    inbox = Inbox()
+    controller = Controller(inbox, hostname="127.0.0.1", port=free_port())
+    controller.start()
+    yield controller.port, inbox
+    controller.stop()
+
+
+def dispatcher(port: int, **options) -> MailDispatcher:
+    return MailDispatcher("127.0.0.1", port, start_tls=False, **options)
+
+
+async def drain(mail_dispatcher: MailDispatcher) -> int:
+    handled = 0
+    while batch := await mail_dispatcher.dispatch_batch():
+        handled += batch
+    return handled
+
+
+async def test_booking_email_is_delivered(smtp_server):
+    port, inbox = smtp_server
+    guest = await create_guest()
+    await create_rooms(101)
+    async with client(create_app(routers=[(guest_reservation_router, "/reservations")])) as api:
+        reservation = {"room_numbers": [101], "occupants": 2, **stay(10, 3)}
+        headers = auth_headers(guest, ["guest-read-write"])
+        response = await api.post(f"{API}/reservations/", json=reservation, headers=headers)
+        assert response.status_code == 201
+        # A failed booking queues nothing
+        response = await api.post(f"{API}/reservations/", json=reservation, headers=headers)
+        assert response.status_code == 409
+    assert await OutboxEmail.filter(recipient=guest.email).count() == 1
+
+    mail_dispatcher = dispatcher(port)
+    assert await drain(mail_dispatcher) == 1
+    await mail_dispatcher.stop()
+    assert [message.rcpt_tos for message in inbox.messages] == [[guest.email]]
+    assert b"#101" in inbox.messages[0].content
+    assert (await OutboxEmail.get(recipient=guest.email)).status == OutboxStatus.SENT
+
+
+async def test_concurrent_dispatchers_send_each_email_once(smtp_server):
+    port, inbox = smtp_server
+    for number in range(20):
+        await queue_email(f"guest{number}@example.com", f"Email {number}", "Hello")
+
+    dispatchers = [dispatcher(port, batch_size=3) for _ in range(4)]
+    handled = await asyncio.gather(*(drain(mail_dispatcher) for mail_dispatcher in dispatchers))
+    for mail_dispatcher in dispatchers:
+        await mail_dispatcher.stop()
+    assert sum(handled) == 20
+    assert sorted(message.rcpt_tos[0] for message in inbox.messages) == sorted(
+        f"guest{number}@example.com" for number in range(20)
+    )
+    assert await OutboxEmail.filter(status=OutboxStatus.SENT).count() == 20
+
+
+async def test_failed_emails_are_retried_later():
+    email = await queue_email("guest@example.com", "Hello", "Hello")
+    # Nothing listens on this port
+    mail_dispatcher = dispatcher(free_port(), retry_backoff=60)
+    assert await mail_dispatcher.dispatch_batch() == 1
+    await email.refresh_from_db()
+    assert email.status == OutboxStatus.PENDING
+    assert email.attempts == 1
+    assert email.next_attempt_at > timezone.now() + timedelta(seconds=50)
+    assert await mail_dispatcher.dispatch_batch() == 0
+
+
+async def test_expired_claims_are_taken_over(smtp_server):
+    port, inbox = smtp_server
+    email = await queue_email("guest@example.com", "Hello", "Hello")
+    # Claimed by a dispatcher that died while sending
+    await OutboxEmail.filter(id=email.id).update(
+        status=OutboxStatus.SENDING, next_attempt_at=timezone.now() + timedelta(minutes=5)
+    )
+    mail_dispatcher = dispatcher(port)
+    assert await mail_dispatcher.dispatch_batch() == 0
+    await OutboxEmail.filter(id=email.id).update(next_attempt_at=timezone.now())
+    assert await mail_dispatcher.dispatch_batch() == 1
+    await mail_dispatcher.stop()
+    assert len(inbox.messages) == 1
@@ -0,0 +1,200 @@
+import pytest
+
+from app.database.routing import LAST_WRITE_COOKIE
+from app.reservations.models import Reservation
+from app.reservations.routes import admin_reservation_router, guest_reservation_router
+from app.rooms.availability import availability_index
+from app.rooms.models import Room, RoomAvailability
+from tests.utils import (
+    ADMIN_API,
+    API,
+    auth_headers,
+    client,
+    create_admin,
+    create_app,
+    create_guest,
+    create_rooms,
+    stay,
+)
+
+pytestmark = [pytest.mark.anyio, pytest.mark.usefixtures("db")]
+
+
+@pytest.fixture
+async def api():
+    app = create_app(
+        routers=[(guest_reservation_router, "/reservations")],
+        admin_routers=[(admin_reservation_router, "/reservations")],
+    )
+    async with client(app) as http:
+        yield http
+
+
+@pytest.fixture
+async def guest_headers(db):
+    return auth_headers(await create_guest(), ["guest-read-write"])
+
+
+@pytest.fixture
+async def admin_headers(db):
+    return auth_headers(await create_admin(), ["admin-read", "admin-write"])
+
+
+async def book(api, headers, room_numbers, days_ahead=10, nights=3):
+    return await api.post(
+        f"{API}/reservations/",
+        json={"room_numbers": room_numbers, "occupants": 2, **stay(days_ahead, nights)},
+        headers=headers,
+    )
+
+
+async def assert_index_consistent():
+    drift = await availability_index.check_consistency()
+    assert drift == {"missing": [], "unexpected": [], "missing_rooms": [], "unexpected_rooms": []}
+
+
+async def test_booking_updates_index(api, guest_headers):
+    room_101, room_102 = await create_rooms(101, 102)
+    response = await book(api, guest_headers, [101, 102])
+    assert response.status_code == 201
+    # Later reads of this client are pinned to the primary
+    assert LAST_WRITE_COOKIE in response.cookies
+
+    reservation = await Reservation.get(id=response.json()["id"])
+    check_in, check_out = reservation.check_in_date.date(), reservation.check_out_date.date()
+    for room in (room_101, room_102):
+        assert not availability_index.is_available(room.id, check_in, check_out)
+    assert (await book(api, guest_headers, [102])).status_code == 409
+    await assert_index_consistent()
+
+
+async def test_update_moves_rooms_and_dates(api, guest_headers):
+    room_101, room_102 = await create_rooms(101, 102)
+    reservation_id = (await book(api, guest_headers, [101])).json()["id"]
+
+    response = await api.put(
+        f"{API}/reservations/{reservation_id}",
+        json={"room_numbers": [102], "occupants": 1, **stay(20, 2)},
+        headers=guest_headers,
+    )
+    assert response.status_code == 200
+    reservation = await Reservation.get(id=reservation_id).prefetch_related("rooms")
+    assert [room.room_number for room in reservation.rooms] == [102]
+    assert reservation.occupants == 1
+    assert await RoomAvailability.filter(reservation_id=reservation_id).count() == 1
+    await assert_index_consistent()
+
+    # Room 101 is free again, room 102 is taken on the new dates
+    assert (await book(api, guest_headers, [101])).status_code == 201
+    assert (await book(api, guest_headers, [102], days_ahead=20, nights=2)).status_code == 409
+    await assert_index_consistent()
+
+
+async def test_update_over_own_dates_and_conflicts(api, guest_headers):
+    await create_rooms(101, 102)
+    reservation_id = (await book(api, guest_headers, [101])).json()["id"]
+    await book(api, guest_headers, [102])
+
+    # Extending over its own stay is allowed, moving onto another booking is not
+    extended = {"room_numbers": [101], "occupants": 2, **stay(10, 4)}
+    response = await api.put(
+        f"{API}/reservations/{reservation_id}", json=extended, headers=guest_headers
+    )
+    assert response.status_code == 200
+    conflicting = {"room_numbers": [101, 102], "occupants": 2, **stay(10, 4)}
+    response = await api.put(
+        f"{API}/reservations/{reservation_id}", json=conflicting, headers=guest_headers
+    )
+    assert response.status_code == 409
+    await assert_index_consistent()
+
+
+async def test_update_of_another_guests_reservation(api, guest_headers):
+    await create_rooms(101)
+    reservation_id = (await book(api, guest_headers, [101])).json()["id"]
+    other_headers = auth_headers(await create_guest(), ["guest-read-write"])
+    response = await api.put(
+        f"{API}/reservations/{reservation_id}",
+        json={"room_numbers": [101], "occupants": 1, **stay(10, 3)},
+        headers=other_headers,
+    )
+    assert response.status_code == 404
+
+
+async def test_cancel_frees_rooms(api, guest_headers, admin_headers):
+    room_101, = await create_rooms(101)
+    reservation_id = (await book(api, guest_headers, [101])).json()["id"]
+
+    response = await api.put(
+        f"{ADMIN_API}/reservations/{reservation_id}/checked_out",
+        json={"status": "cancelled"},
+        headers=admin_headers,
+    )
+    assert response.status_code == 200
+    reservation = await Reservation.get(id=reservation_id)
+    assert reservation.status == Reservation.ReservationStatus.CANCELLED
+    await assert_index_consistent()
+    # The same room and dates can be booked again
+    assert (await book(api, guest_headers, [101])).status_code == 201
+
+    # A cancelled reservation stays cancelled
+    response = await api.put(
+        f"{ADMIN_API}/reservations/{reservation_id}/checked_out",
+        json={"status": "confirmed"},
+        headers=admin_headers,
+    )
+    assert response.status_code == 409
+    response = await api.put(
+        f"{API}/reservations/{reservation_id}",
+        json={"room_numbers": [101], "occupants": 1, **stay(30, 1)},
+        headers=guest_headers,
+    )
+    assert response.status_code == 409
+    await assert_index_consistent()
+
+
+async def test_check_out(api, guest_headers, admin_headers):
+    await create_rooms(101)
+    reservation_id = (await book(api, guest_headers, [101])).json()["id"]
+    response = await api.put(
+        f"{ADMIN_API}/reservations/{reservation_id}/checked_out",
+        json={"guest_checked_out": True},
+        headers=admin_headers,
+    )
+    assert response.status_code == 200
+    assert (await Reservation.get(id=reservation_id)).guest_checked_out
+    await assert_index_consistent()
+
+
+async def test_delete_frees_rooms(api, guest_headers, admin_headers):
+    room_101, = await create_rooms(101)
+    reservation_id = (await book(api, guest_headers, [101])).json()["id"]
+
+    response = await api.delete(
+        f"{ADMIN_API}/reservations/{reservation_id}", headers=admin_headers
+    )
+    assert response.status_code == 204
+    assert not await Reservation.exists(id=reservation_id)
+    assert not await RoomAvailability.exists(reservation_id=reservation_id)
+    assert not (await Room.get(id=room_101.id)).booked
+    await assert_index_consistent()
+    assert (await book(api, guest_headers, [101], days_ahead=11, nights=1)).status_code == 201
+
+    response = await api.delete(
+        f"{ADMIN_API}/reservations/{reservation_id}", headers=admin_headers
+    )
+    assert response.status_code == 404
+
+
+async def test_index_misses_are_checked_in_the_database(api, guest_headers):
+    # Created and cancelled by another worker, whose writes this worker's index never sees
+    await Room.create(room_number=301, room_type=Room.RoomType.STANDARD, capacity="2", price=80)
+    assert (await book(api, guest_headers, [301])).status_code == 201
+    reservation_id = (await book(api, guest_headers, [301], days_ahead=20)).json()["id"]
+    await Reservation.filter(id=reservation_id).update(
+        status=Reservation.ReservationStatus.CANCELLED
+    )
+    assert (await book(api, guest_headers, [301], days_ahead=20)).status_code == 201
+    # Taken rooms and unknown rooms are still refused
+    assert (await book(api, guest_headers, [301], days_ahead=20)).status_code == 409
+    assert (await book(api, guest_headers, [302])).status_code == 404
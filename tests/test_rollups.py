@@ -0,0 +1,93 @@
+from datetime import date
+from decimal import Decimal
+
+import pytest
+
+from app.analytics.models import DailyRollup
+from app.analytics.rollups import rebuild_rollups
+from app.reservations.routes import admin_reservation_router, guest_reservation_router
+from app.rooms.models import Room
+from tests.utils import (
+    ADMIN_API,
+    API,
+    auth_headers,
+    client,
+    create_admin,
+    create_app,
+    create_guest,
+    create_rooms,
+    stay,
+)
+
+pytestmark = [pytest.mark.anyio, pytest.mark.usefixtures("db")]
+
+
+@pytest.fixture
+async def api(db):
+    await create_rooms(101, 102)
+    await create_rooms(201, room_type=Room.RoomType.SUITE, price=Decimal("150.5"))
+    app = create_app(
+        routers=[(guest_reservation_router, "/reservations")],
+        admin_routers=[(admin_reservation_router, "/reservations")],
+    )
+    async with client(app) as http:
+        yield http
+
+
+async def rollups() -> dict:
+    """Every rollup cell with sales, rows left at zero by the incremental updates aside"""
+    return {
+        (rollup.day, rollup.room_type): (
+            rollup.nights_sold,
+            rollup.rooms_available,
+            rollup.revenue_booked,
+            rollup.revenue_paid,
+        )
+        for rollup in await DailyRollup.all()
+        if rollup.nights_sold or rollup.revenue_booked or rollup.revenue_paid
+    }
+
+
+async def assert_rollups_rebuild_the_same():
+    tracked = await rollups()
+    await rebuild_rollups()
+    assert tracked == await rollups()
+
+
+async def test_rollups_follow_update_and_delete(api):
+    guest_headers = auth_headers(await create_guest(), ["guest-read-write"])
+    admin_headers = auth_headers(await create_admin(), ["admin-read", "admin-write"])
+
+    async def book(room_numbers, days_ahead, nights) -> str:
+        reservation = {"room_numbers": room_numbers, "occupants": 2, **stay(days_ahead, nights)}
+        response = await api.post(f"{API}/reservations/", json=reservation, headers=guest_headers)
+        assert response.status_code == 201
+        return response.json()["id"]
+
+    moved = await book([101, 102], 10, 3)
+    deleted = await book([201], 11, 2)
+    suite_night = date.fromisoformat(stay(11, 0)["check_in_date"][:10])
+    assert (await rollups())[(suite_night, "Suite")][:3:2] == (1, Decimal("150.5"))
+    await assert_rollups_rebuild_the_same()
+
+    # To another room type, price and dates
+    response = await api.put(
+        f"{API}/reservations/{moved}",
+        json={"room_numbers": [102, 201], "occupants": 3, **stay(14, 4)},
+        headers=guest_headers,
+    )
+    assert response.status_code == 200
+    await assert_rollups_rebuild_the_same()
+
+    response = await api.delete(f"{ADMIN_API}/reservations/{deleted}", headers=admin_headers)
+    assert response.status_code == 204
+    await assert_rollups_rebuild_the_same()
+
+    response = await api.put(
+        f"{ADMIN_API}/reservations/{moved}/checked_out",
+        json={"status": "cancelled"},
+        headers=admin_headers,
+    )
+    assert response.status_code == 200
+    assert await rollups() == {}
+    await assert_rollups_rebuild_the_same()
@@ -0,0 +1,151 @@
+from datetime import datetime, timedelta
+
+from tortoise import timezone
+
+import pytest
+
+from app.reservations.booking import create_reservation
+from app.reservations.models import Reservation, ReservationHold
+from app.reservations.schema import ReservationIn
+from app.rooms.availability import availability_index
+from app.rooms.models import Review, Room, RoomHold
+from app.rooms.routes import guest_rooms_router
+from tests.utils import API, client, create_app, create_guest, create_rooms, stay
+
+pytestmark = [pytest.mark.anyio, pytest.mark.usefixtures("db")]
+
+
+@pytest.fixture
+async def api():
+    async with client(create_app(routers=[(guest_rooms_router, "/rooms")])) as http:
+        yield http
+
+
+@pytest.fixture
+async def rooms(db):
+    rooms = await create_rooms(101, 102, capacity="2")
+    rooms += await create_rooms(201, room_type=Room.RoomType.SUITE, capacity="4")
+    rooms += await create_rooms(202, room_type=Room.RoomType.SUITE, capacity="family")
+    guest = await create_guest()
+    await create_reservation(guest, ReservationIn(room_numbers=[101], occupants=2, **stay(10, 3)))
+    return rooms
+
+
+async def search(api, days_ahead=10, nights=3, **params) -> list[dict]:
+    dates = stay(days_ahead, nights)
+    response = await api.get(
+        f"{API}/rooms/available",
+        params={
+            "check_in": dates["check_in_date"][:10],
+            "check_out": dates["check_out_date"][:10],
+            **params,
+        },
+    )
+    assert response.status_code == 200
+    return response.json()
+
+
+async def available(api, days_ahead=10, nights=3, **params) -> list[int]:
+    return [room["room_number"] for room in await search(api, days_ahead, nights, **params)]
+
+
+@pytest.mark.usefixtures("rooms")
+async def test_available_rooms(api):
+    assert await available(api) == [102, 201, 202]
+    assert await available(api, days_ahead=13) == [101, 102, 201, 202]
+    assert await available(api, days_ahead=8, nights=3) == [102, 201, 202]
+    assert await available(api, room_type="Suite") == [201, 202]
+    # Rooms without a numeric capacity never match a minimum capacity
+    assert await available(api, min_capacity=3) == [201]
+    assert await available(api, min_capacity=5) == []
+
+
+async def test_rooms_taken_by_other_workers(api, rooms):
+    # Booked and held by another worker, so this worker's index does not know about them
+    availability_index.release((await Reservation.get()).id)
+    dates = {key: datetime.fromisoformat(value) for key, value in stay(10, 3).items()}
+    expires_at = timezone.now() + timedelta(minutes=10)
+    hold = await ReservationHold.create(
+        guest=await create_guest(), occupants=2, expires_at=expires_at, **dates
+    )
+    await RoomHold.create(
+        hold=hold,
+        room=rooms[1],
+        start_date=dates["check_in_date"].date(),
+        end_date=dates["check_out_date"].date(),
+        expires_at=expires_at,
+    )
+    assert await available(api) == [201, 202]
+    assert await available(api, days_ahead=13) == [101, 102, 201, 202]
+
+
+@pytest.mark.usefixtures("rooms")
+async def test_available_rooms_payload(api):
+    room = (await search(api))[0]
+    assert room["room_number"] == 102
+    assert not {"reservations", "reviews", "request"} & room.keys()
+
+
+@pytest.mark.usefixtures("rooms")
+async def test_cancelled_reservations_free_rooms(api):
+    await Reservation.all().update(status=Reservation.ReservationStatus.CANCELLED)
+    await availability_index.load()
+    assert await available(api) == [101, 102, 201, 202]
+
+
+async def test_available_rooms_dates(api):
+    today = datetime.now().date()
+    response = await api.get(
+        f"{API}/rooms/available",
+        params={"check_in": str(today + timedelta(days=2)), "check_out": str(today)},
+    )
+    assert response.status_code == 400
+
+
+@pytest.mark.usefixtures("rooms")
+async def test_room_etag(api):
+    room = await Room.get(room_number=102)
+    response = await api.get(f"{API}/rooms/{room.id}")
+    assert response.status_code == 200
+    # Guest requests, guests and invoices are not versioned with the room, so they must not be
+    # part of its body
+    assert "request" not in response.json()
+    room_101 = await Room.get(room_number=101)
+    [reservation] = (await api.get(f"{API}/rooms/{room_101.id}")).json()["reservations"]
+    assert not {"guest", "invoice"} & reservation.keys()
+    etag = response.headers["ETag"]
+    response = await api.get(f"{API}/rooms/{room.id}", headers={"If-None-Match": etag})
+    assert response.status_code == 304
+
+    await Room.touch(id=room.id)
+    response = await api.get(f"{API}/rooms/{room.id}", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["ETag"] != etag
+
+
+@pytest.mark.usefixtures("rooms")
+async def test_etags_follow_embedded_rows(api):
+    room = await Room.get(room_number=101)
+    review = await Review.create(room=room, guest=await create_guest(), rating=8)
+
+    async def etag(path: str) -> str:
+        response = await api.get(f"{API}/rooms/{path}")
+        assert response.status_code == 200
+        return response.headers["ETag"]
+
+    room_etag, review_etag = await etag(room.id), await etag(f"101/reviews/{review.id}")
+    # Saving a reservation does not touch its rooms, the room body embeds it all the same
+    reservation = await Reservation.get(rooms__id=room.id)
+    reservation.status = Reservation.ReservationStatus.CONFIRMED
+    await reservation.save()
+    assert await etag(room.id) != room_etag
+    assert await etag(f"101/reviews/{review.id}") != review_etag
+
+    # The review body embeds its room
+    review_etag = await etag(f"101/reviews/{review.id}")
+    await Room.touch(id=room.id)
+    response = await api.get(
+        f"{API}/rooms/101/reviews/{review.id}", headers={"If-None-Match": review_etag}
+    )
+    assert response.status_code == 200
+    assert response.json()["room"]["version"] == room.version + 1
@@ -0,0 +1,137 @@
+"""Helpers for the API tests"""
+
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from decimal import Decimal
+from typing import Iterator
+from uuid import uuid4
+
+import httpx
+from fastapi import APIRouter, FastAPI, Security
+from fastapi.responses import JSONResponse
+from tortoise import connections
+from tortoise.exceptions import DoesNotExist, IntegrityError
+
+from app.auth.utils import create_auth_token, get_current_active_admin, get_user_type
+from app.database.routing import mark_writes
+from app.rooms.availability import availability_index
+from app.rooms.models import Room
+from app.users.models import Admin, BaseUser, Guest
+
+API = "/api/v1"
+ADMIN_API = "/api/v1/_restricted/admins"
+# Client methods sending one statement each, `execute_many` runs one statement for many rows
+STATEMENT_METHODS = ("execute_insert", "execute_many", "execute_query", "execute_query_dict")
+
+
+def create_app(
+    routers: list[tuple[APIRouter, str]] = (),
+    admin_routers: list[tuple[APIRouter, str]] = (),
+) -> FastAPI:
+    """An app mounting `(router, prefix)` pairs under the public and admin prefixes of `main`"""
+    api = FastAPI()
+    router_v1 = APIRouter(prefix=API)
+    admin_routers_v1 = APIRouter(
+        prefix=ADMIN_API,
+        dependencies=[
+            Security(
+                get_current_active_admin,
+                scopes=["admin-read", "admin-write", "superuser-rw"],
+            )
+        ],
+    )
+    for router, prefix in routers:
+        router_v1.include_router(router, prefix=prefix)
+    for router, prefix in admin_routers:
+        admin_routers_v1.include_router(router, prefix=prefix)
+    api.include_router(router_v1)
+    api.include_router(admin_routers_v1)
+    api.middleware("http")(mark_writes)
+
+    # As registered by `register_tortoise(..., add_exception_handlers=True)`
+    @api.exception_handler(DoesNotExist)
+    async def does_not_exist(request, exc: DoesNotExist):
+        return JSONResponse(status_code=404, content={"detail": str(exc)})
+
+    @api.exception_handler(IntegrityError)
+    async def integrity_error(request, exc: IntegrityError):
+        return JSONResponse(status_code=422, content={"detail": [{"msg": str(exc)}]})
+
+    return api
+
+
+def client(api: FastAPI) -> httpx.AsyncClient:
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=api), base_url="http://test")
+
+
+def auth_headers(user: BaseUser, scopes: list[str]) -> dict[str, str]:
+    claims = {"sub": str(user.uid), "scopes": scopes, "user_type": get_user_type(user)}
+    return {"Authorization": f"Bearer {create_auth_token(claims, 'access')}"}
+
+
+async def create_guest(**fields) -> Guest:
+    return await Guest.create(
+        first_name="Ada",
+        last_name="Guest",
+        email=f"{uuid4().hex}@example.com",
+        password_hash=uuid4().hex,
+        **fields,
+    )
+
+
+async def create_admin(**fields) -> Admin:
+    return await Admin.create(
+        first_name="Grace",
+        last_name="Admin",
+        email=f"{uuid4().hex}@example.com",
+        password_hash=uuid4().hex,
+        is_admin=True,
+        **fields,
+    )
+
+
+async def create_rooms(*room_numbers: int, **fields) -> list[Room]:
+    defaults = {"room_type": Room.RoomType.STANDARD, "capacity": "2", "price": Decimal("80")}
+    fields = defaults | fields
+    rooms = [await Room.create(room_number=number, **fields) for number in room_numbers]
+    for room in rooms:
+        availability_index.add_room(room.id, room.room_number)
+    return rooms
+
+
+def stay(days_ahead: int, nights: int) -> dict[str, str]:
+    check_in = datetime.now().replace(hour=14, minute=0, second=0, microsecond=0)
+    check_in += timedelta(days=days_ahead)
+    return {
+        "check_in_date": check_in.isoformat(),
+        "check_out_date": (check_in + timedelta(days=nights)).isoformat(),
+    }
+
+
+def _counting(method, statements: list[str]):
+    async def execute(self, query, *args, **kwargs):
+        statements.append(query)
+        return await method(self, query, *args, **kwargs)
+
+    return execute
+
+
+@contextmanager
+def count_statements() -> Iterator[list[str]]:
+    """Record the SQL statements sent on the default connection, in and out of transactions"""
+    client = connections.get("default")
+    client_classes = {type(client), type(client._in_transaction().connection)}
+    statements: list[str] = []
+    patched = [
+        (client_class, name, vars(client_class)[name])
+        for client_class in client_classes
+        for name in STATEMENT_METHODS
+        if name in vars(client_class)
+    ]
+    for client_class, name, method in patched:
+        setattr(client_class, name, _counting(method, statements))
+    try:
+        yield statements
+    finally:
+        for client_class, name, method in patched:
+            setattr(client_class, name, method)